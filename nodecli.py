@@ -94,6 +94,7 @@ class NodeCLI(NewCLI):
     recompile_parser.add_argument("--fbd-delay", "-b", default=4, type=float, help="How long to wait (in s) before starting each FBD in the OT network. Mainly used to ensure that all device runners have finished parsing and are ready to run.")
     recompile_parser.add_argument("--plc-delay", "-p", default=8, type=float, help="How long to wait (in s) before starting each PLC in the OT network. Mainly used to ensure that all device runners have finished parsing and are ready to run.")
     recompile_parser.add_argument("--scada-delay", "-s", default=12, type=float, help="How long to wait (in s) before starting each SCADA stage in the OT network. Mainly used to ensure that all device runners have finished parsing and are ready to run.")
+    recompile_parser.add_argument("--restore", "-r", default=None, type=str, help="Checkpoint file from which every device restores its state before it starts, e.g. one written after a warm-up with `simulator/headless.py --until-steady`. Devices run from the simulator directory, so give an absolute path. Not supported in micro mode.")
 
     treevis_parser = Cmd2ArgumentParser("treevis", description="Visualizes the network as a tree.")
     treevis_parser.add_argument("device", nargs="?", default="PLANT", help="The root device to center the resulting tree at. Default PLANT", completer=basic_device_complete)
@@ -387,7 +388,7 @@ class NodeCLI(NewCLI):
         elif args.action == 'recompile':
             start_time = utils.create_makefile(
                 self.mn.topo.device_list, args.all_delay, 
-                args.io_delay, args.plc_delay, args.fbd_delay, args.scada_delay
+                args.io_delay, args.plc_delay, args.fbd_delay, args.scada_delay, args.restore
             )
             timestamp = datetime.fromtimestamp(start_time)
             output(f"Scenario recompiled (new start time: {timestamp}); restart all devices in the OT network.\n")
@@ -833,7 +834,7 @@ class NodeCLI(NewCLI):
                 start_time = utils.create_makefile(
                     [self.runnable_devices[host] for host in filtered_devices],
                     args.all_delay, args.io_delay, args.plc_delay, args.fbd_delay,
-                    args.scada_delay
+                    args.scada_delay, args.restore
                 )
 
             for device in filtered_devices:
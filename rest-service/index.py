@@ -16,6 +16,9 @@ with open("../server_settings.json", "r") as settings:
     API_KEY = data['key']
     START_TIME = data['start_time']
     FREQUENCY = data['frequency']
+    # "precomputed" reads lookahead errors from precomputed.hdf, "physics" rolls the plant model forward
+    PREDICTOR = data.get('predictor', 'precomputed')
+    COLUMNS = data.get('columns')
 
 def get_time(frequency, curr_time=None):
     if curr_time is None:
@@ -31,14 +34,19 @@ def load_lookahead(window_size, lookahead, start_time, frequency):
         # user has not replaced precomputed.hdf
         raise ValueError("Incorrect precomputed.hdf - replace with HDF file.")
 
-RESULTS = {
-    API_KEY: {
-        key: load_lookahead(
-            window_size=120, lookahead=key, frequency=FREQUENCY,
-            start_time=get_time(FREQUENCY, START_TIME)
-        ) for key in (1, 2, 4, 8, 10)
+if PREDICTOR == "physics":
+    from .physics import PhysicsPredictor, SWAT_COLUMNS
+    PHYSICS = PhysicsPredictor(COLUMNS or SWAT_COLUMNS)
+    RESULTS = {}
+else:
+    RESULTS = {
+        API_KEY: {
+            key: load_lookahead(
+                window_size=120, lookahead=key, frequency=FREQUENCY,
+                start_time=get_time(FREQUENCY, START_TIME)
+            ) for key in (1, 2, 4, 8, 10)
+        }
     }
-}
 
 app = Flask(__name__)
 
@@ -54,6 +62,19 @@ def run_prediction():
 
     data = {}
     lookaheads = []
+    if PREDICTOR == "physics":
+        if api_key == API_KEY:
+            for desired_time, output in PHYSICS.predict_by_time(data_by_time, start_time, FREQUENCY).items():
+                lookahead = int(desired_time - start_time)
+                lookaheads_used.write("%i,%i\n" % (int(start_time), lookahead))
+                lookaheads.append(lookahead)
+                data[desired_time] = serialize(output)
+        return jsonify({
+            "timestamp": time.time(),
+            "lookahead": lookaheads,
+            "data": data
+        }), 200 if len(data) else 400
+
     for desired_time, _ in data_by_time.items():
         lookahead = int(desired_time - start_time)
         if api_key not in RESULTS or lookahead not in RESULTS[api_key]:
@@ -0,0 +1,125 @@
+"""
+A physics-based lookahead predictor: rolls the simulator's analytic plant
+model forward from the latest sensor vector of each window, instead of
+running a learned model. It is deterministic and takes microseconds per
+window, so it serves as a baseline for anomaly scoring and as a latency
+floor to benchmark the learned models against.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import os
+import sys
+
+sys.path.insert(1, os.path.realpath(os.path.join(__file__, "../../")))
+from simulator.swat import Plant, Comms, EnsemblePlant, SensorModel
+
+SWAT_COLUMNS: Tuple[str, ...] = (
+    "FIT101", "LIT101", "MV101", "P101", "P102",
+    "AIT201", "AIT202", "AIT203", "FIT201", "MV201", "P201", "P202", "P203", "P204", "P205", "P206",
+    "DPIT301", "FIT301", "LIT301", "MV301", "MV302", "MV303", "MV304", "P301", "P302",
+    "AIT401", "AIT402", "FIT401", "LIT401", "P401", "P402", "P403", "P404", "UV401",
+    "AIT501", "AIT502", "AIT503", "AIT504", "FIT501", "FIT502", "FIT503", "FIT504", "P501", "P502",
+    "PIT501", "PIT502", "PIT503",
+    "FIT601", "P601", "P602", "P603"
+)
+"""Sensor and actuator columns of the SWaT dataset, in its order"""
+
+OPEN, CLOSED, RUNNING = 2, 1, 2
+"""Values of open and closed valves, and of running pumps, in the SWaT dataset"""
+
+INITIAL_STATE: Tuple[float, ...] = (0.0, 0, 550, 550, 550, 200, 200)
+"""Plant state of the tanks without a level column, as the plant starts from"""
+
+class PhysicsPredictor:
+    """
+    Predicts the sensor vector `lookahead` seconds after the end of each
+    window, with the columns named by `columns` (SWaT names, e.g. "LIT101").
+
+    The actuators are held as they are at the end of the window, so the
+    tank levels change linearly, as with the plant's "analytic" integrator;
+    they are clipped to `level_bounds` if given. The flow, analyzer and
+    pressure readings in `SensorModel` move from their last values towards
+    those the predicted state and actuators give, with the lag of their
+    instruments. Every other column keeps its last value.
+
+    All windows of a request are predicted at once, as an `EnsemblePlant`
+    steps its instances.
+    """
+
+    def __init__(self, columns: Sequence[str] = SWAT_COLUMNS, level_bounds: Optional[Tuple[float, float]] = None):
+        self.columns = tuple(columns)
+        self.level_bounds = level_bounds
+        index = {name: i for i, name in enumerate(self.columns)}
+        # (column, state index) of the tank levels, e.g. LIT101 is h_t101
+        self.levels: List[Tuple[int, int]] = [
+            (index[name], Plant.TAG_NAMES.index("h_t" + name[3:]))
+            for name in index if name.startswith("LIT") and "h_t" + name[3:] in Plant.TAG_NAMES
+        ]
+        # (column, input index, value for which the input is set), e.g. MV101 is open for IOMV101_DI_ZSO
+        self.inputs: List[Tuple[int, int, float]] = []
+        for tag_name, input_index in EnsemblePlant.INPUTS.items():
+            name, _, tag = tag_name[2:].partition("_")
+            if name in index:
+                self.inputs.append((index[name], input_index, {"DI_Run": RUNNING, "DI_ZSO": OPEN, "DI_ZSC": CLOSED}[tag]))
+        # columns of the readings of `SensorModel`, and their rows in its arrays
+        self.sensor_columns: List[int] = [index[dev[2:]] for dev in SensorModel.SPECS if dev[2:] in index]
+        self.sensor_rows: List[int] = [i for i, dev in enumerate(SensorModel.SPECS) if dev[2:] in index]
+        self.gains = SensorModel.GAINS[self.sensor_rows].T
+        self.lags = SensorModel.LAGS[self.sensor_rows]
+
+    def get_plant(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the actuator inputs and plant state of each of `samples`,
+        as `(N, inputs)` and `(N, states)` arrays; see `EnsemblePlant`.
+        """
+
+        inputs = np.zeros((len(samples), len(Comms.REMOTE_TAG_NAMES)), dtype=bool)
+        for column, input_index, value in self.inputs:
+            inputs[:, input_index] = np.round(samples[:, column]) == value
+        state = np.tile(np.array(INITIAL_STATE, dtype=float), (len(samples), 1))
+        for column, state_index in self.levels:
+            state[:, state_index] = samples[:, column]
+        return inputs, state
+
+    def predict(self, windows: np.ndarray, lookahead: Union[float, np.ndarray]) -> np.ndarray:
+        """
+        Returns the predicted sensor vector of each of `windows`, as `(N, columns)`.
+        `windows` is `(N, ..., columns)`, e.g. `(N, window size, 1, columns)`
+        as the client sends them; only the last sample of each is used.
+        `lookahead` is in seconds, either for all windows or for each.
+        """
+
+        windows = np.asarray(windows, dtype=float)
+        samples = windows.reshape(len(windows), -1, len(self.columns))[:, -1]
+        lookahead = np.broadcast_to(np.asarray(lookahead, dtype=float), (len(samples),))[:, None]
+        inputs, state = self.get_plant(samples)
+        state += EnsemblePlant.get_rates(inputs) * lookahead
+        if self.level_bounds is not None:
+            np.clip(state[:, 2:], *self.level_bounds, out=state[:, 2:])
+
+        predicted = samples.copy()
+        for column, state_index in self.levels:
+            predicted[:, column] = state[:, state_index]
+        if len(self.sensor_columns):
+            columns = self.sensor_columns
+            targets = SensorModel.get_features(inputs, state) @ self.gains
+            predicted[:, columns] = targets + (samples[:, columns] - targets) * np.exp(-lookahead / self.lags)
+        return predicted
+
+    def predict_by_time(self, data_by_time: Dict[float, np.ndarray], start_time: float, frequency: float) -> Dict[int, np.ndarray]:
+        """
+        Predicts the sensor vector at each time of `data_by_time` after
+        `start_time`, from the window sent for that time. Times are in ticks
+        of `frequency` per second, as the client sends them.
+        """
+
+        times = [desired_time for desired_time in data_by_time if desired_time > start_time]
+        if not len(times):
+            return {}
+        windows = np.stack([data_by_time[desired_time] for desired_time in times])
+        lookaheads = (np.array(times) - start_time) / frequency
+        return {
+            int(desired_time): predicted
+            for desired_time, predicted in zip(times, self.predict(windows, lookaheads))
+        }
@@ -1,6 +1,6 @@
 from modbus.compat.builtins import bitarray
 from .base_hmi import BaseHMI
-from modbus.helpers import create_contiguous_states
+from modbus.helpers import create_contiguous_states, compile_states
 
 # these three belong mainly to scada / plc rather than fbd
 class HMI_phase:
@@ -12,7 +12,7 @@ class HMI_phase:
         self.TMP_High: bool = False
 
 class HMI_Ultrafiltration_Cycle(BaseHMI):
-    STATES = create_contiguous_states(1, 20, {
+    STATES = compile_states(create_contiguous_states(1, 20, {
         1: bitarray('00000'),
         4: bitarray('10000'),
         5: bitarray('00000'),
@@ -24,7 +24,7 @@ class HMI_Ultrafiltration_Cycle(BaseHMI):
         17: bitarray('00000'),
         18: bitarray('00010'),
         99: bitarray('00000')
-    })
+    }))
 
     def init_hmi(self, *args, **kwargs):
         self.UF_REFILL_SEC: int = 0
@@ -44,17 +44,14 @@ class HMI_Ultrafiltration_Cycle(BaseHMI):
         self._state: int = 0
 
     async def _main_loop(self, sec_pulse: bool, min_pulse: bool, hrs_pulse: bool, time_interval: float) -> None:
-        if self._state in HMI_Ultrafiltration_Cycle.STATES:
-            state_vars = (
-                self.UF_REFILL_SEC, self.UF_FILTRATION_MIN, 
-                self.BACKWASH_SEC, self.CIP_CLEANING_SEC, self.DRAIN_SEC
-            )
-            
-            self.UF_REFILL_SEC, self.UF_FILTRATION_MIN, self.BACKWASH_SEC, \
-                self.CIP_CLEANING_SEC, self.DRAIN_SEC = \
-                    (val * state_vars[i] for i, val in enumerate(
-                        HMI_Ultrafiltration_Cycle.STATES[self._state])
-                    )
+        state_data = HMI_Ultrafiltration_Cycle.STATES.get(self._state)
+        if state_data is not None:
+            refill, filtration, backwash, cleaning, drain = state_data
+            self.UF_REFILL_SEC *= refill
+            self.UF_FILTRATION_MIN *= filtration
+            self.BACKWASH_SEC *= backwash
+            self.CIP_CLEANING_SEC *= cleaning
+            self.DRAIN_SEC *= drain
             
             if not sec_pulse:
                 return
@@ -71,7 +68,7 @@ class HMI_Ultrafiltration_Cycle(BaseHMI):
 
 
 class HMI_ReverseOsmosis_Cycle(BaseHMI):
-    STATES = create_contiguous_states(1, 22, {
+    STATES = compile_states(create_contiguous_states(1, 22, {
          1: bitarray('000000000'),
          4: bitarray('010010000'),
          5: bitarray('000000000'),
@@ -82,7 +79,7 @@ class HMI_ReverseOsmosis_Cycle(BaseHMI):
         19: bitarray('001000000'),
         20: bitarray('100000000'),
         21: bitarray('000000011')
-    })
+    }))
 
     def init_hmi(self, *args, **kwargs):
         self.RO_TMP: float = 0.0
@@ -107,13 +104,13 @@ class HMI_ReverseOsmosis_Cycle(BaseHMI):
         self._state = 0
 
     async def _main_loop(self, sec_pulse: bool, min_pulse: bool, hrs_pulse: bool, time_interval: float) -> None:
-        if self._state in HMI_ReverseOsmosis_Cycle.STATES:
-            state_data = HMI_ReverseOsmosis_Cycle.STATES[self._state]
-            self.RO_HPP_SD_On = bool(state_data[0])
+        state_data = HMI_ReverseOsmosis_Cycle.STATES.get(self._state)
+        if state_data is not None:
+            self.RO_HPP_SD_On = state_data[0]
             self.FLUSHING_MIN *= state_data[1]
             self.RO_SD_FLUSHING_MIN *= state_data[2]
-            self.RO_HIGH_PUMP_Shutdown &= bool(state_data[3])
-            self.SD_FLUSHING_DONE_On &= bool(state_data[4])
+            self.RO_HIGH_PUMP_Shutdown &= state_data[3]
+            self.SD_FLUSHING_DONE_On &= state_data[4]
             self.MV501_TIMEOUT_TM *= state_data[5]
             self.MV502_TIMEOUT_TM *= state_data[6]
             self.MV503_TIMEOUT_TM *= state_data[7]
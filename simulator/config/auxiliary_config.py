@@ -1,6 +1,8 @@
 # TODO clean up the classes in this file
-from typing import Callable, Dict, Iterator, List, Tuple, TypedDict, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypedDict, Union
 from contextlib import contextmanager
+from modbus import TIME_INTERVAL
+from modbus.utils import get_phase_offset
 from .device_defs import *
 import ipaddress as ipy
 import configparser
@@ -217,6 +219,92 @@ class Scenario:
         
         return (get_next_port,) * 3
 
+class RateProfile:
+    """
+    The frequency (in Hz) of each kind of device, and of the rate groups
+    within them. A kind is a device runner command, optionally followed
+    by its type, e.g. "io", "fbd ain" or "scada 0"; the most specific kind
+    listed applies. Devices of kinds that are not listed run at the
+    default frequency of their runner.
+
+    Also sets the phase offset of each device within its period: the one
+    listed in `phases` for the device, or else one hashed from its name if
+    `stagger` is set. Offsets only hold for devices scheduled with
+    "--schedule deadline"; the others, micro runners included, are only
+    offset in their first cycle.
+    """
+
+    def __init__(self, rates: Dict[str, float], rate_groups: Dict[str, Dict[str, float]],
+        phases: Optional[Dict[str, float]] = None, stagger: bool = False
+    ):
+        self.rates = rates
+        self.rate_groups = rate_groups
+        self.phases = phases or {}
+        self.stagger = stagger
+
+    @staticmethod
+    def get_default() -> 'RateProfile':
+        """
+        Returns the profile in the [rates], [rate groups] and [phases]
+        sections of scenario.ini. Rate groups are listed as "<kind> <group>
+        = <Hz>", and phases as "<device name> = <s>".
+        """
+
+        confpath = os.path.realpath(os.path.join(__file__, "../scenario.ini"))
+        parser = configparser.ConfigParser()
+        parser.read(confpath)
+
+        rates: Dict[str, float] = {}
+        rate_groups: Dict[str, Dict[str, float]] = {}
+        if parser.has_section('rates'):
+            rates = {kind: float(value) for kind, value in parser.items('rates')}
+        if parser.has_section('rate groups'):
+            for key, value in parser.items('rate groups'):
+                kind, group = key.rsplit(' ', 1)
+                rate_groups.setdefault(kind, {})[group] = float(value)
+        phases: Dict[str, float] = {}
+        stagger = False
+        if parser.has_section('phases'):
+            stagger = parser.getboolean('phases', 'stagger', fallback=False)
+            phases = {name: float(value) for name, value in parser.items('phases') if name != 'stagger'}
+        return RateProfile(rates, rate_groups, phases, stagger)
+
+    @staticmethod
+    def get_kinds(cmd_args: Tuple) -> Tuple[str, ...]:
+        """Returns the kinds of a device's arguments, most specific first."""
+
+        command, *rest = (str(arg) for arg in cmd_args[:2])
+        if len(rest) and not rest[0].startswith('-'):
+            return (command + ' ' + rest[0], command)
+        return (command,)
+
+    def get_args(self, cmd_args: Tuple, with_groups: bool = True, name: str = "") -> Tuple[str, ...]:
+        """
+        Returns the runner arguments setting the rates and the phase of a
+        device with the given arguments and name. Rate groups are left out
+        if `with_groups` is False, since the micro runners do not support
+        them.
+        """
+
+        args: Tuple[str, ...] = ()
+        kinds = self.get_kinds(cmd_args)
+        rate = next((self.rates[kind] for kind in kinds if kind in self.rates), None)
+        if rate is not None:
+            args += ("--interval", str(1 / rate))
+        # the config parser lowercases keys
+        phase = self.phases.get(name.lower())
+        if phase is None and self.stagger and name:
+            phase = get_phase_offset(name, TIME_INTERVAL if rate is None else 1 / rate)
+        if phase:
+            args += ("--phase-offset", "{0:.6f}".format(phase))
+        if with_groups:
+            groups: Dict[str, float] = {}
+            for kind in reversed(kinds):
+                groups.update(self.rate_groups.get(kind, {}))
+            for group, group_rate in groups.items():
+                args += ("--rate-group", group, str(group_rate))
+        return args
+
 class DeviceMapping(TypedDict):
     name: str
     args: List[str]
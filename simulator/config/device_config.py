@@ -6,6 +6,7 @@ def create_device_config(
     scenario: Optional[Scenario] = None,
     starting_networks: Optional[Iterator[ipy.IPv4Network]] = None,
     external_ip: Optional[ipy.IPv4Address] = None,
+    rates: Optional[RateProfile] = None,
 ) -> Tuple[List[ExecutableNode], List[ipy.IPv4Network]]:
     if starting_networks is None:
         starting_networks = ipy.IPv4Network("192.168.0.0/24").subnets(new_prefix=NETMASK)
@@ -13,6 +14,8 @@ def create_device_config(
     
     if scenario is None:
         scenario = Scenario(*Scenario.get_default())
+    if rates is None:
+        rates = RateProfile.get_default()
     get_plc_ip, get_fbd_ip, get_io_ip = scenario()
 
     # commandline arguments are simplified by the fact that
@@ -39,8 +42,7 @@ def create_device_config(
                 MOTORISED_VALVE("MV101", get_fbd_ip(hosts), IO_MV(get_io_ip(hosts), connected=True)),
                 DUTY2("DTY101", get_fbd_ip(hosts)),
                 LEVEL_TRANSMITTER("LIT101", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), -15, 10, 0),
-                FLOW_TRANSMITTER("FIT101", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), 0, 1225, 0),
-                FLOW_TRANSMITTER("FIT201", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), -5, 4, 0)
+                FLOW_TRANSMITTER("FIT101", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), 0, 1225, 0)
             ])
             RTR101 = Router(router_ip, PLC101, name="RTR101")
 
@@ -65,7 +67,8 @@ def create_device_config(
                 DUTY2("DTY203", get_fbd_ip(hosts)),
                 LEVEL_TRANSMITTER("AIT201", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), 0, 1000, 0),
                 LEVEL_TRANSMITTER("AIT202", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), 0, 12, 2),
-                LEVEL_TRANSMITTER("AIT203", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), 0, 800, 0)
+                LEVEL_TRANSMITTER("AIT203", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), 0, 800, 0),
+                FLOW_TRANSMITTER("FIT201", get_fbd_ip(hosts), IO_AIN_FIT(get_io_ip(hosts)), -5, 4, 0)
             ])
             RTR201 = Router(router_ip, PLC201, name="RTR201")
 
@@ -183,7 +186,11 @@ def create_device_config(
             "IOLIT101", "IOLIT301", "IOLIT401", "IOLSL601", "IOLSH601", "IOLSL602", "IOLSH602", "IOP101",
             "IOP102",   "IOP301",   "IOP302",   "IOP401",   "IOP402",   "IOP501",   "IOP502",   "IOP601",   
             "IOP602",   "IOMV101",  "IOMV201",  "IOMV301",  "IOMV302",  "IOMV303",  "IOMV304",  "IOMV501",
-            "IOMV502",  "IOMV503",  "IOMV504"
+            "IOMV502",  "IOMV503",  "IOMV504",
+            # only used by the plant's sensor model
+            "IOFIT101", "IOFIT201", "IOAIT201", "IOAIT202", "IOAIT203", "IOFIT301", "IODPIT301", "IOAIT401",
+            "IOFIT401", "IOAIT402", "IOAIT501", "IOAIT502", "IOAIT503", "IOAIT504", "IOPIT501", "IOPIT502",
+            "IOPIT503", "IOFIT501", "IOFIT502", "IOFIT503", "IOFIT504"
         }
 
         # make the PlantNode its own device if the PlantNode as a Router does not work
@@ -198,7 +205,8 @@ def create_device_config(
                 runner = MICRO_IO_RUNNER if isinstance(device, IODevice) else MICRO_FBD_RUNNER
             else:
                 runner = DEVICE_RUNNER
-            device.cmd_args = (runner,) + device.cmd_args
+            rate_args = rates.get_args(device.cmd_args, with_groups=runner == DEVICE_RUNNER, name=device.name)
+            device.cmd_args = (runner,) + device.cmd_args + rate_args
 
     # TODO configure routes in topo.py
     return [ground_truth], conf.get_remaining_networks()
@@ -3,7 +3,7 @@ from typing import Dict, Optional, Tuple, Type, cast
 from modbus.types.remote import RemoteDeviceType
 # from HMI import HMI_mv
 from .base_fbd import FBD
-from logicblock import TONR
+from logicblock import TONR, create_timer
 from io_plc import IO_MV
 from modbus.base import BaseModbusDevice
 from modbus.tag import Tag
@@ -18,8 +18,8 @@ class MV_FBD(FBD):
 
         self.Cmd_Open: bool = Open
         self.Cmd_Close: bool = Close
-        self.TON_Close: TONR = TONR(Close_TM, self.device_frequency)
-        self.TON_Open: TONR  = TONR(Open_TM, self.device_frequency)
+        self.TON_Close: TONR = create_timer(Close_TM, self.device_frequency, self.timer_clock)
+        self.TON_Open: TONR  = create_timer(Open_TM, self.device_frequency, self.timer_clock)
 
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.IO = RemoteDeviceType("IO")
@@ -7,7 +7,7 @@ from .base_fbd import FBD
 from io_plc import IO_PMP_UV
 from modbus.base import BaseModbusDevice
 from modbus.tag import Tag
-from logicblock import TONR
+from logicblock import TONR, create_timer
 # from io_plc import IO_PMP_UV
 
 class PMP_FBD(FBD):
@@ -24,8 +24,8 @@ class PMP_FBD(FBD):
         self.RunHr:float  = RunHr
         self.Total_RunHr:float = RunHr
 
-        self.TON_Stop   = TONR(Stop_TM,  self.device_frequency)
-        self.TON_Start  = TONR(Start_TM, self.device_frequency)
+        self.TON_Stop   = create_timer(Stop_TM, self.device_frequency, self.timer_clock)
+        self.TON_Start  = create_timer(Start_TM, self.device_frequency, self.timer_clock)
         self.Cmd_Start: bool = False
         self.RunMin: float = 0.0
         self.Total_RunMin: float = 0.0
@@ -1,5 +1,5 @@
 from typing import Dict, Tuple, Type, cast
-from logicblock import TONR
+from logicblock import TONR, create_timer
 from io_plc import IO_SWITCH
 from modbus.base import BaseModbusDevice
 from modbus.tag import Tag
@@ -8,7 +8,7 @@ from .base_fbd import FBD
 
 class SWITCH_FBD(FBD):
     def init_fbd(self, Delay: int, *args, **kwargs) -> None: 
-        self.TON_Delay = TONR(Delay, self.device_frequency)
+        self.TON_Delay = create_timer(Delay, self.device_frequency, self.timer_clock)
 
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.IO = RemoteDeviceType("IO")
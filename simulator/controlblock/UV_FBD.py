@@ -6,7 +6,7 @@ from modbus.types.remote import RemoteDeviceType
 from .base_fbd import FBD
 from modbus.base import BaseModbusDevice
 from modbus.tag import Tag
-from logicblock import TONR
+from logicblock import TONR, create_timer
 # from io_plc import IO_PMP_UV
 
 class UV_FBD(FBD):
@@ -22,8 +22,8 @@ class UV_FBD(FBD):
         self.Total_RunHr:float = RunHr
         self.Shutdown: int = Shutdown
 
-        self.TON_Stop: TONR   = TONR(Stop_TM,  self.device_frequency)
-        self.TON_Start: TONR  = TONR(Start_TM, self.device_frequency)
+        self.TON_Stop: TONR   = create_timer(Stop_TM, self.device_frequency, self.timer_clock)
+        self.TON_Start: TONR  = create_timer(Start_TM, self.device_frequency, self.timer_clock)
         self.Cmd_Start: bool = False
 
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
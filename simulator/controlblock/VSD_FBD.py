@@ -1,5 +1,5 @@
 from typing import Dict, Optional, Tuple, Type, cast
-from logicblock import TONR
+from logicblock import TONR, create_timer
 from modbus.types.remote import RemoteDeviceType
 from modbus.compat.builtins import asyncio
 from .base_fbd import FBD
@@ -26,8 +26,8 @@ class VSD_FBD(FBD):
         self.Total_RunHr:float = RunHr
         self.Shutdown = Shutdown
         
-        self.TON_Stop: TONR  = TONR(Stop_TM, self.device_frequency)
-        self.TON_Start: TONR = TONR(Start_TM, self.device_frequency)
+        self.TON_Stop: TONR  = create_timer(Stop_TM, self.device_frequency, self.timer_clock)
+        self.TON_Start: TONR = create_timer(Start_TM, self.device_frequency, self.timer_clock)
         self.Total_RunMin:float = 0.0
         self.RunMin:float = 0.0
 
@@ -2,6 +2,7 @@ from typing import List, Tuple, Type, Union
 from modbus.base import BaseModbusDevice, BaseModbusClient
 from modbus.types.remote import RemoteDeviceType
 from modbus.tag import Tag
+from modbus.compat.builtins import Event, asyncio
 from logicblock import TONR
 
 class FBD(BaseModbusDevice):
@@ -15,9 +16,29 @@ class FBD(BaseModbusDevice):
     
     DEFAULT_RUN_TAG_LOC: int = 9000
 
+    CHECKPOINT_EXCLUDED = ("_fbd_lock", "driven", "ready")
+
     def __init__(self, *args, **kwargs):
+        """
+        Initializes the FBD. See `BaseModbusDevice` for the other arguments.
+
+        Arguments
+        ---------
+        driven  -   Whether this FBD is run in-process by the PLC that owns it (see
+                    `PLC.colocate_fbd()`) instead of by its own cycles. Its server
+                    and its clients to its I/O devices are still started, but it
+                    only runs when the PLC scans it, with the pulses the PLC adds.
+        """
+
         super().__init__(*args, **kwargs)
         self.debug: bool = kwargs.get("debug", False)
+        self.driven: bool = kwargs.get("driven", False)
+        # set once the FBD's clients have connected, and it can be run
+        self.ready = Event()
+        self._pending_pulses: Tuple[bool, bool, bool, float] = (False, False, False, 0.0)
+        # set once the FBD is run by scan requests, after which its cycles only accumulate pulses for them
+        self.scanned: bool = self.driven
+        self._fbd_lock = asyncio.Lock()
         self.init_fbd(*args, **kwargs)
 
     def init_fbd(self, *args, **kwargs) -> None:
@@ -30,9 +51,54 @@ class FBD(BaseModbusDevice):
         )
         return super().get_tags(*(tags + debug_tags))
     
+    async def run(self) -> None:
+        self.ready.set()
+        if not self.driven:
+            await super().run()
+            return
+        # the owning PLC runs this FBD from its own cycles, so it takes no part in the clock
+        self.scheduler.stop()
+        await self.exec_state.wait()
+
     async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
         if self.debug or self.get_tag_values(FBD.RUN_TAG):
-            await self._fbd_loop(sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs)
+            self.add_pulses(sec_pulse, min_pulse, hrs_pulse, time_interval)
+            async with self._fbd_lock:
+                await self._fbd_loop(*self._take_pulses(), **kwargs)
+        elif self.scanned:
+            self.add_pulses(sec_pulse, min_pulse, hrs_pulse, time_interval)
+        else:
+            # a stopped FBD resumes with the pulses of the cycle it resumes in, as before
+            self._take_pulses()
+
+    def add_pulses(self, sec_pulse: bool, min_pulse: bool, hrs_pulse: bool, time_interval: float) -> None:
+        """
+        Adds a cycle's pulses to those the FBD runs with next. Pulses are
+        only accumulated while the FBD is run on request (see `scan()`), so
+        that a pulse is not lost between requests; otherwise the FBD runs
+        with the pulses of each cycle.
+        """
+
+        sec, mins, hrs, interval = self._pending_pulses
+        self._pending_pulses = (sec or sec_pulse, mins or min_pulse, hrs or hrs_pulse, interval + time_interval)
+
+    def _take_pulses(self) -> Tuple[bool, bool, bool, float]:
+        pulses, self._pending_pulses = self._pending_pulses, (False, False, False, 0.0)
+        return pulses
+
+    async def scan(self) -> None:
+        """
+        Runs `_fbd_loop` once, right away. Used to answer scan requests, where
+        the requesting PLC writes its inputs, has this FBD run and reads back
+        the outputs in the same round trip; the FBD does not need its Run_FBD
+        tag set for this.
+        """
+
+        self.scanned = True
+        async with self._fbd_lock:
+            await self._fbd_loop(*self._take_pulses())
+            # the requesting PLC reads the outputs straight after this returns
+            self.commit_data_store()
 
     async def _fbd_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs):
         pass
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import argparse
 from argparse import Namespace, ArgumentParser
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 def get_var_args(args:Namespace, filter_items: set) -> Dict[str, Any]:
     return { 
@@ -9,21 +9,66 @@ def get_var_args(args:Namespace, filter_items: set) -> Dict[str, Any]:
         if arg not in filter_items
     }
 
-def run_generic_device(args:Namespace) -> None:
-    from modbus.helpers import start_device, get_remote_ips
+def create_generic_device(args:Namespace, **kwargs):
+    from modbus.helpers import get_remote_ips
 
     device_args = get_var_args(args, { 
         "run_device", "command", "type", "device_class",
         "host", "port", "remote_devices","io_delay",
-        "plc_delay", "fbd_delay", "scada_delay", "start_time"
+        "plc_delay", "fbd_delay", "scada_delay", "start_time", "fbd"
     })
+    device_args.update(kwargs)
 
-    device = args.device_class(
+    return args.device_class(
         start_time=args.start_time + args.plc_delay,
         remote_devices=get_remote_ips(args.remote_devices), **device_args
     )
+
+def run_generic_device(args:Namespace) -> None:
+    from modbus.helpers import start_device
+
+    device = create_generic_device(args)
     start_device(device, _host=args.host, _port=args.port)
 
+def create_plc_devices(args:Namespace, **kwargs):
+    """
+    Creates the PLC of `args`, and the FBDs given with its `--fbd` options,
+    which it runs in-process (see `PLC.colocate_fbd()`). Each FBD must be
+    one of the PLC's remote devices, at the host and port of its own
+    arguments. Returns the PLC, and each FBD with that host and port.
+    """
+
+    from modbus.base import BaseModbusClient
+    from modbus.helpers import get_remote_ips
+    from modbus.types import IPString
+    import shlex
+
+    parser = create_parser()
+    aliases = {
+        address if ':' in address else address + ":502": device_alias
+        for device_alias, address in get_remote_ips(args.remote_devices).items()
+    }
+    fbds = []
+    for fbd_argv in (shlex.split(fbd_args) for fbd_args in args.fbd):
+        fbd_args = parser.parse_args(fbd_argv)
+        if fbd_args.command != "fbd":
+            raise ValueError("--fbd takes the arguments of an FBD runner, not {0}".format(fbd_argv))
+        address = IPString("{0}:{1}".format(fbd_args.host, fbd_args.port))
+        if address not in aliases:
+            raise ValueError("FBD at {0} is not a remote device of the PLC".format(address))
+        # the FBDs are checkpointed, restored and recorded with the PLC, unless given their own
+        for option in ("checkpoint", "restore", "record"):
+            if getattr(fbd_args, option) is None:
+                setattr(fbd_args, option, getattr(args, option))
+        fbd = create_generic_device(fbd_args, **dict(kwargs, driven=True, record_argv=fbd_argv))
+        BaseModbusClient.register_local_device(address, fbd)
+        fbds.append((aliases[address], fbd, fbd_args.host, fbd_args.port))
+
+    plc = create_generic_device(args, **kwargs)
+    for device_alias, fbd, _, _ in fbds:
+        plc.colocate_fbd(device_alias, fbd)
+    return plc, [(fbd, host, port) for _, fbd, host, port in fbds]
+
 def create_fbd_runners(fbd_parser: ArgumentParser, parent_parser: ArgumentParser) -> None:
     from controlblock import MV_FBD, UV_FBD, AIN_FBD, VSD_FBD, Duty2_FBD, FIT_FBD, PMP_FBD, SWITCH_FBD
     from modbus.helpers import parse_negative_float, parse_negative_int
@@ -140,8 +185,19 @@ def create_io_runners(io_parser: ArgumentParser, parent_parser: ArgumentParser)
 def create_plc_runners(plc_parser: ArgumentParser, parent_parser: ArgumentParser) -> None:
     from plc import PLC1, PLC2, PLC3, PLC4, PLC5, PLC6
 
-    run_plc = run_generic_device
+    def run_plc(args:Namespace) -> None:
+        from modbus.helpers import start_device
+
+        plc, fbd_servers = create_plc_devices(args)
+        # the FBDs still serve their tags at their own addresses
+        start_device(plc, *(fbd for fbd, _, _ in fbd_servers), _host=args.host, _port=args.port, _servers=tuple(fbd_servers))
+
     plc_runners = plc_parser.add_subparsers(dest='type', required=True)
+    parent_parser = ArgumentParser(add_help=False, parents=[parent_parser])
+    parent_parser.add_argument("--scan-fbds", action="store_true", help="Runs each FBD with a single scan request (write inputs, run, read outputs) instead of setting Run_FBD. FBDs run with pycopy do not support this, and fall back to the default.")
+    parent_parser.add_argument("--pipelined", action="store_true", help="Overlaps each cycle's requests to the FBDs with the next cycle's logic, so that network and compute time do not add up. Outputs read back from FBDs are then one cycle old.")
+    parent_parser.add_argument("--refresh-outputs", default=200, type=int, metavar="SCANS", help="Number of scans after which the PLC writes all of its outputs again, and not only those which changed, to restore any that other clients overwrote. 0 only writes changes. Default 200 (1 s at 200 Hz)")
+    parent_parser.add_argument("--fbd", default=[], action="append", metavar="ARGS", help="Runs an FBD in this process, from this PLC's scans, instead of in its own runner: ARGS are that FBD's runner arguments, quoted, e.g. \"fbd mv --host 192.168.0.11 --port 503 --device-name MV101 ...\". It must be one of this PLC's --remote-devices, and still serves its tags at its own address. Can be given more than once. Not supported with pycopy.")
     ####PLC1
     plc1_runner = plc_runners.add_parser("1", parents=[parent_parser], description="PLC Stage 1 Runner")
     plc1_runner.set_defaults(device_class=PLC1, run_device=run_plc)
@@ -188,61 +244,130 @@ def create_scada_runners(scada_parser: ArgumentParser, parent_parser: ArgumentPa
     scadas6_runner = scada_runners.add_parser("6", parents=[parent_parser], description="PLC Stage 6 Runner")
     scadas6_runner.set_defaults(device_class=SCADAS6, run_device=run_scada)
 
+def get_plant_args(args:Namespace, **kwargs) -> Dict[str, Any]:
+    device_args = get_var_args(args, { 
+        "run_device", "command", "type", "device_class", "host", "port",
+        "remote_devices", "initial_state", "duration", "start_time",
+        "split_process", "poll_interval"
+    })
+    device_args.update(kwargs)
+    return device_args
+
+def create_plant(args:Namespace, **kwargs):
+    from swat import Plant
+
+    return Plant(
+        start_state=[0, 0] + args.initial_state, 
+        start_time=args.start_time + args.scada_delay,
+        duration=int(args.duration / args.interval), **get_plant_args(args, **kwargs)
+    )
+
+def create_poller(args:Namespace, shared_data_store, **kwargs):
+    from modbus.helpers import get_remote_ips
+    from swat import LivePoller
+
+    device_args = get_plant_args(args, **kwargs)
+    if args.poll_interval is not None:
+        device_args["interval"] = args.poll_interval
+    return LivePoller(
+        shared_data_store=shared_data_store, 
+        start_time=args.start_time + args.scada_delay,
+        remote_devices=get_remote_ips(args.remote_devices), **device_args
+    )
+
+def create_plant_devices(args:Namespace, **kwargs):
+    plant = create_plant(args, **kwargs)
+    poller = create_poller(args, plant.data_store, event=plant.exec_state, **kwargs)
+    return plant, poller
+
+def run_plant_process(args:Namespace, io_names: Tuple[str, str]) -> None:
+    """
+    Runs the plant physics on its own, exchanging inputs and state with the
+    poller through shared memory. See `swat.PlantIO`.
+    """
+
+    from modbus.compat.builtins import asyncio
+    from swat import PlantIO
+
+    shared_io = PlantIO(io_names)
+    try:
+        asyncio.run(create_plant(args, shared_io=shared_io).start())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shared_io.close()
+
 def create_plant_runner(plant_parser: argparse._SubParsersAction, parent_parser: ArgumentParser) -> None:
     from swat import Plant
     from modbus.base import BaseModbusDevice
     
     def run_plant(args:Namespace) -> None:
-        from modbus.helpers import start_device, get_remote_ips
-        from modbus.types import IPString
-        from swat import Plant, LivePoller
-        
-        device_args = get_var_args(args, { 
-            "run_device", "command", "type", "device_class", "host", "port",
-            "remote_devices", "initial_state", "duration", "start_time"
-        })
+        from modbus.helpers import start_device
+
+        if args.split_process:
+            run_split_plant(args)
+            return
 
         # start the plant and then the poller on the port above it
-        plant = Plant(
-            start_state=[0, 0] + args.initial_state, 
-            start_time=args.start_time + args.scada_delay,
-            duration=int(args.duration / args.interval), **device_args
-        )
-        poller = LivePoller(
-            event=plant.exec_state, shared_data_store=plant.data_store, 
-            start_time=args.start_time + args.scada_delay,
-            remote_devices=get_remote_ips(args.remote_devices), **device_args
-        )
+        plant, poller = create_plant_devices(args)
         start_device(plant, poller, _host=args.host, _port=args.port)
         
         # this will execute only after polling server stops
         plant.stop()
 
+    def run_split_plant(args:Namespace) -> None:
+        from modbus.helpers import start_device
+        from swat import PlantIO
+        import multiprocessing
+
+        shared_io = PlantIO()
+        physics = multiprocessing.Process(target=run_plant_process, args=(args, shared_io.get_names()), daemon=True)
+        physics.start()
+        try:
+            # the poller serves the same tags as the plant would, from its own data store
+            start_device(create_poller(args, None, shared_io=shared_io), _host=args.host, _port=args.port)
+        finally:
+            physics.terminate()
+            physics.join()
+            shared_io.close()
+            shared_io.unlink()
+
     plant_runner = plant_parser.add_parser("plant", description="SWaT Physical Process Simulator", parents=[parent_parser])
     plant_runner.add_argument("--initial-state", "-i", nargs=5, type=float, default=[550.0, 650, 500, 200, 200], help="List of values indicating start state. Default: 550 650 500 200 200") #[0, 0, 505,890,900,200,200]
     plant_runner.add_argument("--duration", "-]", default=BaseModbusDevice.HOUR_IN_SEC, type=int, help="Duration (seconds). Specify <=0 to run forever. Default {0}".format(BaseModbusDevice.HOUR_IN_SEC))
+    plant_runner.add_argument("--integrator", default="analytic", choices=Plant.INTEGRATORS, help="How the plant state is advanced every tick: exactly, from the rates of the current inputs (analytic), or by solving the ODE with scipy (solve_ivp), as a reference. Default: analytic")
+    plant_runner.add_argument("--level-bounds", default=None, nargs=2, type=float, metavar=("MIN", "MAX"), help="Clamps the tank levels to these bounds (in mm). Default: unbounded")
+    plant_runner.add_argument("--split-process", action="store_true", help="Runs the plant physics in a separate process from the poller, sharing inputs and state through shared memory, so that each runs at its own rate without delaying the other.")
+    plant_runner.add_argument("--deadband", default=[], nargs=3, action="append", metavar=("TAG", "ABSOLUTE", "RELATIVE"), help="Only writes a sensor tag (e.g. AI_Value, or IOLIT101.AI_Value) to its IO device when it moves by more than the larger of ABSOLUTE and RELATIVE times its last written value; turns on change filtering with the default deadbands for other tags. Can be given more than once.")
+    plant_runner.add_argument("--max-silence", default=0.0, type=float, help="With change filtering, writes unchanged sensor values again after this many seconds. Turns on change filtering. Default: 0 (never)")
+    plant_runner.add_argument("--sensor-model", action="store_true", help="Also writes the readings of the flow, analyzer and pressure transmitters (FIT, AIT, PIT and DPIT), derived from the plant state and the pump and valve states, with a first-order lag and noise.")
+    plant_runner.add_argument("--sensor-noise", default=1.0, type=float, help="Factor by which to scale the noise of --sensor-model. Default: 1")
+    plant_runner.add_argument("--sensor-seed", default=None, type=int, help="Seed of the noise of --sensor-model. Default: random")
+    plant_runner.add_argument("--poll-interval", default=None, type=float, help="Time period (in s) of the poller. Default: the same as --interval")
     plant_runner.set_defaults(device_class=Plant, run_device=run_plant)
 
 
-if __name__ == "__main__":
-    def run_main():
-        from modbus.helpers import create_full_parser
-        
-        socket_parser = create_full_parser(parser_desc="Auxiliary Runner", add_help=False)
+def create_parser() -> ArgumentParser:
+    from modbus.helpers import create_full_parser
+    
+    socket_parser = create_full_parser(parser_desc="Auxiliary Runner", add_help=False)
 
-        parser = ArgumentParser("SWaT Device Runner. Use this to run a number of SWaT devices, such as Function Block Diagrams, I/O devices or PLCs.")
-        parser.set_defaults(device_class=None, command=None, type=None, run_device=lambda args: None)
+    parser = ArgumentParser("SWaT Device Runner. Use this to run a number of SWaT devices, such as Function Block Diagrams, I/O devices or PLCs.")
+    parser.set_defaults(device_class=None, command=None, type=None, run_device=lambda args: None)
 
-        # device_runner.py <command> <class> -> device_runner.py fbd mv --open-tm (or) device_runner.py io pmp 
-        subparsers = parser.add_subparsers(dest='command', required=True)
-        
-        create_fbd_runners(subparsers.add_parser("fbd"), socket_parser)
-        create_io_runners(subparsers.add_parser("io"), socket_parser)
-        create_plc_runners(subparsers.add_parser("plc"), socket_parser)
-        create_scada_runners(subparsers.add_parser("scada"), socket_parser)
-        create_plant_runner(subparsers, socket_parser)
+    # device_runner.py <command> <class> -> device_runner.py fbd mv --open-tm (or) device_runner.py io pmp 
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    create_fbd_runners(subparsers.add_parser("fbd"), socket_parser)
+    create_io_runners(subparsers.add_parser("io"), socket_parser)
+    create_plc_runners(subparsers.add_parser("plc"), socket_parser)
+    create_scada_runners(subparsers.add_parser("scada"), socket_parser)
+    create_plant_runner(subparsers, socket_parser)
+    return parser
 
-        args = parser.parse_args()
+if __name__ == "__main__":
+    def run_main():
+        args = create_parser().parse_args()
         args.run_device(args)
 
     run_main()
\ No newline at end of file
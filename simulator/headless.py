@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Runs the whole plant - PLCs, FBDs, I/O devices, SCADA and the physical
+process - in a single process, without Mininet, sockets or subprocesses.
+
+Devices are built from `create_device_config()` with the same arguments
+they would be started with by `device_runner.py`, and reach each other's
+data stores directly instead of over Modbus TCP. All devices run in
+lockstep on a shared `VirtualClock`, so a run is deterministic and only
+takes as long as it takes to compute.
+
+Run from the repository root:
+
+    python3 -m simulator.headless --duration 600 --output trace.csv
+"""
+
+from argparse import ArgumentParser
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+from modbus.base import BaseModbusDevice, BaseModbusClient
+from modbus.utils import VirtualClock
+from modbus.types import IPString
+from modbus.tag import Tag
+from modbus.compat.builtins import asyncio, perf_counter
+from modbus.compat.modbus import ModbusServerContext
+from swat import Plant, Comms
+import shlex
+import sys
+
+class SteadyState:
+    """
+    Criteria for the plant having reached steady state: every tag in
+    `bands` (any tag of the plant, e.g. a tank level or an actuator's
+    `DI_Run`, as 0 or 1) has stayed within its `(low, high)` band for the
+    last `hold` seconds of simulated time.
+    """
+
+    LEVEL_BANDS: Dict[str, Tuple[float, float]] = {
+        "h_t101": (500, 800), "h_t301": (500, 800), "h_t401": (500, 800)
+    }
+    """Default bands: the tanks with level transmitters between their `SAL` and `SAH` setpoints"""
+
+    def __init__(self, bands: Optional[Dict[str, Tuple[float, float]]] = None, hold: float = 300.0):
+        self.bands = SteadyState.LEVEL_BANDS if bands is None else bands
+        self.tags = tuple(self.bands)
+        self.hold = hold
+        # simulated time since which every tag has been within its band
+        self.since: Optional[float] = None
+
+    def update(self, now: float, values: Tuple[Any, ...]) -> bool:
+        """
+        Takes the values of the tags in `bands` (in order) at `now`, and
+        returns whether the criteria are met.
+        """
+
+        if all(low <= value <= high for value, (low, high) in zip(values, self.bands.values())):
+            if self.since is None:
+                self.since = now
+            return now - self.since >= self.hold
+        self.since = None
+        return False
+
+class PlantTrace(BaseModbusDevice):
+    """
+    Records the state of the plant every `sample` seconds of simulated time
+    as CSV, and stops all devices once `length` seconds have been simulated,
+    or earlier once the plant reaches `steady` state, if given.
+    """
+
+    def __init__(self, plant: Plant, devices: List[BaseModbusDevice], output: TextIO, sample: float = 1.0, length: float = 60.0,
+        steady: Optional[SteadyState] = None, *args, **kwargs
+    ):
+        self.plant = plant
+        self.devices = devices
+        self.output = output
+        self.sample = sample
+        self.length = length
+        self.steady = steady
+        self.next_sample = 0.0
+        # wall-clock time of the first cycle, once it has run
+        self.first_cycle: Optional[float] = None
+        # simulated time at which the plant reached steady state, if it did
+        self.steady_time: Optional[float] = None
+        super().__init__(*args, **kwargs)
+
+    def create_context(self) -> ModbusServerContext:
+        return self.plant.data_store
+
+    @classmethod
+    def get_tags(cls, *tags: Tag) -> Tuple[Tag, ...]:
+        return Plant.get_tags(*tags)
+
+    def write_header(self) -> None:
+        self.output.write(','.join(("time",) + Plant.TAG_NAMES + ("state",)) + '\n')
+
+    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
+        if self.first_cycle is None:
+            self.first_cycle = perf_counter()
+        now = self.counter.get_elapsed()
+        if now >= self.next_sample:
+            self.next_sample += self.sample
+            state = ''.join(str(int(value)) for value in self.get_tag_values(*Comms.REMOTE_TAG_NAMES))
+            values = ("{0:.3f}".format(now),) + tuple(str(value) for value in self.get_tag_values(*Plant.TAG_NAMES))
+            self.output.write(','.join(values + (state,)) + '\n')
+        if self.steady is not None:
+            # a single tag's value is not returned in a tuple
+            values = self.get_tag_values(self.steady.tags) if len(self.steady.tags) > 1 else (self.get_tag_values(self.steady.tags),)
+            if self.steady.update(now, values):
+                self.steady_time = now
+        if now >= self.length or self.steady_time is not None:
+            for device in self.devices:
+                device.stop()
+            self.stop()
+
+def create_headless_devices(clock: VirtualClock, config: Optional[List[Any]] = None, colocate_fbds: bool = False, **kwargs) -> Tuple[Plant, List[BaseModbusDevice]]:
+    """
+    Creates every device in the device configuration (by default, the one
+    returned by `create_device_config()`) on the shared `clock`. Returns
+    the plant and the list of all devices, in a fixed order.
+
+    If `colocate_fbds`, each PLC runs the FBDs among its remote devices
+    in-process, as if they were given to its runner with `--fbd`, rather
+    than the FBDs running on their own cycles; see `PLC.colocate_fbd()`.
+
+    Keyword arguments are passed to every device.
+    """
+
+    from config import create_device_config, walk_devices, NETMASK
+    from config.auxiliary_config import Scenario
+    from device_runner import create_parser, create_generic_device, create_plant_devices, create_plc_devices
+    from modbus.helpers import get_remote_ips
+    import ipaddress as ipy
+
+    if config is None:
+        # micro mode is turned off so that every device uses the device runner's arguments;
+        # the addresses are only used as keys, so any network large enough will do
+        scenario_type, _ = Scenario.get_default()
+        config, _ = create_device_config(
+            Scenario(scenario_type, micro_mode=False),
+            starting_networks=ipy.IPv4Network("10.0.0.0/16").subnets(new_prefix=NETMASK)
+        )
+
+    parser = create_parser()
+    devices: List[BaseModbusDevice] = []
+    plant: Optional[Plant] = None
+    seen: Set[int] = set()
+    argvs: List[List[str]] = []
+    for node in walk_devices(config):
+        # the SCADA stages list the devices of their stage too, so some nodes are walked twice
+        if not node.has_args() or id(node) in seen:
+            continue
+        seen.add(id(node))
+        # the first argument is the runner itself
+        argvs.append(shlex.split(node.get_args())[1:])
+    parsed = [parser.parse_args(argv) for argv in argvs]
+
+    # the FBDs run by a PLC are given to it, and not created on their own
+    colocated: Set[str] = set()
+    if colocate_fbds:
+        fbd_argvs = {
+            "{0}:{1}".format(args.host, args.port): argv
+            for argv, args in zip(argvs, parsed) if args.command == "fbd"
+        }
+        for index, args in enumerate(parsed):
+            if args.command != "plc":
+                continue
+            for address in get_remote_ips(args.remote_devices).values():
+                address = address if ':' in address else address + ":502"
+                if address in fbd_argvs and address not in colocated:
+                    colocated.add(address)
+                    argvs[index] = argvs[index] + ["--fbd", " ".join(shlex.quote(arg) for arg in fbd_argvs[address])]
+            parsed[index] = parser.parse_args(argvs[index])
+
+    for argv, args in zip(argvs, parsed):
+        address = IPString("{0}:{1}".format(args.host, args.port))
+        if address in colocated:
+            continue
+        device_args = dict(kwargs, clock=clock, record_argv=argv)
+        if args.command == "plant":
+            plant, poller = create_plant_devices(args, log_changes=False, **device_args)
+            new_devices: Tuple[BaseModbusDevice, ...] = (plant, poller)
+        elif args.command == "plc":
+            plc, fbd_servers = create_plc_devices(args, **device_args)
+            new_devices = (plc,) + tuple(fbd for fbd, _, _ in fbd_servers)
+        else:
+            new_devices = (create_generic_device(args, **device_args),)
+        BaseModbusClient.register_local_device(address, new_devices[0])
+        devices.extend(new_devices)
+
+    if plant is None:
+        raise ValueError("Device configuration does not contain a plant")
+    return plant, devices
+
+async def run_headless(duration: float, interval: float = BaseModbusDevice.TIME_INTERVAL, sample: float = 1.0, output: TextIO = sys.stdout,
+    checkpoint: Optional[str] = None, restore: Optional[str] = None, steady: Optional[SteadyState] = None, **kwargs
+) -> float:
+    """
+    Simulates the plant for `duration` seconds and writes its trace to
+    `output`. Returns the speed of the simulation relative to real time.
+    If any device fails, every device is stopped and its exception raised.
+
+    If `restore` is given, every device starts from its slice of that
+    checkpoint file (the simulated time restarts from 0), and if
+    `checkpoint` is given, a checkpoint of every device is written to it
+    at the end of the run. See `modbus.checkpoint`.
+
+    If `steady` is given, the run ends as soon as the plant reaches steady
+    state, which makes a warm-up for networked devices: run with a coarse
+    `interval` and `timers="clock"` until steady, write a `checkpoint`, and
+    start the device runners with `--restore` from it.
+    """
+
+    clock = VirtualClock(interval)
+    plant, devices = create_headless_devices(clock, **kwargs)
+    trace = PlantTrace(plant, devices, output, sample, duration, steady, clock=clock)
+    trace.write_header()
+
+    start_time = perf_counter()
+    if restore is not None:
+        from modbus.checkpoint import read_checkpoint, restore_devices
+        restore_devices(read_checkpoint(restore), devices)
+        restored_time = perf_counter()
+    tasks = [asyncio.create_task(device.start()) for device in devices + [trace]]
+    try:
+        await asyncio.gather(*tasks)
+    except Exception:
+        # the trace of a plant missing a device is meaningless, so a device that fails ends the run
+        for device in devices + [trace]:
+            device.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    end_time = perf_counter()
+    if restore is not None and trace.first_cycle is not None:
+        print("restored {0} devices from {1} in {2:.1f} ms, running after {3:.1f} ms".format(
+            len(devices), restore, (restored_time - start_time) * 1e3, (trace.first_cycle - start_time) * 1e3
+        ), file=sys.stderr)
+    if steady is not None:
+        if trace.steady_time is None:
+            print("plant did not reach steady state in {0} s".format(duration), file=sys.stderr)
+        else:
+            print("plant reached steady state after {0:.1f} s ({1:.1f} s of real time)".format(
+                trace.steady_time, end_time - start_time
+            ), file=sys.stderr)
+            duration = trace.steady_time
+    if checkpoint is not None:
+        from modbus.checkpoint import save_devices
+        size = save_devices(checkpoint, devices)
+        print("wrote checkpoint of {0} devices to {1} ({2} bytes) in {3:.1f} ms".format(
+            len(devices), checkpoint, size, (perf_counter() - end_time) * 1e3
+        ), file=sys.stderr)
+    return duration / (end_time - start_time)
+
+if __name__ == "__main__":
+    def run_main():
+        parser = ArgumentParser(description="Headless SWaT Simulator. Runs every device and the physical process in one process, in lockstep, as fast as possible.")
+        parser.add_argument("--duration", "-t", default=60.0, type=float, help="Simulated time (in s) to run for. Default 60")
+        parser.add_argument("--interval", "-v", default=BaseModbusDevice.TIME_INTERVAL, type=float, help="Simulated time (in s) per cycle of every device. Default: 0.005 s (200Hz)")
+        parser.add_argument("--sample", default=1.0, type=float, help="Simulated time (in s) between rows of the plant trace. Default 1")
+        parser.add_argument("--output", "-o", default=None, type=str, help="File to write the plant trace to, as CSV. Default: stdout")
+        parser.add_argument("--scan-fbds", action="store_true", help="Has the PLCs run each FBD with a single scan request instead of setting Run_FBD.")
+        parser.add_argument("--colocate-fbds", action="store_true", help="Has each PLC run its FBDs in-process from its own scans, as with the PLC runner's --fbd, instead of the FBDs running on their own cycles.")
+        parser.add_argument("--checkpoint", default=None, type=str, help="File to write a checkpoint of every device to at the end of the run.")
+        parser.add_argument("--restore", default=None, type=str, help="Checkpoint file to start every device from, e.g. one written with --checkpoint.")
+        parser.add_argument("--record", default=None, type=str, help="Directory to which to write a recording of every device's traffic at the end of the run, for replaying one device on its own with `replay.py`.")
+        parser.add_argument("--timers", default="cycles", choices=["cycles", "clock"], help="Whether PLC timers count cycles or measure simulated time; use clock with an --interval other than 0.005. Default: cycles")
+        parser.add_argument("--until-steady", action="store_true", help="Ends the run (at the latest after --duration) once the plant reaches steady state; see --steady and --hold. "
+                                                                       "To warm up the networked devices, also pass e.g. '--interval 0.5 --timers clock --checkpoint warm.ckpt', and start them with --restore warm.ckpt.")
+        parser.add_argument("--steady", default=None, nargs=3, action="append", metavar=("TAG", "LOW", "HIGH"), help="Band a plant tag must stay within for steady state; may be repeated. Default: h_t101, h_t301 and h_t401 between 500 and 800")
+        parser.add_argument("--hold", default=300.0, type=float, help="Simulated time (in s) every --steady band must hold for. Default 300")
+        args = parser.parse_args()
+
+        steady: Optional[SteadyState] = None
+        if args.until_steady:
+            bands = None if args.steady is None else {tag: (float(low), float(high)) for tag, low, high in args.steady}
+            steady = SteadyState(bands, args.hold)
+        output = sys.stdout if args.output is None else open(args.output, 'w')
+        try:
+            speed = asyncio.run(run_headless(
+                args.duration, args.interval, args.sample, output, args.checkpoint, args.restore, steady,
+                scan_fbds=args.scan_fbds, colocate_fbds=args.colocate_fbds, timers=args.timers, record=args.record
+            ))
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        print("simulated at {0:.1f}x real time".format(speed), file=sys.stderr)
+
+    run_main()
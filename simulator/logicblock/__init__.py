@@ -1,8 +1,9 @@
-from .logicblock import ALM, TONR, SCL, XSETD, create_bitarray
+from .logicblock import ALM, TONR, ClockTONR, SCL, XSETD, create_bitarray, create_timer
 from .logicblock import bit_2_signed_integer, signed_integer_2_bit
 
 __all__ = [
     "bit_2_signed_integer", "signed_integer_2_bit",
-    "ALM", "TONR", "SCL", "XSETD", "create_bitarray"
+    "ALM", "TONR", "ClockTONR", "SCL", "XSETD", "create_bitarray",
+    "create_timer"
 ]
 #In this package we define some useful functions that flotech uses.
@@ -1,4 +1,4 @@
-from typing import Literal, Optional, Tuple
+from typing import Callable, Literal, Optional, Tuple
 from modbus.compat.builtins import bitarray, int2ba, ba2int
 import sys
 
@@ -28,6 +28,7 @@ class TONR:
 		# multiply by `frequency` to count every `frequency`
 		# times in a second (200Hz => 5 miliseconds)
 		self.preset: int = preset * frequency
+		self.frequency: int = frequency
 		self.DN: bool = False
 		self.Acc: int = 0
 
@@ -42,6 +43,65 @@ class TONR:
 			else:
 				self.Acc = 0
 
+	def reset(self):
+		self.Acc = 0
+		self.DN = False
+
+	def get_elapsed(self) -> float:
+		"""Returns the accumulated time in seconds, whichever way it is counted."""
+		return self.Acc / self.frequency
+
+	def set_elapsed(self, elapsed: float, done: bool):
+		self.Acc = round(elapsed * self.frequency)
+		self.DN = done
+
+class ClockTONR(TONR):
+	"""
+	PLC On delay timer that accumulates elapsed time, read from `clock`
+	on every tick, instead of counting ticks. Unlike `TONR`, its timing
+	does not depend on the device achieving its nominal frequency.
+	"""
+
+	def __init__(self, preset: float, clock: Callable[[], float]):
+		self.preset: float = preset
+		self.clock = clock
+		self.DN: bool = False
+		self.Acc: float = 0.0
+		self._last_time: Optional[float] = None
+
+	def tick(self, TimerEnable: bool):
+		now = self.clock()
+		elapsed = 0.0 if self._last_time is None else now - self._last_time
+		self._last_time = now
+		if self.Acc >= self.preset:
+			self.Acc = 0.0
+			self.DN = True
+		else:
+			self.DN = False
+			if TimerEnable:
+				self.Acc += elapsed
+			else:
+				self.Acc = 0.0
+
+	def get_elapsed(self) -> float:
+		return self.Acc
+
+	def set_elapsed(self, elapsed: float, done: bool):
+		self.Acc = elapsed
+		self.DN = done
+		# the clock may not be the one the timer was saved with
+		self._last_time = None
+
+def create_timer(preset: int, frequency: int = 200, clock: Optional[Callable[[], float]] = None) -> TONR:
+	"""
+	Creates a `ClockTONR` if a clock is given, or a cycle counting `TONR`
+	otherwise. See `BaseModbusDevice.timer_clock`.
+	"""
+
+	if clock is None:
+		return TONR(preset, frequency)
+	return ClockTONR(preset, clock)
+
 def create_bitarray(size: int, default_value: Literal[0, 1]) -> bitarray:
     ba = bitarray(size, endian=sys.byteorder)
     ba.setall(default_value)
@@ -1,17 +1,18 @@
 #!/usr/bin/env python3
 
-from typing import Any, Callable, Coroutine, Iterator, List, Optional, Tuple, Type, Dict, Union, cast, overload
+from typing import Any, Callable, Coroutine, FrozenSet, Iterator, List, Optional, Tuple, Type, Dict, Union, cast, overload
 from .helpers import get_standalone_tags, create_identification, get_contiguous_tags
-from .utils import BaseCounter, RealtimeCounter, SimCounter
+from .utils import BaseCounter, RealtimeCounter, SimCounter, EwmaScheduler, VirtualClock, RateGroup, IdleMonitor, WatchedSlaveContext, LoopStats, create_scheduler
 from .tag import PayloadBuilder, PayloadDecoder, Tag, SkipTag, T
 from .compat.builtins import time, perf_counter
 from .compat import IS_PYCOPY
 from .types import RegisterValue, ModbusRegisterData, Registers, IPString
-from .types.remote import RemoteDeviceType, RemoteDeviceMapping
+from .types.remote import RemoteDeviceType, RemoteDeviceMapping, ContiguousTagSet
 from .compat.modbus import ModbusDeviceIdentification, ModbusServerContext, ModbusSlaveContext
 from .compat.modbus import ModbusSparseDataBlock, AsyncModbusClient, ModbusClient
-from .compat.modbus import encode_coils, decode_coils, encode_registers, decode_registers
+from .compat.modbus import encode_coils, decode_coils, encode_registers, decode_registers, scan_device
 from .compat.builtins import Event, sleep, asyncio
+from .buffered import DoubleBufferedDataBlock, BufferedStoreView
 
 AsyncRecurringCall = Callable[[bool, bool, bool, float], Coroutine[None, None, Optional[bool]]]
 
@@ -28,8 +29,33 @@ class BaseModbusDevice:
     Tag that measures the frequency of this device.
     """
 
+    STATS_TAGS: Tuple[str, ...] = ("__debug_overruns", "__debug_max_us", "__debug_p99_us") + tuple(
+        "__debug_hist_{0}".format(bucket) for bucket in range(len(LoopStats.BUCKETS) + 1)
+    )
+    """
+    Tags with the timing statistics of this device's `_main_loop`, updated
+    every second: the number of overruns, the longest and the (estimated)
+    99th percentile duration in microseconds, and the number of cycles in
+    each bucket of `LoopStats.BUCKETS`. See `modbus.utils.LoopStats`.
+    """
+
+    RATE_GROUPS: Dict[str, float] = {}
+    """
+    Default interval (in s) of each rate group of this device, i.e. each
+    part of its cycle that can run slower than the device itself. Groups
+    not listed here run every cycle. See `modbus.utils.RateGroup`.
+    """
+
+    CHECKPOINT_EXCLUDED: Tuple[str, ...] = ()
+    """
+    Attributes of this device which are not part of its state, and so are
+    left out of its checkpoints, e.g. locks, tasks or shared memory. See
+    `get_checkpoint()`.
+    """
+
     DEFAULT_DEBUG_CYCLES_LOC: int = 9000
     DEFAULT_DEBUG_FREQ_LOC: int = 9004
+    DEFAULT_DEBUG_STATS_LOC: int = 9006
 
     def __init__(self, interval: float = TIME_INTERVAL,
         time_scale: float = 1.0, duration: int = HOUR_IN_SEC, *args, **kwargs
@@ -39,6 +65,12 @@ class BaseModbusDevice:
 
         Arguments
         ---------
+        double_buffered
+                    -   Whether the device's own writes are buffered and committed to its
+                        data store at the end of each cycle, so that Modbus requests never
+                        see a cycle's tags half-written. Off by default; ignored on pycopy.
+                        See `modbus.buffered.DoubleBufferedDataBlock`.
+
         event       -   An event flag used by `__main__` to stop the device. 
                         Could be swapped out for a call to `stop()` if made internal.
 
@@ -54,10 +86,84 @@ class BaseModbusDevice:
 
         Other Parameters
         ----------------
+        checkpoint  -   A directory to which the device runner writes a checkpoint of
+                        its devices on SIGUSR1, as `<name>:<class>.ckpt`. Checkpoints
+                        written by several runners can be merged into one with
+                        `python3 -m modbus.checkpoint`. Not supported with pycopy.
+
+        restore     -   A checkpoint file to restore this device's state from when it
+                        starts, instead of starting from its initial state. See
+                        `get_checkpoint()`. Not supported with pycopy.
+
+        record      -   A directory to which to write a recording of this device's
+                        traffic when it stops, as `<name>:<class>.rec`, for replaying
+                        it on its own; see `modbus.recording`. Not supported with pycopy.
+
+        record_argv -   The device runner arguments this device was created with, which
+                        are saved in its recording. Default: those of this process.
+
         debug       -   Enables debug mode, the effects of which can vary from device
                         to device. For example, FBDs can run without needing a signal
                         when in debug mode.
 
+        schedule    -   How each cycle is scheduled: "ewma" (default) sleeps for the
+                        interval minus the average loop time, while "deadline" sleeps
+                        until absolute deadlines of `t0 + k * interval`, which avoids
+                        frequency drift. See `modbus.utils.DeadlineScheduler`.
+
+        overrun_policy
+                    -   What the "deadline" schedule does when a cycle overruns its
+                        deadline: "skip" (default) or "catch-up".
+
+        busy_wait   -   Time in seconds at the end of each "deadline" wait which is
+                        spent busy-waiting instead of sleeping. Default 0.
+
+        clock       -   A `modbus.utils.VirtualClock` shared with other devices in
+                        the same process. If given, the device runs in lockstep with
+                        them, one cycle per clock tick, and its counter reads the
+                        virtual time instead of the system clock. `interval` is
+                        rounded to a whole number of clock ticks, and the device
+                        runs once every that many ticks. Overrides `schedule`.
+
+        rate_group  -   A list of (name, frequency) pairs overriding the intervals of
+                        the device's `RATE_GROUPS`.
+
+        idle_after  -   The number of cycles in a row that must leave the device's tags
+                        unchanged before it drops to the idle rate; 0 (default) never
+                        idles. An idle device returns to full rate on any incoming
+                        write that changes its tags, or on a cycle that changes them,
+                        e.g. after polling its inputs. Cycle-counting timers run slow
+                        while idle, so `timers` should be "clock" if this is used.
+                        Ignored with a `clock` or a `time_scale` other than 1.
+
+        idle_interval
+                    -   The time in seconds between cycles of an idle device. Default 0.1.
+
+        watchdog_overruns
+                    -   The number of overruns in a second above which the watchdog
+                        acts; 0 (default) disables the watchdog. See `on_watchdog()`.
+
+        watchdog_action
+                    -   What the watchdog does: "log" (default) prints a warning, while
+                        "degrade" also doubles the interval of the device's scheduler,
+                        up to 1 s. Cycle-counting timers run slow once degraded.
+
+        phase_offset
+                    -   The offset (in s) from `start_time`, within the device's period,
+                        at which its cycles start, to keep devices with the same period
+                        from running their cycles, and their requests, at the same time.
+                        The first cycle waits for its phase, which only the "deadline"
+                        schedule keeps to; under "ewma" the cycles drift from it.
+                        Default 0; the launcher sets it from
+                        `modbus.utils.get_phase_offset`. Ignored with a `clock`, whose
+                        devices run in lockstep.
+
+        timers      -   How the device's PLC timers measure time: "cycles" (default)
+                        counts one tick per cycle at the nominal frequency, while
+                        "clock" accumulates the elapsed time of the device's counter,
+                        so timers stay accurate when cycles are late or jittery. See
+                        `logicblock.create_timer`.
+
         unit_id     -   The unit/slave id for this device. Depends on the context that
                         you are initializing; if a modbus device shares its context
                         with another modbus device, then they would share the same unit
@@ -69,6 +175,11 @@ class BaseModbusDevice:
         """
 
         super().__init__()
+        # attributes set up here are the device's configuration and runtime, not its state
+        own_attributes = set(self.__dict__)
+        self.clock: Optional[VirtualClock] = kwargs.get("clock")
+        if self.clock is not None:
+            interval = max(1, round(interval / self.clock.interval)) * self.clock.interval
         self.logger = kwargs.get("logger")
         self.interval: float = interval
         self.unit_id: int = kwargs.get("unit_id", 1)
@@ -76,14 +187,46 @@ class BaseModbusDevice:
         self.exec_state: Event = kwargs.get("event", Event())
         self.identification: ModbusDeviceIdentification = self.create_identification()
         self.tag_database: Dict[str, Tag] = self.create_tag_database()
+        self.double_buffered: bool = kwargs.get("double_buffered", False) and not IS_PYCOPY
         self.data_store: ModbusServerContext = self.create_context()
+        self._buffered_store: Optional[BufferedStoreView] = None
+        if self.double_buffered:
+            self._buffered_store = BufferedStoreView(self.get_data_store())
         self.start_time: float = kwargs.get("start_time", time())
+        self.phase_offset: float = kwargs.get("phase_offset", 0.0) if self.clock is None else 0.0
         self.name = kwargs.get("device_name", "")
+        self.checkpoint_dir: Optional[str] = kwargs.get("checkpoint")
+        self.restore_path: Optional[str] = kwargs.get("restore")
         self._debug_prev_cycles: int = 0
         self._debug_cycles: int = 0
+        self._tag_sets: Dict[Tuple[str, ...], ContiguousTagSet[Tag]] = {}
+        self._watched_tags: Optional[Tuple[str, ...]] = None
 
-        Timer: Type[BaseCounter] = RealtimeCounter if time_scale == 1.0 or interval == 0 else SimCounter
-        self.counter: BaseCounter = Timer(duration, self.interval)
+        if self.clock is not None:
+            # one cycle per tick, so cycle-counting timers also measure virtual time
+            self.counter: BaseCounter = RealtimeCounter(duration, clock=self.clock.now)
+        else:
+            Timer: Type[BaseCounter] = RealtimeCounter if time_scale == 1.0 or interval == 0 else SimCounter
+            self.counter = Timer(duration, self.interval)
+        self.scheduler: EwmaScheduler = create_scheduler(self.interval,
+            kwargs.get("schedule", "ewma"), kwargs.get("overrun_policy", "skip"), 
+            kwargs.get("busy_wait", 0.0), self.clock
+        )
+        rate_intervals = dict(self.RATE_GROUPS)
+        rate_intervals.update((name, 1 / float(frequency)) for name, frequency in kwargs.get("rate_group") or ())
+        self.rate_groups: Dict[str, RateGroup] = {
+            name: RateGroup(group_interval) for name, group_interval in rate_intervals.items()
+        }
+        self.loop_stats = LoopStats(self.interval)
+        self.watchdog_overruns: int = kwargs.get("watchdog_overruns", 0)
+        self.watchdog_action: str = kwargs.get("watchdog_action", "log")
+        idle_after: int = kwargs.get("idle_after", 0)
+        self.idle_monitor: Optional[IdleMonitor] = None
+        if idle_after > 0 and self.clock is None and time_scale == 1.0:
+            self.idle_monitor = IdleMonitor(idle_after, kwargs.get("idle_interval", 0.1))
+            self._watch_writes(self.idle_monitor)
+        # clock used by retentive timers, or None if they count cycles instead
+        self.timer_clock: Optional[Callable[[], float]] = self.counter.get_elapsed if kwargs.get("timers", "cycles") == "clock" else None
 
         device_classes = self.get_device_classes()
         if len(device_classes):
@@ -93,16 +236,40 @@ class BaseModbusDevice:
             self._init_client = client.init_device_map
             self.ask_device = client.ask_device
             self.tell_device = client.tell_device
+            self.scan_device = client.scan_device
         else:
             self._init_client = None
+        self.record_dir: Optional[str] = kwargs.get("record")
+        # a `modbus.recording.Recorder`, if this device's traffic is recorded
+        self.recorder: Optional[Any] = None
+        if self.record_dir is not None:
+            from .recording import Recorder
+            import sys
+            self.recorder = Recorder(self, kwargs.get("record_argv", sys.argv[1:]))
         self._init_complete = True
+        self._base_attributes: FrozenSet[str] = frozenset(self.__dict__).difference(own_attributes).union(("_base_attributes",))
 
     async def start(self):
         await sleep(max(0, self.start_time - time()))
         print("started", type(self).__name__, "at time", time())
+        if self.restore_path is not None:
+            from .checkpoint import read_checkpoint, restore_devices
+            restore_start = perf_counter()
+            restore_devices(read_checkpoint(self.restore_path), (self,))
+            print("restored", self.name, type(self).__name__, "from", self.restore_path, "in {0:.1f} ms".format((perf_counter() - restore_start) * 1e3))
         if self._init_client is not None:
             await self._init_client()
-        await self.run()
+        if self.recorder is None:
+            await self.run()
+            return
+        self.recorder.hook_clients()
+        try:
+            await self.run()
+        finally:
+            from .checkpoint import get_key
+            import os
+            path = os.path.join(cast(str, self.record_dir), "{0}.rec".format(get_key(self)))
+            print("wrote recording of", len(self.recorder.events), "events to", path, "({0} bytes)".format(self.recorder.save(path)))
 
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         """
@@ -181,23 +348,83 @@ class BaseModbusDevice:
 
         pass
 
+    def _watch_writes(self, monitor: IdleMonitor) -> None:
+        """
+        Wraps this device's slave context in a `WatchedSlaveContext`, so that
+        writes by other devices wake `monitor` if they change its values.
+        """
+
+        self.data_store[self.unit_id] = WatchedSlaveContext(self.get_data_store(), monitor)
+
+    def _get_watched_values(self) -> Tuple[RegisterValue, ...]:
+        if self._watched_tags is None:
+            self._watched_tags = tuple(
+                name for name in self.tag_database
+                if name not in (BaseModbusDevice.CYCLES_TAG, BaseModbusDevice.FREQ_TAG)
+                and name not in BaseModbusDevice.STATS_TAGS
+            )
+        # read one by one, as the tags are not contiguous (e.g. an FBD's Run_FBD tag is far from the others)
+        return tuple(self.get_tag_values(name) for name in self._watched_tags)
+
+    def publish_loop_stats(self) -> None:
+        stats = self.loop_stats
+        self.set_tag_values(*zip(BaseModbusDevice.STATS_TAGS, [
+            stats.overruns, int(stats.max_duration * 1e6), int(stats.get_p99() * 1e6)
+        ] + stats.histogram))
+
+    def on_watchdog(self, overruns: int) -> None:
+        """
+        Called when the device overran more than `watchdog_overruns` times in
+        the last second. Can be overridden for other actions.
+        """
+
+        print("{0} {1}: {2} overruns in the last second".format(self.name, type(self).__name__, overruns))
+        if self.watchdog_action == "degrade" and self.scheduler.interval < 1.0:
+            self.scheduler.set_interval(min(1.0, self.scheduler.interval * 2))
+            self.loop_stats.interval = self.scheduler.interval
+            print("{0} {1}: interval degraded to {2} s".format(self.name, type(self).__name__, self.scheduler.interval))
+
     async def run(self) -> None:
-        ewma_interval, vars = 0.0, self._init_vars()
-
-        factor = 1/4
-        inv_factor = 1 - factor
-        for sec_pulse, min_pulse, hrs_pulse, time_interval in self.get_ticks():
-            if self.exec_state.is_set():
-                break
-            ewma_interval = (factor * time_interval) + (inv_factor * ewma_interval)
-            await self._main_loop(sec_pulse, min_pulse, hrs_pulse, ewma_interval, **vars)
-            self._debug_cycles += 1
-            if sec_pulse:
-                self.set_tag_value(BaseModbusDevice.FREQ_TAG, self._debug_cycles - self._debug_prev_cycles)
-                self._debug_prev_cycles = self._debug_cycles
-            self.set_tag_value(BaseModbusDevice.CYCLES_TAG, self._debug_cycles)
-            if ewma_interval > 0:
-                await sleep(max(0, self.interval - ewma_interval))
+        vars, scheduler, idle_monitor = self._init_vars(), self.scheduler, self.idle_monitor
+        loop_stats = self.loop_stats
+        last_values = None
+
+        if self.phase_offset > 0 and self.interval > 0:
+            # start on this device's phase of the period, however long its client took to connect
+            await sleep((self.start_time + self.phase_offset - time()) % self.interval)
+        scheduler.start()
+        try:
+            for sec_pulse, min_pulse, hrs_pulse, time_interval in self.get_ticks():
+                if self.exec_state.is_set():
+                    break
+                time_interval = scheduler.update(time_interval)
+                if idle_monitor is not None:
+                    idle_monitor.start_cycle()
+                loop_start = perf_counter()
+                await self._main_loop(sec_pulse, min_pulse, hrs_pulse, time_interval, **vars)
+                loop_stats.record(perf_counter() - loop_start)
+                self._debug_cycles += 1
+                if sec_pulse:
+                    self.set_tag_value(BaseModbusDevice.FREQ_TAG, self._debug_cycles - self._debug_prev_cycles)
+                    self._debug_prev_cycles = self._debug_cycles
+                    self.publish_loop_stats()
+                    overruns = loop_stats.take_recent_overruns()
+                    if self.watchdog_overruns > 0 and overruns > self.watchdog_overruns:
+                        self.on_watchdog(overruns)
+                self.set_tag_value(BaseModbusDevice.CYCLES_TAG, self._debug_cycles)
+                self.commit_data_store()
+                if idle_monitor is not None:
+                    values, last_values = last_values, self._get_watched_values()
+                    if idle_monitor.end_cycle(values != last_values):
+                        await idle_monitor.wait()
+                        scheduler.resume()
+                        continue
+                await scheduler.wait()
+        finally:
+            # lets the other devices on a shared clock carry on without this one
+            scheduler.stop()
+            if idle_monitor is not None and self.debug:
+                print(self.name, type(self).__name__, "idle metrics:", idle_monitor.get_metrics())
 
     def __setattr__(self, __name: str, __value: Any) -> None:
         if 'tag_database' in self.__dict__ and __name in self.tag_database:
@@ -235,6 +462,85 @@ class BaseModbusDevice:
 
         return self.data_store[self.unit_id]
 
+    def get_local_store(self) -> Union[ModbusSlaveContext, BufferedStoreView]:
+        """
+        Returns the store that this device reads and writes its own tags
+        through: the back buffers of its data store if it is double buffered,
+        or else the data store itself.
+        """
+
+        if self._buffered_store is not None:
+            return self._buffered_store
+        return self.get_data_store()
+
+    def commit_data_store(self) -> None:
+        """
+        Commits the writes buffered since the last commit to the data store,
+        if it is double buffered. Called at the end of every cycle.
+        """
+
+        if self._buffered_store is not None:
+            self._buffered_store.commit()
+
+    def get_checkpoint(self) -> Dict[str, Any]:
+        """
+        Returns the state of this device: the values of its data store, and
+        the attributes its class sets up (e.g. timers, state machines or the
+        plant state) other than those in `CHECKPOINT_EXCLUDED`. Attributes set
+        up by `BaseModbusDevice` itself are configuration, and are left out.
+        Restored with `restore_checkpoint()`; see `modbus.checkpoint`.
+
+        Timers are saved as their elapsed time in seconds, so that a device
+        can be restored with other `--timers` or another clock than the one
+        it was saved with, e.g. after a warm-up on a coarse virtual clock.
+        """
+
+        from logicblock import TONR
+        self.commit_data_store()
+        excluded = self._base_attributes.union(self.CHECKPOINT_EXCLUDED)
+        attributes: Dict[str, Any] = {}
+        # clients (e.g. the HMIs of a SCADA stage) are restored in place, as they hold connections
+        clients: Dict[str, Any] = {}
+        timers: Dict[str, Tuple[float, bool]] = {}
+        for name, value in self.__dict__.items():
+            if name in excluded:
+                continue
+            if isinstance(value, TONR):
+                timers[name] = (value.get_elapsed(), value.DN)
+            elif isinstance(value, BaseModbusClient):
+                clients[name] = value.get_checkpoint()
+            elif isinstance(value, (tuple, list)) and any(isinstance(item, BaseModbusClient) for item in value):
+                clients[name] = [item.get_checkpoint() if isinstance(item, BaseModbusClient) else None for item in value]
+            else:
+                attributes[name] = value
+        return {
+            "store": {key: block.values.copy() for key, block in self.get_data_store().store.items()},
+            "attributes": attributes,
+            "clients": clients,
+            "timers": timers,
+            # set up by `BaseModbusDevice`, but where each group is in its interval is state
+            "rate_groups": {name: group.elapsed for name, group in self.rate_groups.items()}
+        }
+
+    def restore_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        store = self.get_data_store().store
+        for key, values in checkpoint["store"].items():
+            store[key].values = values
+        self.__dict__.update(checkpoint["attributes"])
+        for name, (elapsed, done) in checkpoint["timers"].items():
+            self.__dict__[name].set_elapsed(elapsed, done)
+        for name, elapsed in checkpoint.get("rate_groups", {}).items():
+            if name in self.rate_groups:
+                self.rate_groups[name].elapsed = elapsed
+        for name, state in checkpoint["clients"].items():
+            value = self.__dict__[name]
+            if isinstance(value, BaseModbusClient):
+                value.restore_checkpoint(state)
+                continue
+            for item, item_state in zip(value, state):
+                if item_state is not None:
+                    item.restore_checkpoint(item_state)
+
     def set_tag_value(self, tag_name: str, value: RegisterValue) -> None:
         """
         Sets the register(s) for this tag to the value(s) specified.
@@ -253,7 +559,7 @@ class BaseModbusDevice:
             values = builder.to_coils()
         else:
             values = builder.to_registers()
-        self.get_data_store().setValues(
+        self.get_local_store().setValues(
             tag.get_function_code, address=registers.start, values=list(values)
         )
   
@@ -302,13 +608,23 @@ class BaseModbusDevice:
         """
 
         if isinstance(tag_name, str):
+            if not tag_names:
+                # every tag attribute access reads a single tag, which needs no grouping
+                tag = self.resolve_tag(tag_name)
+                decode_fn = PayloadDecoder.from_coils if tag.storage_location == Tag.COILS else PayloadDecoder.from_registers
+                return tag.decode_with(decode_fn(self.get_local_store().getValues(
+                    tag.get_function_code, address=tag.offset, count=tag.data_size
+                )))
             tag_name = (tag_name,)
 
         all_values: Dict[str, RegisterValue] = {}
         all_tag_names: Tuple[str, ...] = tag_name + tag_names
-        tag_set = get_contiguous_tags(CommsUtils.identity, CommsUtils.identity,
-            *(self.resolve_tag(tag_name) for tag_name in all_tag_names)
-        )
+        # tag offsets are fixed once the tag database is created, so the layout can be reused
+        tag_set = self._tag_sets.get(all_tag_names)
+        if tag_set is None:
+            tag_set = self._tag_sets[all_tag_names] = get_contiguous_tags(CommsUtils.identity, CommsUtils.identity,
+                *(self.resolve_tag(tag_name) for tag_name in all_tag_names)
+            )
 
         for i, (tags, decode_fn) in enumerate((
             (tag_set.coils, PayloadDecoder.from_coils), 
@@ -317,7 +633,7 @@ class BaseModbusDevice:
             if not len(tags):
                 continue
             
-            data_store = self.get_data_store()
+            data_store = self.get_local_store()
             try:
                 values: ModbusRegisterData = data_store.getValues(
                     tags[0].get_function_code, address=tags[0].offset,
@@ -356,6 +672,9 @@ class BaseModbusDevice:
         return tuple(tags) + (
             Tag(BaseModbusDevice.CYCLES_TAG, int, BaseModbusDevice.DEFAULT_DEBUG_CYCLES_LOC),
             Tag(BaseModbusDevice.FREQ_TAG, int)
+        ) + tuple(
+            Tag(name, int, BaseModbusDevice.DEFAULT_DEBUG_STATS_LOC + 2 * i)
+            for i, name in enumerate(BaseModbusDevice.STATS_TAGS)
         )
 
     def create_identification(self, 
@@ -368,13 +687,14 @@ class BaseModbusDevice:
         )
 
     def create_context(self) -> ModbusServerContext:
+        DataBlock = DoubleBufferedDataBlock if self.double_buffered else ModbusSparseDataBlock
         return ModbusServerContext(slaves=ModbusSlaveContext(
-            co=ModbusSparseDataBlock(values={
+            co=DataBlock(values={
                 tag.offset: [0] * tag.data_size
                 for tag in self.tag_database.values()
                 if tag.storage_location == Tag.COILS
             }),
-            hr=ModbusSparseDataBlock(values={
+            hr=DataBlock(values={
                 tag.offset: [0] * tag.data_size
                 for tag in self.tag_database.values()
                 if tag.storage_location == Tag.HOLDING_REGISTERS
@@ -392,6 +712,13 @@ class BaseModbusClient:
     is present.
     """
 
+    LOCAL_DEVICES: Dict[IPString, BaseModbusDevice] = {}
+    """
+    Devices running in this process, as a `{ "ip:port": device }` mapping.
+    Remote devices found here are accessed directly through their data store
+    instead of over Modbus TCP. See `register_local_device()`.
+    """
+
     def __init__(self, *args, **kwargs):
         """
         Creates a Modbus client.
@@ -412,8 +739,34 @@ class BaseModbusClient:
         self.parent = kwargs.get("parent", "")
 
         self._remote_devices: Dict[RemoteDeviceType, IPString] = kwargs.get('remote_devices', {})
+        self._remote_tag_sets: Dict[Tuple[str, ...], ContiguousTagSet[Tag]] = {}
         self._device_classes = self.get_device_classes(**device_classes)
 
+    CLIENT_ATTRIBUTES: Tuple[str, ...] = (
+        "parent", "_remote_devices", "_remote_tag_sets", "_device_classes", "device_map",
+        "ask_device", "tell_device", "scan_device"
+    )
+    """
+    Attributes set up by `BaseModbusClient`, which are left out of its
+    checkpoints; its methods are only attributes of an instance while its
+    calls are recorded or replayed (see `modbus.recording`).
+    """
+
+    def get_checkpoint(self) -> Dict[str, Any]:
+        """
+        Returns the state of this client, i.e. the attributes its class sets
+        up, for `BaseModbusDevice.get_checkpoint()`. Other clients it refers to
+        (e.g. the pumps of a duty selector) are left to their owner.
+        """
+
+        return {
+            name: value for name, value in self.__dict__.items()
+            if name not in BaseModbusClient.CLIENT_ATTRIBUTES and not isinstance(value, BaseModbusClient)
+        }
+
+    def restore_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        self.__dict__.update(checkpoint)
+
     async def init_device_map(self):        
         # device list maps names to classes
         # so in the commandline, FBD will be given --remote-devices = "MV101 192.168.0.1"
@@ -424,6 +777,16 @@ class BaseModbusClient:
             self._remote_devices, self._device_classes
         )
 
+    @staticmethod
+    def register_local_device(address: IPString, device: BaseModbusDevice) -> None:
+        """
+        Makes `device` reachable at `address` ("ip:port") for clients in this
+        process without going through the network. Must be called before the
+        clients call `init_device_map()`.
+        """
+
+        BaseModbusClient.LOCAL_DEVICES[address] = device
+
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         """
         Used to create a device map with `create_device_map()`.
@@ -468,7 +831,12 @@ class BaseModbusClient:
                 device_ip, device_port = ip_address.split(':', 1)
             device_port = int(device_port)
 
-            client = AsyncModbusClient(host=device_ip, port=device_port, timeout=300000)
+            local_device = BaseModbusClient.LOCAL_DEVICES.get(IPString("{0}:{1}".format(device_ip, device_port)))
+            if local_device is not None:
+                from .compat.pymodbus_functions import LocalModbusClient
+                client = LocalModbusClient(local_device)
+            else:
+                client = AsyncModbusClient(host=device_ip, port=device_port, timeout=300000)
             await client.connect()
             if not client.connected:
                 print(perf_counter(), type(self).__name__, device_name, "@", device_ip, ":", device_port, "=>", type(client))
@@ -512,15 +880,23 @@ class BaseModbusClient:
         """
 
         unit, client = kwargs.get("unit", 1), self.resolve_remote_connection(device_alias)
-        tag_set = get_contiguous_tags(CommsUtils.identity, CommsUtils.identity,
-            *(self.resolve_remote_tag(device_alias, tag_name) for tag_name in tag_names)
-        )
+        key = (device_alias,) + tag_names
+        tag_set = self._remote_tag_sets.get(key)
+        if tag_set is None:
+            tag_set = self._remote_tag_sets[key] = get_contiguous_tags(CommsUtils.identity, CommsUtils.identity,
+                *(self.resolve_remote_tag(device_alias, tag_name) for tag_name in tag_names)
+            )
 
-        coil_results, register_results = await asyncio.gather(
-            decode_coils(client, tag_set.coils, unit_id=unit),
-            decode_registers(client, tag_set.holding_registers, unit_id=unit)
-        )
-        result = tuple(coil_results) + tuple(register_results)
+        if not len(tag_set.holding_registers):
+            result = tuple(await decode_coils(client, tag_set.coils, unit_id=unit))
+        elif not len(tag_set.coils):
+            result = tuple(await decode_registers(client, tag_set.holding_registers, unit_id=unit))
+        else:
+            coil_results, register_results = await asyncio.gather(
+                decode_coils(client, tag_set.coils, unit_id=unit),
+                decode_registers(client, tag_set.holding_registers, unit_id=unit)
+            )
+            result = tuple(coil_results) + tuple(register_results)
 
         if len(result) == 1:
             return result[0]
@@ -554,7 +930,65 @@ class BaseModbusClient:
                     start_index = index + 1
             if start_index < len(tags):
                 all_tasks.append(write_values(client, tags[start_index:], unit_id=unit_id))
-        await asyncio.gather(*all_tasks)
+        if len(all_tasks) == 1:
+            await all_tasks[0]
+        else:
+            await asyncio.gather(*all_tasks)
+
+    async def scan_device(self, device_alias: RemoteDeviceType, *tag_values: Tuple[str, RegisterValue], **kwargs) -> Optional[Union[RegisterValue, Tuple[RegisterValue, ...]]]:
+        """
+        Writes the tag values to a remote device, has it run one scan and reads
+        the output tags back in a single round trip. Unlike `ask_device()`, the
+        outputs are returned in the order they were requested. Returns None if
+        the remote device does not support scan requests, in which case the
+        caller should fall back to `tell_device()` and `ask_device()`.
+
+        Other Parameters
+        ----------------
+        outputs -   The names of the tags to read back after the scan.
+        unit    -   The unit ID of the device to query. Default is 1.
+        """
+
+        unit, client = kwargs.get("unit", 1), self.resolve_remote_connection(device_alias)
+        outputs: Tuple[str, ...] = tuple(kwargs.get("outputs", ()))
+        write_set = get_contiguous_tags(CommsUtils.tuple_to_tag, CommsUtils.tag_to_tuple,
+            *((self.resolve_remote_tag(device_alias, tag), value) for tag, value in tag_values)
+        )
+        read_set = get_contiguous_tags(CommsUtils.identity, CommsUtils.identity,
+            *(self.resolve_remote_tag(device_alias, tag_name) for tag_name in outputs)
+        )
+
+        writes: List[Tuple[int, int, ModbusRegisterData]] = []
+        for location, items in ((Tag.COILS, write_set.coils), (Tag.HOLDING_REGISTERS, write_set.holding_registers)):
+            for section in CommsUtils.split_sections(items, CommsUtils.tuple_to_tag):
+                builder = PayloadBuilder()
+                for tag, value in section:
+                    tag.encode_with(tag.data_type(value), builder)
+                values = builder.to_coils() if location == Tag.COILS else builder.to_registers()
+                writes.append((location, section[0][0].offset, list(values)))
+
+        read_sections: List[Tuple[int, List[Tag]]] = []
+        for location, tags in ((Tag.COILS, read_set.coils), (Tag.HOLDING_REGISTERS, read_set.holding_registers)):
+            for section in CommsUtils.split_sections(tags, CommsUtils.identity):
+                read_sections.append((location, section))
+
+        results = await scan_device(client, tuple(writes), tuple(
+            (location, tags[0].offset, sum(tag.data_size for tag in tags))
+            for location, tags in read_sections
+        ), unit_id=unit)
+        if results is None:
+            return None
+
+        all_values: Dict[str, RegisterValue] = {}
+        for (location, tags), (_, _, values) in zip(read_sections, results):
+            decoder = PayloadDecoder.from_coils(values) if location == Tag.COILS else PayloadDecoder.from_registers(values)
+            for tag in tags:
+                all_values[tag.name] = tag.decode_with(decoder)
+
+        result = tuple(all_values[name] for name in outputs)
+        if len(result) == 1:
+            return result[0]
+        return result
 
 
 class CommsUtils:
@@ -570,3 +1004,15 @@ class CommsUtils:
     def tuple_to_tag(item: Tuple[Tag[T], RegisterValue]) -> Tag[T]: return item[0]
     @staticmethod
     def tag_to_tuple(tag: Tag[T]) -> Tuple[Tag[T], RegisterValue]: return (tag, 0)
+    @staticmethod
+    def split_sections(items: Tuple[T, ...], key: Callable[[T], Tag]) -> List[Tuple[T, ...]]:
+        """Splits a contiguous tag set into sections at each `SkipTag`."""
+
+        sections, start_index = [], 0
+        for index, item in enumerate(items):
+            if isinstance(key(item), SkipTag):
+                sections.append(items[start_index:index])
+                start_index = index + 1
+        if start_index < len(items):
+            sections.append(items[start_index:])
+        return sections
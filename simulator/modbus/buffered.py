@@ -0,0 +1,79 @@
+from typing import Dict, List
+from .compat.modbus import ModbusSparseDataBlock, ModbusSlaveContext
+from .types import ModbusRegisterData
+
+class DoubleBufferedDataBlock(ModbusSparseDataBlock):
+    """
+    A data block whose owner writes to a back buffer, which is committed
+    to the block in one step at the end of the owner's cycle. Modbus
+    requests (`getValues`/`setValues`) only ever see committed values, so
+    a reader never sees a tag group, or a multi-register value, that is
+    half-written. The owner reads its own pending writes through
+    `get_back`, so it still sees what it has written.
+
+    The back buffer only holds the registers written in the current cycle,
+    and committing is a single dict update; no locks are involved, since
+    all accesses happen on one event loop. A Modbus request that writes a
+    register mid-cycle drops it from the back buffer, so the latest write
+    wins: the commit does not overwrite it with what the owner wrote
+    earlier in the cycle, and the owner reads it back. Not supported with
+    pycopy.
+    """
+
+    def __init__(self, values=None, *args, **kwargs):
+        self.back: Dict[int, ModbusRegisterData] = {}
+        super().__init__(values, *args, **kwargs)
+
+    def setValues(self, address, values, *args, **kwargs):
+        back = self.back
+        if back and not isinstance(values, dict):
+            for i in range(len(values) if isinstance(values, list) else 1):
+                back.pop(address + i, None)
+        super().setValues(address, values, *args, **kwargs)
+
+    def set_back(self, address: int, values: List[ModbusRegisterData]) -> None:
+        back = self.back
+        for i, value in enumerate(values):
+            back[address + i] = value
+
+    def get_back(self, address: int, count: int = 1) -> List[ModbusRegisterData]:
+        values = self.getValues(address, count)
+        back = self.back
+        if back:
+            for i in range(count):
+                if address + i in back:
+                    values[i] = back[address + i]
+        return values
+
+    def commit(self) -> None:
+        if self.back:
+            self.values.update(self.back)
+            self.back.clear()
+
+class BufferedStoreView:
+    """
+    The owner's view of a slave context whose blocks may be double buffered.
+    Has the same `getValues`/`setValues` interface as the context, but reads
+    and writes the back buffers of `DoubleBufferedDataBlock`s.
+    """
+
+    def __init__(self, context: ModbusSlaveContext):
+        self.context = context
+        self.blocks = [block for block in context.store.values() if isinstance(block, DoubleBufferedDataBlock)]
+
+    def getValues(self, fx: int, address: int, count: int = 1) -> List[ModbusRegisterData]:
+        block = self.context.store[self.context.decode(fx)]
+        if isinstance(block, DoubleBufferedDataBlock):
+            return block.get_back(address, count)
+        return block.getValues(address, count)
+
+    def setValues(self, fx: int, address: int, values: List[ModbusRegisterData]) -> None:
+        block = self.context.store[self.context.decode(fx)]
+        if isinstance(block, DoubleBufferedDataBlock):
+            block.set_back(address, values)
+        else:
+            block.setValues(address, values)
+
+    def commit(self) -> None:
+        for block in self.blocks:
+            block.commit()
@@ -0,0 +1,102 @@
+"""
+Checkpoints of the state of devices, so that a simulation can be stopped
+and later carried on from where it was, rather than run again from the
+start to reach the same state.
+
+A checkpoint file holds one slice per device, keyed by `get_key()`, with
+the values of its data store and its internal state (timers, state
+machines, the plant state and so on); see
+`BaseModbusDevice.get_checkpoint()`. Each slice is pickled and compressed
+on its own, so a device only decompresses its own slice on restore.
+
+Device runners given `--checkpoint DIR` write the slices of their devices
+to `DIR` on SIGUSR1; run as a module to merge them into one checkpoint of
+the whole simulation, which every runner can then `--restore` from:
+
+    python3 -m modbus.checkpoint merged.ckpt DIR/*.ckpt
+
+Not supported with pycopy.
+"""
+
+from typing import TYPE_CHECKING, Dict, Iterable, List
+import pickle
+import zlib
+import os
+
+if TYPE_CHECKING:
+    from .base import BaseModbusDevice
+
+MAGIC: bytes = b"SWATCKPT1\n"
+"""Header of a checkpoint file"""
+
+def get_key(device: "BaseModbusDevice") -> str:
+    return "{0}:{1}".format(device.name, type(device).__name__)
+
+def dump_device(device: "BaseModbusDevice") -> bytes:
+    return zlib.compress(pickle.dumps(device.get_checkpoint(), pickle.HIGHEST_PROTOCOL))
+
+def load_device(device: "BaseModbusDevice", data: bytes) -> None:
+    device.restore_checkpoint(pickle.loads(zlib.decompress(data)))
+
+def write_checkpoint(path: str, slices: Dict[str, bytes]) -> int:
+    """
+    Writes the checkpoint `slices` to `path` and returns its size in bytes.
+    The file is replaced in one step, so a crash while writing leaves any
+    previous checkpoint at `path` intact.
+    """
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(MAGIC)
+        pickle.dump(slices, file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+def read_checkpoint(path: str) -> Dict[str, bytes]:
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{0} is not a checkpoint file".format(path))
+        return pickle.load(file)
+
+def save_devices(path: str, devices: Iterable["BaseModbusDevice"]) -> int:
+    """Writes a checkpoint of `devices` to `path` and returns its size in bytes."""
+
+    return write_checkpoint(path, {get_key(device): dump_device(device) for device in devices})
+
+def restore_devices(slices: Dict[str, bytes], devices: Iterable["BaseModbusDevice"]) -> List[str]:
+    """
+    Restores each of `devices` from its slice of a checkpoint, and returns
+    their keys. Raises a `KeyError` if a device has no slice.
+    """
+
+    keys: List[str] = []
+    for device in devices:
+        key = get_key(device)
+        if key not in slices:
+            raise KeyError("Checkpoint has no slice for {0}".format(key))
+        load_device(device, slices[key])
+        keys.append(key)
+    return keys
+
+def merge_checkpoints(path: str, *paths: str) -> int:
+    """
+    Merges the checkpoint files `paths` into one at `path`, and returns its
+    size in bytes. Later files take precedence for devices in several files.
+    """
+
+    slices: Dict[str, bytes] = {}
+    for part in paths:
+        slices.update(read_checkpoint(part))
+    return write_checkpoint(path, slices)
+
+if __name__ == "__main__":
+    def run_main():
+        from argparse import ArgumentParser
+        parser = ArgumentParser(description="Merges the checkpoints written by device runners into one checkpoint of the whole simulation.")
+        parser.add_argument("output", help="The checkpoint file to write.")
+        parser.add_argument("checkpoints", nargs='+', help="The checkpoint files to merge.")
+        args = parser.parse_args()
+        size = merge_checkpoints(args.output, *args.checkpoints)
+        print("wrote {0} slices to {1} ({2} bytes)".format(len(read_checkpoint(args.output)), args.output, size))
+
+    run_main()
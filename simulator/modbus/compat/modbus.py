@@ -8,7 +8,7 @@ if IS_PYCOPY:
     from .modbus_structs import ModbusServerContext, ModbusSlaveContext
     from .modbus_structs import ModbusDeviceIdentification, ModbusSparseDataBlock
     from .umodbus_functions import encode_coils, decode_coils, encode_registers, decode_registers
-    from .umodbus_functions import start_tcp_server
+    from .umodbus_functions import start_tcp_server, scan_device
 else:
     from pymodbus.server.async_io import ModbusTcpServer
     from pymodbus.datastore import ModbusSparseDataBlock
@@ -17,11 +17,11 @@ else:
     from pymodbus.client.base import ModbusBaseClient as ModbusClient
     from pymodbus.datastore import ModbusServerContext, ModbusSlaveContext
     from .pymodbus_functions import encode_coils, decode_coils, encode_registers, decode_registers
-    from .pymodbus_functions import start_tcp_server
+    from .pymodbus_functions import start_tcp_server, scan_device
     
 __all__ = [
     "ModbusServerContext", "ModbusSlaveContext", "ModbusDeviceIdentification",
     "ModbusSparseDataBlock", "ModbusClient", "encode_coils", "decode_coils",
     "AsyncModbusClient", "encode_registers", "decode_registers",
-    "start_tcp_server", "ModbusTcpServer"
+    "start_tcp_server", "ModbusTcpServer", "scan_device"
 ]
\ No newline at end of file
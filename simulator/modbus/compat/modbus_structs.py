@@ -180,6 +180,14 @@ class ModbusServerContext:
         
         return self._unit
 
+    def __setitem__(self, slave, context: ModbusSlaveContext) -> None:
+        """
+        Compatibility with pymodbus. Since `single` is always
+        True, this replaces the slave context for every unit ID.
+        """
+
+        self._unit = context
+
     def slaves(self) -> Tuple[int, ...]:
         """
         Returns a list of all the unit IDs for this device.
@@ -1,10 +1,17 @@
-from pymodbus.pdu import ExceptionResponse
+from pymodbus.pdu import ExceptionResponse, ModbusRequest, ModbusResponse
+from pymodbus.pdu import ModbusExceptions as merror
 from pymodbus.bit_read_message import ReadCoilsResponse
 from pymodbus.register_read_message import ReadRegistersResponseBase
 from pymodbus.client.base import ModbusBaseClient as ModbusClient
-from typing import List, Tuple, Union, cast
+from pymodbus.client.mixin import ModbusClientMixin
+from pymodbus.server.async_io import ModbusConnectedRequestHandler
+from pymodbus.logging import Log
+from typing import Any, Callable, Coroutine, List, Optional, Set, Tuple, Union, cast
 from ..types import ModbusRegisterData, RegisterValue
 from ..tag import PayloadBuilder, PayloadDecoder, Tag
+import asyncio
+import struct
+import traceback
 
 async def encode_coils(client: ModbusClient, tag_values: Tuple[Tuple[Tag[bool], bool], ...], unit_id: int = 0) -> None:
     if len(tag_values) == 0:
@@ -53,9 +60,187 @@ async def decode_registers(client: ModbusClient, tags: Tuple[Tag[RegisterValue],
             results.append(value)
     return results
 
+ScanSection = Tuple[int, int, ModbusRegisterData]
+"""A `(storage_location, address, values)` section of a scan request or response."""
+
+class ScanRequest(ModbusRequest):
+    """
+    Custom (user-defined) function code that writes a number of coil and
+    register sections, runs the device's scan callback once and returns the
+    requested sections in the same round trip. The payload is laid out as:
+
+    `n_writes, n_reads, (location, address, count, values...) * n_writes, (location, address, count) * n_reads`
+
+    where the location is either `Tag.COILS` (1 byte per coil) or
+    `Tag.HOLDING_REGISTERS` (2 bytes per register).
+    """
+
+    function_code = 0x41
+
+    def __init__(self, writes: Tuple[ScanSection, ...] = (), reads: Tuple[Tuple[int, int, int], ...] = (), **kwargs):
+        super().__init__(**kwargs)
+        self.writes: Tuple[ScanSection, ...] = writes
+        self.reads: Tuple[Tuple[int, int, int], ...] = reads
+
+    def encode(self) -> bytes:
+        packet = bytearray(struct.pack(">BB", len(self.writes), len(self.reads)))
+        for location, address, values in self.writes:
+            packet.extend(struct.pack(">BHH", location, address, len(values)))
+            packet.extend(struct.pack(">" + ScanRequest.get_format(location) * len(values), *values))
+        for location, address, count in self.reads:
+            packet.extend(struct.pack(">BHH", location, address, count))
+        return bytes(packet)
+
+    def decode(self, data: bytes) -> None:
+        n_writes, n_reads = struct.unpack(">BB", data[:2])
+        pointer, writes, reads = 2, [], []
+        for _ in range(n_writes):
+            location, address, count = struct.unpack(">BHH", data[pointer:pointer + 5])
+            fmt = ">" + ScanRequest.get_format(location) * count
+            pointer += 5
+            writes.append((location, address, list(struct.unpack(fmt, data[pointer:pointer + struct.calcsize(fmt)]))))
+            pointer += struct.calcsize(fmt)
+        for _ in range(n_reads):
+            reads.append(struct.unpack(">BHH", data[pointer:pointer + 5]))
+            pointer += 5
+        self.writes, self.reads = tuple(writes), tuple(reads)
+
+    async def execute_scan(self, context, scan: Callable[[], Coroutine[Any, Any, None]]) -> ModbusResponse:
+        """
+        Applies the written sections to the context, awaits the scan and then
+        reads back the requested sections after the scan has completed.
+        """
+
+        for location, address, count in self.reads + tuple((loc, addr, len(vals)) for loc, addr, vals in self.writes):
+            if not context.validate(ScanRequest.get_function_code(location), address, count):
+                return self.doException(merror.IllegalAddress)
+        for location, address, values in self.writes:
+            context.setValues(ScanRequest.get_function_code(location), address, values)
+        await scan()
+        return ScanResponse(tuple(
+            (location, address, context.getValues(ScanRequest.get_function_code(location), address, count))
+            for location, address, count in self.reads
+        ))
+
+    @staticmethod
+    def get_format(location: int) -> str:
+        return "B" if location == Tag.COILS else "H"
+
+    @staticmethod
+    def get_function_code(location: int) -> int:
+        return 0x01 if location == Tag.COILS else 0x03
+
+class ScanResponse(ModbusResponse):
+    """
+    Response to a `ScanRequest`, containing the requested sections as they
+    were after the remote device finished its scan.
+    """
+
+    function_code = ScanRequest.function_code
+
+    def __init__(self, sections: Tuple[ScanSection, ...] = (), **kwargs):
+        super().__init__(**kwargs)
+        self.sections: Tuple[ScanSection, ...] = sections
+
+    def encode(self) -> bytes:
+        packet = bytearray(struct.pack(">B", len(self.sections)))
+        for location, address, values in self.sections:
+            packet.extend(struct.pack(">BHH", location, address, len(values)))
+            packet.extend(struct.pack(">" + ScanRequest.get_format(location) * len(values), *values))
+        return bytes(packet)
+
+    def decode(self, data: bytes) -> None:
+        pointer, sections = 1, []
+        for _ in range(data[0]):
+            location, address, count = struct.unpack(">BHH", data[pointer:pointer + 5])
+            fmt = ">" + ScanRequest.get_format(location) * count
+            pointer += 5
+            sections.append((location, address, list(struct.unpack(fmt, data[pointer:pointer + struct.calcsize(fmt)]))))
+            pointer += struct.calcsize(fmt)
+        self.sections = tuple(sections)
+
+def create_scan_handler(scan: Callable[[], Coroutine[Any, Any, None]]) -> type:
+    """
+    Creates a request handler that answers `ScanRequest`s by deferring the
+    response until `scan` has completed, since pymodbus executes requests
+    synchronously. All other requests are handled as before.
+    """
+
+    class ScanRequestHandler(ModbusConnectedRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # scans in progress; the event loop only keeps weak references to tasks
+            self._scan_tasks: Set[asyncio.Task] = set()
+
+        def execute(self, request, *addr):
+            if not isinstance(request, ScanRequest):
+                return super().execute(request, *addr)
+            task = asyncio.create_task(self._execute_scan(request, *addr))
+            self._scan_tasks.add(task)
+            task.add_done_callback(self._scan_tasks.discard)
+
+        async def _execute_scan(self, request: ScanRequest, *addr):
+            try:
+                response = await request.execute_scan(self.server.context[request.slave_id], scan)
+            except Exception as exc:  # pylint: disable=broad-except
+                Log.error("Scan request failed: {}; {}", exc, traceback.format_exc())
+                response = request.doException(merror.SlaveFailure)
+            response.transaction_id = request.transaction_id
+            response.slave_id = request.slave_id
+            self.send(response, *addr)
+
+    return ScanRequestHandler
+
+async def scan_device(client: ModbusClient, writes: Tuple[ScanSection, ...], reads: Tuple[Tuple[int, int, int], ...], unit_id: int = 0) -> Optional[Tuple[ScanSection, ...]]:
+    """
+    Sends a `ScanRequest` to the remote device. Returns the requested sections,
+    or None if the remote device does not support scan requests.
+    """
+
+    client.register(ScanResponse)
+    response = await client.execute(ScanRequest(writes, reads, slave=unit_id))
+    if not isinstance(response, ScanResponse):
+        return None
+    return response.sections
+
+class LocalModbusClient(ModbusClientMixin):
+    """
+    A client that executes requests directly against the server context of a
+    device in the same process, instead of sending them over TCP. Requests go
+    through the same `execute()` as they would in the device's server, so the
+    results are identical to those of a networked client.
+    """
+
+    def __init__(self, device):
+        super().__init__()
+        self.device = device
+        self.connected = True
+
+    async def connect(self) -> bool:
+        return True
+
+    def register(self, custom_response_class) -> None:
+        pass
+
+    async def execute(self, request: ModbusRequest) -> ModbusResponse:
+        context = self.device.data_store[request.slave_id]
+        if isinstance(request, ScanRequest):
+            scan = getattr(self.device, "scan", None)
+            if scan is None:
+                return request.doException(merror.IllegalFunction)
+            return await request.execute_scan(context, scan)
+        if isinstance(getattr(request, "values", None), tuple):
+            # the data store only takes lists as multiple values, which is what decoding
+            # a request off the network would have produced
+            request.values = list(request.values)
+        return request.execute(context)
+
 async def start_tcp_server(device, address: Tuple[str, int] = ('127.0.0.1', 5020), **kwargs):
     from pymodbus.server import StartAsyncTcpServer
     from ..base import BaseModbusDevice
 
     device = cast(BaseModbusDevice, device)
+    scan = getattr(device, "scan", None)
+    if scan is not None:
+        kwargs.update(handler=create_scan_handler(scan), custom_functions=[ScanRequest])
     return await StartAsyncTcpServer(context=device.data_store, identity=device.identification, address=address, **kwargs)
\ No newline at end of file
@@ -60,4 +60,11 @@ async def start_tcp_server(device, address: Tuple[str, int] = ('127.0.0.1', 5020
     # TODO implement Modbus identification 
     identity: ModbusDeviceIdentification = device.identification
     await server.bind(local_ip=host, local_port=port, max_connections=kwargs.get("backlog", 20))
-    return server
\ No newline at end of file
+    return server
+async def scan_device(client: ModbusClient, writes: Tuple, reads: Tuple, unit_id: int = 0) -> None:
+    """
+    Scan requests are not supported by umodbus; always returns None so that
+    the caller falls back to separate write and read requests.
+    """
+
+    return None
@@ -1,4 +1,4 @@
-from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Type, Union, overload
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Type, Union, cast, overload
 from .compat.modbus import ModbusSlaveContext, ModbusServerContext, ModbusTcpServer
 from .compat.modbus import ModbusDeviceIdentification, start_tcp_server
 from .types.remote import ContiguousTagSet, RemoteDeviceType
@@ -10,11 +10,13 @@ import signal
 
 
 def start_device(
-    *devices: "BaseModbusDevice", _host: str="localhost", _port: int=5020, _backlog: int=20
+    *devices: "BaseModbusDevice", _host: str="localhost", _port: int=5020, _backlog: int=20,
+    _servers: Tuple[Tuple["BaseModbusDevice", str, int], ...] = ()
 ) -> None:
     """
     Starts a Modbus device. Also starts a Modbus TCP server instance at
-    the specified socket info (`(_host, _port)`).
+    the specified socket info (`(_host, _port)`), and one for each of the
+    other devices in `_servers`, given as `(device, host, port)`.
     """
 
     from .base import BaseModbusDevice
@@ -22,36 +24,47 @@ def start_device(
     class ServerStarter:
         def __init__(self, *devices: BaseModbusDevice):
             self.devices: Tuple[BaseModbusDevice, ...] = devices
-            self.tcp_server: Optional[ModbusTcpServer] = None
-            loop = asyncio.get_event_loop()
-            stop_device = lambda signame: asyncio.create_task(self.stop_device(signame))
-            loop.add_signal_handler(signal.SIGTERM, stop_device)
-            loop.add_signal_handler(signal.SIGINT, stop_device)
+            self.tcp_servers: List[ModbusTcpServer] = []
             self.tasks: List[Coroutine[Any, Any, Any]] = [
                 device.start() for device in devices
             ]
-            self.tasks.append(self.start_server())
+            self.tasks.append(self.start_server(self.devices[0], _host, _port))
+            self.tasks.extend(self.start_server(device, host, port) for device, host, port in _servers)
 
-        async def start_server(self):
+        async def start_server(self, device: BaseModbusDevice, host: str, port: int):
             server: Optional[ModbusTcpServer] = await start_tcp_server(
-                device=self.devices[0], address=(_host, _port), 
+                device=device, address=(host, port), 
                 defer_start=True, backlog=_backlog
             )
             if not server:
                 raise RuntimeError("Error starting server at ({0}:{1})".format(
-                    _host, _port
+                    host, port
                 ))
-            self.tcp_server = server
+            self.tcp_servers.append(server)
             await server.serve_forever()
 
         async def stop_device(self, *args):
             for device in self.devices:
                 device.exec_state.set()
             
-            if self.tcp_server is not None:
-                await self.tcp_server.server_close()
+            for server in self.tcp_servers:
+                await server.server_close()
         
+        def write_checkpoint(self):
+            from .checkpoint import save_devices, get_key
+            import os
+            device = self.devices[0]
+            path = os.path.join(cast(str, device.checkpoint_dir), "{0}.ckpt".format(get_key(device)))
+            print("wrote checkpoint", path, "({0} bytes)".format(save_devices(path, self.devices)))
+
         async def run_tasks(self):
+            # the handlers must be added to the loop started by `asyncio.run()`
+            loop = asyncio.get_event_loop()
+            stop_device = lambda: asyncio.create_task(self.stop_device())
+            loop.add_signal_handler(signal.SIGTERM, stop_device)
+            loop.add_signal_handler(signal.SIGINT, stop_device)
+            if any(device.checkpoint_dir is not None for device in self.devices):
+                loop.add_signal_handler(signal.SIGUSR1, self.write_checkpoint)
             await asyncio.gather(*self.tasks)
 
     try:
@@ -127,6 +140,21 @@ def create_full_parser(parser_desc: str, **kwargs) -> argparse.ArgumentParser:
     parser.add_argument("--scada-delay", default=0, type=float, help="How long to wait (in s) before starting each SCADA stage in the OT network. Mainly used to ensure that all device runners have finished parsing and are ready to run.")
     parser.add_argument("--fbd-delay", "-z", default=0, type=float, help="How long to wait (in s) before starting each FBD in the OT network. Mainly used to ensure that all device runners have finished parsing and are ready to run.")
     parser.add_argument("--start-time", default=0, type=float, help="The time at which to start at.")
+    parser.add_argument("--phase-offset", default=0.0, type=float, help="Time (in s) after the start time at which to run the first cycle, to stagger devices with the same period. The stagger only lasts under '--schedule deadline', which keeps to its first cycle's phase; under 'ewma' cycles drift from it. Default: 0")
+
+    parser.add_argument("--schedule", default="ewma", choices=("ewma", "deadline"), help="How each cycle is scheduled. 'ewma' sleeps for the interval minus the average loop time; 'deadline' sleeps until absolute deadlines, avoiding frequency drift. Default: ewma")
+    parser.add_argument("--overrun-policy", default="skip", choices=("skip", "catch-up"), help="What the deadline schedule does when a cycle overruns: skip the missed cycles, or run them back to back. Default: skip")
+    parser.add_argument("--busy-wait", default=0.0, type=float, help="Time (in s) at the end of each deadline wait to busy-wait instead of sleeping, for lower wake-up jitter at the cost of CPU. Default: 0")
+    parser.add_argument("--rate-group", default=[], nargs=2, action="append", metavar=("NAME", "FREQUENCY"), help="Runs the named rate group of this device (e.g. 'alarms' for SCADA stages) at the given frequency in Hz instead of its default. Can be given more than once.")
+    parser.add_argument("--idle-after", default=0, type=int, help="Number of cycles in a row without tag changes after which this device drops to its idle rate, until a write or a polled input changes its tags. Default: 0 (never idle)")
+    parser.add_argument("--idle-interval", default=0.1, type=float, help="Time (in s) between cycles while this device is idle. Default: 0.1")
+    parser.add_argument("--watchdog-overruns", default=0, type=int, help="Number of overruns in a second above which the watchdog acts. Default: 0 (disabled)")
+    parser.add_argument("--watchdog-action", default="log", choices=("log", "degrade"), help="What the watchdog does: log a warning, or also halve the rate of this device (down to 1 Hz). Default: log")
+    parser.add_argument("--double-buffered", action="store_true", help="Buffers this device's writes to its own tags and commits them at the end of each cycle, so that Modbus clients never read a half-updated cycle.")
+    parser.add_argument("--checkpoint", default=None, type=str, metavar="DIR", help="Directory to which to write a checkpoint of this runner's devices on SIGUSR1. Merge the checkpoints of all runners into one with `python3 -m modbus.checkpoint`.")
+    parser.add_argument("--restore", default=None, type=str, metavar="FILE", help="Checkpoint file from which to restore this runner's devices before they start.")
+    parser.add_argument("--record", default=None, type=str, metavar="DIR", help="Directory to which to write a recording of each of this runner's devices' traffic when it stops, for replaying one device on its own with `simulator/replay.py`.")
+    parser.add_argument("--timers", default="cycles", choices=["cycles", "clock"], help="Whether PLC timers count cycles at the nominal frequency (cycles), or measure the elapsed time of the device (clock). Default: cycles")
 
     group = parser.add_mutually_exclusive_group()
     group.add_argument("--interval", "-v", default=TIME_INTERVAL, type=float, help="Time period (1/f) of this device. Default: 0.005 s (200Hz)")
@@ -149,6 +177,7 @@ def create_micro_parser() -> argparse.ArgumentParser:
     parser.add_argument("--fbd-delay", "-z", default=0, type=float, help="How long to wait (in s) before starting each FBD in the OT network. Mainly used to ensure that all device runners have finished parsing and are ready to run.")
     parser.add_argument("--scada-delay", default=0, type=float, help="How long to wait (in s) before starting each SCADA stage in the OT network. Mainly used to ensure that all device runners have finished parsing and are ready to run.")
     parser.add_argument("--start-time", default=0, type=float, help="The time at which to start at.")
+    parser.add_argument("--phase-offset", default=0.0, type=float, help="Time (in s) after the start time at which to run the first cycle, to stagger devices with the same period. Micro runners schedule like '--schedule ewma', so only their first cycle is staggered. Default: 0")
     return parser
     
 def get_contiguous_tags(key: Callable[[T], Tag], inverse_key: Callable[[Tag], T], *tag_data: T) -> ContiguousTagSet[T]:
@@ -241,6 +270,23 @@ def create_contiguous_states(start, stop, states):
         state_dict[key] = states[last_found_key]
     return state_dict
 
+def compile_states(states: Dict[int, Any]) -> Dict[int, Any]:
+    """
+    Precompiles a state dict (e.g. from `create_contiguous_states`) whose
+    states are bitarrays, or tuples holding bitarrays, by replacing each
+    bitarray with a tuple of bools. Selecting a state and assigning its
+    outputs is then a dict lookup and a tuple unpack, with no bitarray
+    indexing or conversion in each cycle.
+    """
+
+    def compile_state(state: Any) -> Any:
+        if state is None or isinstance(state, (bool, int)):
+            return state
+        if isinstance(state, tuple):
+            return tuple(compile_state(item) for item in state)
+        return tuple(bool(bit) for bit in state)
+    return {key: compile_state(state) for key, state in states.items()}
+
 def split_tags_on_empty(array: List[Tag]) -> List[List[Tag]]:
     sub_arrays, start_point = [], 0
     for i, tag in enumerate(array):
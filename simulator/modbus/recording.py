@@ -0,0 +1,330 @@
+"""
+Recording of the traffic of a single device, and replay of that traffic
+to drive the device on its own, without the devices it talks to.
+
+A `Recorder` records every cycle of a device (its `_main_loop`, and its
+`scan()` if it is an FBD) as an event, with:
+
+- the pulses it ran with (for a scan, only if it is a driven FBD),
+- the writes other devices made to its data store since the previous
+  event, and during the event (i.e. the inbound Modbus writes), with the
+  number of calls the event had started and finished when each arrived,
+  and whether the device read its tags before the next call,
+- its `ask_device()`, `tell_device()` and `scan_device()` calls, and those
+  of its HMIs, with their results,
+- and the changes to its data store over the event.
+
+The recording starts from a checkpoint of the device (see
+`modbus.checkpoint`), so a `Replayer` can restore the device to where the
+recording started, then apply the inbound writes of each event where they
+arrived and answer its calls from the recording instead of the remote
+devices, as fast as
+the device can run. Calls that differ from those recorded, and events
+whose writes differ, are counted as divergences, so a replay also checks
+that a change to a device did not change its behaviour.
+
+Device runners given `--record DIR` write `DIR/<name>:<class>.rec` when
+they stop; see `simulator/replay.py` to replay them. Timers should count
+cycles (the default) for a replay to be exact. Not supported with pycopy.
+"""
+
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+from time import perf_counter
+from .checkpoint import dump_device, load_device, get_key
+import pickle
+import zlib
+
+if TYPE_CHECKING:
+    from .base import BaseModbusDevice
+
+MAGIC: bytes = b"SWATREC2\n"
+"""Header of a recording file"""
+
+CLIENT_METHODS: Tuple[str, ...] = ("ask_device", "tell_device", "scan_device")
+
+StoreValues = Dict[Any, Dict[int, Any]]
+Call = Tuple[int, str, str, Tuple[Any, ...], Dict[str, Any], Any]
+"""A client call, as `(client, method, device alias, args, kwargs, result)`; see `get_clients()`"""
+Write = Tuple[int, int, int, List[Any], bool]
+"""
+An inbound write, as `(calls started and finished before it, or -1 if
+before the event, function code, address, values, read)`, where `read` is
+whether the device read its tags after it and before its next call
+"""
+Event = Tuple[float, str, Optional[Tuple[bool, bool, bool, float]], List[Write], List[Call], StoreValues]
+"""A cycle or scan, as `(time, "cycle" or "scan", pulses, inbound writes, calls, changes)`"""
+
+def get_store_values(device: "BaseModbusDevice") -> StoreValues:
+    """
+    Returns a copy of the values of each sparse block of `device`'s data
+    store, which hold its tags; the others are the full address space of
+    the tables it does not use.
+    """
+
+    device.commit_data_store()
+    return {
+        key: dict(block.values) for key, block in device.get_data_store().store.items()
+        if isinstance(block.values, dict)
+    }
+
+def get_changes(old: StoreValues, new: StoreValues) -> StoreValues:
+    changes: StoreValues = {}
+    for key, values in new.items():
+        previous = old.get(key, {})
+        changed = {address: value for address, value in values.items() if previous.get(address) != value}
+        if len(changed):
+            changes[key] = changed
+    return changes
+
+def get_clients(device: "BaseModbusDevice") -> List[Any]:
+    """
+    Returns the objects whose `CLIENT_METHODS` make the calls of `device`:
+    the device itself, if it has a delegate client, and the clients (e.g.
+    HMIs) among its attributes, including those of those clients. Calls
+    are told apart by the index of their client in this list, as HMIs use
+    the same device aliases.
+    """
+
+    from .base import BaseModbusClient
+    clients: List[Any] = [device] if device._init_client is not None else []
+    pending = list(device.__dict__.values())
+    seen = set()
+    while len(pending):
+        value = pending.pop()
+        if isinstance(value, (tuple, list)):
+            pending.extend(value)
+        elif isinstance(value, BaseModbusClient) and id(value) not in seen:
+            seen.add(id(value))
+            clients.append(value)
+            pending.extend(value.__dict__.values())
+    return clients
+
+CallKey = Tuple[int, str, str, Tuple[Any, ...]]
+
+def get_call_key(client: int, method: str, device_alias: str, args: Tuple[Any, ...]) -> CallKey:
+    # the tag names, without the values of those written
+    return (client, method, device_alias, tuple(arg[0] if isinstance(arg, tuple) else arg for arg in args))
+
+class Recorder:
+    """
+    Records the traffic of `device` from its first event until `save()` is
+    called. `argv` are the device runner arguments the device was started
+    with, from which a replay creates it again.
+
+    Created by `BaseModbusDevice.__init__()`, so that scans are recorded
+    from when its server starts; `hook_clients()` must be called once the
+    subclass has set up its clients (e.g. its HMIs), before it runs.
+    """
+
+    def __init__(self, device: "BaseModbusDevice", argv: List[str]):
+        self.device = device
+        self.argv = argv
+        # a checkpoint slice of the device at the start of its first event
+        self.initial: Optional[bytes] = None
+        self.events: List[Event] = []
+        self._calls: List[Call] = []
+        self._writes: List[Write] = []
+        # the number of calls the event being recorded has started, plus those it has finished,
+        # and the first of its writes which the device has not read its tags after
+        self._call_steps = 0
+        self._unread = 0
+        self._running = False
+        self._local_writes = 0
+        self._start = perf_counter()
+
+        # the device's own writes go through `set_tag_value()`, and all others through the data store
+        data_store, set_values, set_tag_value = device.get_data_store(), device.get_data_store().setValues, device.set_tag_value
+        def record_write(fx, address, values):
+            if self.initial is not None and not self._local_writes:
+                self._writes.append((self._call_steps if self._running else -1, fx, address, list(values), False))
+            set_values(fx, address, values)
+        data_store.setValues = record_write
+        get_tag_values = device.get_tag_values
+        def local_read(*tag_names):
+            writes = self._writes
+            if self._running and self._unread < len(writes):
+                for index in range(self._unread, len(writes)):
+                    writes[index] = writes[index][:4] + (True,)
+                self._unread = len(writes)
+            return get_tag_values(*tag_names)
+        device.get_tag_values = local_read
+        def local_write(tag_name, value):
+            self._local_writes += 1
+            try:
+                set_tag_value(tag_name, value)
+            finally:
+                self._local_writes -= 1
+        device.set_tag_value = local_write
+
+        main_loop = device._main_loop
+        async def record_cycle(sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs):
+            await self._record("cycle", (sec_pulse, min_pulse, hrs_pulse, time_interval), main_loop(sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs))
+        device._main_loop = record_cycle
+        if hasattr(device, "scan"):
+            scan = device.scan
+            async def record_scan():
+                # a driven FBD (see `FBD.driven`) has its pulses from its PLC rather than from its
+                # recorded cycles, so those it has been given since it last ran are recorded
+                pulses = device._pending_pulses if getattr(device, "driven", False) else None
+                await self._record("scan", pulses, scan())
+            device.scan = record_scan
+
+    def hook_clients(self) -> None:
+        for index, client in enumerate(get_clients(self.device)):
+            for method in CLIENT_METHODS:
+                setattr(client, method, self._wrap_call(index, method, getattr(client, method)))
+
+    def _wrap_call(self, client: int, method: str, call: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        async def record_call(device_alias, *args, **kwargs):
+            # added before it returns, so that calls are in the order they were made
+            calls, index = self._calls, len(self._calls)
+            calls.append((client, method, device_alias, args, kwargs, None))
+            self._next_step()
+            result = await call(device_alias, *args, **kwargs)
+            calls[index] = (client, method, device_alias, args, kwargs, result)
+            self._next_step()
+            return result
+        return record_call
+
+    def _next_step(self) -> None:
+        self._call_steps += 1
+        self._unread = len(self._writes)
+
+    async def _record(self, kind: str, pulses: Optional[Tuple[bool, bool, bool, float]], run: Awaitable[None]) -> None:
+        if self.initial is None:
+            # writes before the first event are in the checkpoint, which is
+            # serialized now, as it holds the device's objects rather than copies
+            self.initial = dump_device(self.device)
+        before = get_store_values(self.device)
+        calls, writes = self._calls, self._writes = [], self._writes
+        self._call_steps = self._unread = 0
+        time = perf_counter() - self._start
+        self._running = True
+        try:
+            await run
+        finally:
+            self._running = False
+            self._writes = []
+        self.events.append((time, kind, pulses, writes, calls, get_changes(before, get_store_values(self.device))))
+
+    def save(self, path: str) -> int:
+        """Writes the recording to `path` and returns its size in bytes."""
+
+        with open(path, "wb") as file:
+            file.write(MAGIC)
+            file.write(zlib.compress(pickle.dumps({
+                "key": get_key(self.device), "argv": self.argv, "initial": self.initial, "events": self.events
+            }, pickle.HIGHEST_PROTOCOL)))
+            return file.tell()
+
+def read_recording(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{0} is not a recording file".format(path))
+        return pickle.loads(zlib.decompress(file.read()))
+
+class Replayer:
+    """
+    Drives `device`, created with the `argv` of `recording`, through the
+    events of the recording. Its calls are answered from the recording,
+    matched by client, method, device alias and tag names within each event,
+    and the inbound writes are applied where they arrived between the
+    starts and ends of the calls: when the device first reads its tags
+    there if it read them after the write, or else just before its next
+    call.
+    """
+
+    def __init__(self, device: "BaseModbusDevice", recording: Dict[str, Any]):
+        self.device = device
+        self.recording = recording
+        self.divergent_calls = 0
+        self.divergent_events = 0
+        self._answers: Dict[CallKey, Deque[Call]] = {}
+        # the inbound writes of the event being replayed, and the number of calls it has started and finished
+        self._writes: Deque[Write] = deque()
+        self._call_steps = 0
+        # the last answer to each call, for calls made more often than recorded
+        self._last_answers: Dict[CallKey, Any] = {}
+        for index, client in enumerate(get_clients(device)):
+            for method in CLIENT_METHODS:
+                setattr(client, method, self._answer_call(index, method))
+        get_tag_values = device.get_tag_values
+        def read_tags(*tag_names):
+            if len(self._writes):
+                self._apply_writes(True)
+            return get_tag_values(*tag_names)
+        device.get_tag_values = read_tags
+        self._main_loop = device._main_loop
+        # the variables of the device's run, set up afresh by each reset()
+        self._vars: Dict[str, Any] = {}
+
+    def _answer_call(self, client: int, method: str) -> Callable[..., Awaitable[Any]]:
+        async def answer_call(device_alias, *args, **kwargs):
+            key = get_call_key(client, method, device_alias, args)
+            self._apply_writes()
+            self._call_steps += 1
+            answers = self._answers.get(key)
+            if not answers:
+                self.divergent_calls += 1
+                result = self._last_answers.get(key)
+            else:
+                _, _, _, recorded_args, recorded_kwargs, result = answers.popleft()
+                if recorded_args != args or recorded_kwargs != kwargs:
+                    self.divergent_calls += 1
+                self._last_answers[key] = result
+            self._apply_writes()
+            self._call_steps += 1
+            return result
+        return answer_call
+
+    def _apply_writes(self, read: bool = False) -> None:
+        """Applies the writes which arrived up to this point, or only those the device read if `read`."""
+
+        writes, set_values = self._writes, self.device.get_data_store().setValues
+        while len(writes) and writes[0][0] <= self._call_steps and (writes[0][4] or not read):
+            _, fx, address, values, _ = writes.popleft()
+            set_values(fx, address, values)
+
+    def reset(self) -> None:
+        """Restores the device to where the recording started."""
+
+        load_device(self.device, self.recording["initial"])
+        self._vars = self.device._init_vars()
+        self.divergent_calls = self.divergent_events = 0
+        self._last_answers.clear()
+
+    async def run(self) -> List[float]:
+        """
+        Replays every event from the start of the recording, and returns
+        how long the device took to run each, in seconds.
+        """
+
+        self.reset()
+        device = self.device
+        durations: List[float] = []
+        for _, kind, pulses, writes, calls, changes in self.recording["events"]:
+            answers = self._answers = {}
+            for call in calls:
+                answers.setdefault(get_call_key(*call[:4]), deque()).append(call)
+            self._writes, self._call_steps = deque(writes), -1
+            self._apply_writes()
+            before = get_store_values(device)
+            self._call_steps = 0
+
+            start = perf_counter()
+            if kind == "scan":
+                if pulses is not None:
+                    device._pending_pulses = pulses
+                await device.scan()
+            else:
+                await self._main_loop(*pulses, **self._vars)
+            durations.append(perf_counter() - start)
+
+            # writes which arrived after the calls the device made this time
+            self._call_steps = 2 * len(calls)
+            self._apply_writes()
+            if get_changes(before, get_store_values(device)) != changes:
+                self.divergent_events += 1
+            self.divergent_calls += sum(len(left) for left in answers.values())
+        return durations
@@ -0,0 +1,71 @@
+from multiprocessing import shared_memory
+from typing import Optional, Sequence
+import numpy as np
+import time
+
+class SeqlockArray:
+    """
+    An array of float64 values in shared memory, guarded by a seqlock, for
+    passing state between one writer process and any number of reader
+    processes without locks. The writer makes the sequence number odd,
+    writes the values and makes it even again; a reader retries while the
+    sequence number is odd or changed during its copy, so it never sees a
+    half-written array and never blocks the writer.
+
+    Created with `create=True` by the process which owns the block (and
+    which must `unlink()` it), and attached to by `name` in the others.
+    Not supported with pycopy.
+    """
+
+    def __init__(self, size: int, name: Optional[str] = None, create: bool = False):
+        self.size = size
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=8 * (size + 1))
+        self.seq = np.ndarray((1,), dtype=np.uint64, buffer=self.shm.buf, offset=0)
+        self.values = np.ndarray((size,), dtype=np.float64, buffer=self.shm.buf, offset=8)
+        if create:
+            self.seq[0] = 0
+            self.values[:] = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, values: Sequence[float]) -> None:
+        seq = self.seq
+        seq[0] += 1
+        self.values[:] = values
+        seq[0] += 1
+
+    def read(self, timeout: float = 1.0) -> np.ndarray:
+        """
+        Returns a copy of the values. Yields to other threads between retries,
+        and raises `TimeoutError` if no consistent copy could be taken within
+        `timeout` seconds, e.g. because the writer died half way through a
+        write and left the sequence number odd.
+        """
+
+        seq, values = self.seq, self.values
+        deadline: Optional[float] = None
+        while True:
+            before = int(seq[0])
+            if not before & 1:
+                result = values.copy()
+                if int(seq[0]) == before:
+                    return result
+            if deadline is None:
+                deadline = time.perf_counter() + timeout
+            elif time.perf_counter() > deadline:
+                raise TimeoutError("No consistent read of {0} within {1} s: sequence number is {2}".format(self.name, timeout, int(seq[0])))
+            time.sleep(0)
+
+    def get_version(self) -> int:
+        """Returns the number of writes so far."""
+        return int(self.seq[0]) >> 1
+
+    def close(self) -> None:
+        # the arrays must not outlive the buffer they point to
+        del self.seq, self.values
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
@@ -1,5 +1,5 @@
-from typing import Tuple
-from .compat.builtins import perf_counter
+from typing import Any, Callable, Dict, Optional, Tuple
+from .compat.builtins import asyncio, perf_counter, sleep, Event
 
 class BaseCounter(object):
     def __init__(self, length, *args, **kwargs):
@@ -33,13 +33,17 @@ class BaseCounter(object):
         return (False, False, False, 0)
 
 class RealtimeCounter(BaseCounter):
+    def __init__(self, length, *args, clock: Callable[[], float] = perf_counter, **kwargs):
+        super(RealtimeCounter, self).__init__(length)
+        self.clock = clock
+
     def init_vars(self):
         super(RealtimeCounter, self).init_vars()
-        self.last_time = self.curr_time = self.init_time = self.last_sec_pulse = self.last_min_pulse = self.last_hour_pulse = perf_counter()
+        self.last_time = self.curr_time = self.init_time = self.last_sec_pulse = self.last_min_pulse = self.last_hour_pulse = self.clock()
     
     def update(self) -> None:
         # TODO determine if counter that includes sleep time should be used or not
-        self.last_time, self.curr_time = self.curr_time, perf_counter()
+        self.last_time, self.curr_time = self.curr_time, self.clock()
         self.elapsed_time = self.curr_time - self.init_time
 
     def get_pulse(self) -> Tuple[bool, bool, bool, float]:
@@ -65,4 +69,439 @@ class SimCounter(BaseCounter):
 
     def get_pulse(self) -> Tuple[bool, bool, bool, float]:
         time, time_interval = self.elapsed_time, self.time_interval
-        return not bool(time%(1/time_interval)), not bool(time%(60/time_interval)), not bool(time%(3600/time_interval)), time_interval
\ No newline at end of file
+        return not bool(time%(1/time_interval)), not bool(time%(60/time_interval)), not bool(time%(3600/time_interval)), time_interval
+
+class EwmaScheduler(object):
+    """
+    Sleeps for the remainder of the interval after each cycle, based on an
+    exponentially weighted moving average of the loop time. Simple, but the
+    achieved frequency drifts from the nominal one under load.
+    """
+
+    def __init__(self, interval: float, factor: float = 1/4, *args, **kwargs):
+        self.interval = interval
+        self.factor = factor
+        self.ewma_interval = 0.0
+
+    def start(self) -> None:
+        self.ewma_interval = 0.0
+
+    def update(self, time_interval: float) -> float:
+        self.ewma_interval = (self.factor * time_interval) + ((1 - self.factor) * self.ewma_interval)
+        return self.ewma_interval
+
+    async def wait(self) -> None:
+        if self.ewma_interval > 0:
+            await sleep(max(0, self.interval - self.ewma_interval))
+
+    def resume(self) -> None:
+        """Called when the device returns from idling. See `IdleMonitor`."""
+        pass
+
+    def set_interval(self, interval: float) -> None:
+        """Changes the interval from the next cycle on, e.g. when the watchdog degrades the device."""
+        self.interval = interval
+
+    def stop(self) -> None:
+        pass
+
+class DeadlineScheduler(EwmaScheduler):
+    """
+    Schedules each cycle at an absolute deadline `t0 + k * interval`, so that
+    sleep and loop time errors do not accumulate into frequency drift.
+
+    When a cycle overruns its deadline, the `skip` policy drops the missed
+    deadlines and waits for the next one on the grid, while the `catch-up`
+    policy runs the missed cycles back to back until it is on time again.
+    A non-zero `busy_wait` spins for the final part of each wait instead of
+    sleeping, trading CPU time for less wake-up jitter.
+    """
+
+    SKIP: str = "skip"
+    CATCH_UP: str = "catch-up"
+
+    def __init__(self, interval: float, policy: str = SKIP, busy_wait: float = 0.0, *args, **kwargs):
+        super(DeadlineScheduler, self).__init__(interval)
+        self.policy = policy
+        self.busy_wait = busy_wait
+        self.overruns = 0
+
+    def start(self) -> None:
+        super(DeadlineScheduler, self).start()
+        self.start_time = perf_counter()
+        self.cycle = 0
+        self.overruns = 0
+
+    def update(self, time_interval: float) -> float:
+        return time_interval
+
+    def resume(self) -> None:
+        # the deadlines missed while idle are not overruns
+        self.start_time = perf_counter()
+        self.cycle = 0
+
+    def set_interval(self, interval: float) -> None:
+        # deadlines are re-anchored on now, as the old start time would put the
+        # next one about as far ahead as the device has been running
+        super(DeadlineScheduler, self).set_interval(interval)
+        self.start_time = perf_counter()
+        self.cycle = 0
+
+    async def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        self.cycle += 1
+        deadline = self.start_time + self.cycle * self.interval
+        now = perf_counter()
+        if now >= deadline:
+            self.overruns += 1
+            if self.policy == DeadlineScheduler.CATCH_UP:
+                # run the missed cycle right away, but still yield to other tasks
+                await sleep(0)
+                return
+            self.cycle = int((now - self.start_time) / self.interval) + 1
+            deadline = self.start_time + self.cycle * self.interval
+        if deadline - now > self.busy_wait:
+            await sleep(deadline - now - self.busy_wait)
+        while perf_counter() < deadline:
+            pass
+
+class ChangeFilter(object):
+    """
+    Decides which values are worth publishing: those which moved by more
+    than their deadband since they were last published, or which have not
+    been published for `max_silence` seconds (0 to never republish an
+    unchanged value). Values are keyed by name, and values which are never
+    published are always worth publishing.
+
+    A deadband is an `(absolute, relative)` pair, and a value has moved
+    when the change is above the larger of `absolute` and `relative` times
+    the last published value. Deadbands are looked up by key, then by
+    `default_key(key)` (e.g. the tag name without its device); keys with
+    neither publish on any change.
+    """
+
+    def __init__(self, deadbands: Dict[str, Tuple[float, float]], max_silence: float = 0.0,
+        default_key: Callable[[str], str] = lambda key: key
+    ):
+        self.deadbands = deadbands
+        self.max_silence = max_silence
+        self.default_key = default_key
+        self.published: Dict[str, Tuple[Any, float]] = {}
+        self.sent = 0
+        self.skipped = 0
+
+    def get_deadband(self, key: str) -> Tuple[float, float]:
+        deadband = self.deadbands.get(key)
+        if deadband is None:
+            deadband = self.deadbands.get(self.default_key(key), (0.0, 0.0))
+        return deadband
+
+    def changed(self, key: str, value: Any, now: float) -> bool:
+        """Returns whether `value` should be published, and if so, records it as published."""
+
+        last = self.published.get(key)
+        if last is not None:
+            last_value, last_time = last
+            silent = self.max_silence > 0 and now - last_time >= self.max_silence
+            if not silent:
+                absolute, relative = self.get_deadband(key)
+                if abs(value - last_value) <= max(absolute, relative * abs(last_value)):
+                    self.skipped += 1
+                    return False
+        self.published[key] = (value, now)
+        self.sent += 1
+        return True
+
+class IdleMonitor(object):
+    """
+    Drops a device to an idle rate of one cycle every `idle_interval` seconds
+    once `idle_cycles` cycles in a row have left its tags unchanged, and
+    brings it back to full rate on the first cycle that changes them, or as
+    soon as `wake()` is called for an incoming write that changes them (see
+    `WatchedSlaveContext`). Writes that leave the values unchanged, e.g. a
+    PLC setting an FBD's Run_FBD tag on every scan, do not keep it active.
+
+    Keeps the time spent in each mode, and the latency between a wake-up
+    and the start of the cycle that answers it.
+    """
+
+    def __init__(self, idle_cycles: int, idle_interval: float, clock: Callable[[], float] = perf_counter):
+        self.idle_cycles = idle_cycles
+        self.idle_interval = idle_interval
+        self.clock = clock
+        self.idle = False
+        self.in_cycle = False
+        self.quiet_cycles = 0
+        # whether there was an incoming write since the last cycle ended
+        self.written = False
+        self.woken = Event()
+        self.wake_time: Optional[float] = None
+        self.mode_start = clock()
+        self.time_active = 0.0
+        self.time_idle = 0.0
+        self.wakeups = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _switch(self, idle: bool) -> None:
+        now = self.clock()
+        if self.idle:
+            self.time_idle += now - self.mode_start
+        else:
+            self.time_active += now - self.mode_start
+        self.idle, self.mode_start = idle, now
+
+    def wake(self) -> None:
+        """
+        Notes an incoming write that changed the device's values, which keeps
+        the device at full rate, and wakes it if it is idle and not in a cycle.
+        """
+
+        self.written = True
+        if self.idle and not self.in_cycle and self.wake_time is None:
+            self.wake_time = self.clock()
+            self.woken.set()
+
+    def start_cycle(self) -> None:
+        self.in_cycle = True
+        if self.wake_time is not None:
+            latency = self.clock() - self.wake_time
+            self.wakeups += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.wake_time = None
+            self.quiet_cycles = 0
+            self._switch(False)
+
+    def end_cycle(self, changed: bool) -> bool:
+        """
+        Ends a cycle that did or did not change the device's tags, and
+        returns whether the device should now wait at the idle rate.
+        """
+
+        self.in_cycle = False
+        self.quiet_cycles = 0 if changed or self.written else self.quiet_cycles + 1
+        self.written = False
+        idle = self.idle_cycles > 0 and self.quiet_cycles >= self.idle_cycles
+        if idle != self.idle:
+            self._switch(idle)
+        return idle
+
+    async def wait(self) -> None:
+        self.woken.clear()
+        if self.wake_time is not None:
+            return
+        try:
+            await asyncio.wait_for(self.woken.wait(), self.idle_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    def get_metrics(self) -> Dict[str, float]:
+        now = self.clock()
+        time_active, time_idle = self.time_active, self.time_idle
+        if self.idle:
+            time_idle += now - self.mode_start
+        else:
+            time_active += now - self.mode_start
+        return {
+            "time_active": time_active,
+            "time_idle": time_idle,
+            "wakeups": self.wakeups,
+            "mean_wake_latency": self.total_latency / self.wakeups if self.wakeups else 0.0,
+            "max_wake_latency": self.max_latency,
+        }
+
+class WatchedSlaveContext(object):
+    """
+    Wraps a device's slave context so that writes which change its values,
+    made outside the device's cycles (i.e. by other devices), wake its
+    `IdleMonitor`; a write of the values already there does not. The
+    device's own changes are seen by the monitor at the end of each cycle,
+    along with those other devices make while it is in one. Otherwise
+    behaves as the wrapped context.
+    """
+
+    def __init__(self, context: Any, monitor: IdleMonitor):
+        self.context = context
+        self.monitor = monitor
+
+    def setValues(self, fx: int, address: int, values: Any) -> None:
+        context = self.context
+        if not self.monitor.in_cycle and list(context.getValues(fx, address, len(values))) != list(values):
+            self.monitor.wake()
+        context.setValues(fx, address, values)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.context, name)
+
+class LoopStats(object):
+    """
+    Keeps timing statistics of a device's cycles at O(1) cost per cycle:
+    the number of overruns (cycles longer than `interval`), the longest
+    cycle, and a histogram of cycle durations whose buckets end at the
+    given multiples of `interval`; the last bucket holds everything longer.
+    The 99th percentile is estimated as the end of the bucket containing it.
+    """
+
+    BUCKETS: Tuple[float, ...] = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+
+    def __init__(self, interval: float, buckets: Tuple[float, ...] = BUCKETS):
+        self.interval = interval
+        self.bounds = tuple(interval * bucket for bucket in buckets)
+        self.histogram = [0] * (len(buckets) + 1)
+        self.cycles = 0
+        self.overruns = 0
+        self.recent_overruns = 0
+        self.max_duration = 0.0
+
+    def record(self, duration: float) -> bool:
+        """Records a cycle's duration, and returns whether it overran."""
+
+        self.cycles += 1
+        self.max_duration = max(self.max_duration, duration)
+        bucket = 0
+        for bound in self.bounds:
+            if duration <= bound:
+                break
+            bucket += 1
+        self.histogram[bucket] += 1
+        if duration > self.interval:
+            self.overruns += 1
+            self.recent_overruns += 1
+            return True
+        return False
+
+    def take_recent_overruns(self) -> int:
+        """Returns the overruns since this was last called, e.g. in the last second."""
+
+        overruns, self.recent_overruns = self.recent_overruns, 0
+        return overruns
+
+    def get_p99(self) -> float:
+        threshold, total = self.cycles * 0.99, 0
+        for bound, count in zip(self.bounds, self.histogram):
+            total += count
+            if total >= threshold:
+                return min(bound, self.max_duration)
+        return self.max_duration
+
+class VirtualClock(object):
+    """
+    A shared simulation clock for running devices in lockstep. Instead of
+    sleeping on wall-clock time, each device runs exactly one cycle per tick
+    and then waits on the clock; once every device that joined the clock
+    has finished its cycle, the clock advances by `interval` and releases
+    them all for the next tick. The simulation therefore runs as fast as the
+    devices can compute, and always in the same order.
+
+    Only devices sharing an event loop can share a clock.
+    """
+
+    def __init__(self, interval: float, start: float = 0.0):
+        self.interval = interval
+        self.start = start
+        self.ticks = 0
+        self.participants = 0
+        self._finished = 0
+        self._next_tick = Event()
+
+    def now(self) -> float:
+        # multiplied rather than accumulated to avoid floating point drift
+        return self.start + self.ticks * self.interval
+
+    def join(self) -> None:
+        self.participants += 1
+
+    def leave(self) -> None:
+        self.participants -= 1
+        if self.participants > 0 and self._finished >= self.participants:
+            self._advance()
+
+    async def tick_done(self) -> None:
+        self._finished += 1
+        if self._finished >= self.participants:
+            self._advance()
+            await sleep(0)
+        else:
+            await self._next_tick.wait()
+
+    def _advance(self) -> None:
+        self.ticks += 1
+        self._finished = 0
+        next_tick, self._next_tick = self._next_tick, Event()
+        next_tick.set()
+
+class LockstepScheduler(EwmaScheduler):
+    """
+    Schedules each cycle on a `VirtualClock` shared with other devices.
+    A device with a `stride` greater than 1 runs once every `stride` ticks.
+    """
+
+    def __init__(self, clock: VirtualClock, stride: int = 1, *args, **kwargs):
+        super(LockstepScheduler, self).__init__(clock.interval * stride)
+        self.stride = stride
+        # join on creation, so that no device can run ahead of
+        # devices which have been created but not started yet
+        self.clock = clock
+        self.clock.join()
+        self._joined = True
+
+    def start(self) -> None:
+        pass
+
+    def update(self, time_interval: float) -> float:
+        return time_interval
+
+    def set_interval(self, interval: float) -> None:
+        self.stride = max(1, round(interval / self.clock.interval))
+        self.interval = self.clock.interval * self.stride
+
+    async def wait(self) -> None:
+        for _ in range(self.stride):
+            await self.clock.tick_done()
+
+    def stop(self) -> None:
+        if self._joined:
+            self.clock.leave()
+            self._joined = False
+
+def create_scheduler(interval: float, schedule: str = "ewma", overrun_policy: str = DeadlineScheduler.SKIP, busy_wait: float = 0.0, clock: Optional[VirtualClock] = None) -> EwmaScheduler:
+    if clock is not None:
+        return LockstepScheduler(clock, max(1, round(interval / clock.interval)))
+    if schedule == "deadline":
+        return DeadlineScheduler(interval, overrun_policy, busy_wait)
+    return EwmaScheduler(interval)
+
+class RateGroup(object):
+    """
+    A part of a device's cycle which runs slower than the device itself,
+    every `interval` seconds of device time. `due` must be called exactly
+    once per cycle, and returns whether the group runs in that cycle.
+    A group whose interval is not above the device's always runs.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.elapsed = interval
+
+    def due(self, time_interval: float) -> bool:
+        self.elapsed += time_interval
+        if self.elapsed < self.interval:
+            return False
+        # keep the remainder so the group's rate does not drift
+        self.elapsed = min(self.elapsed - self.interval, self.interval)
+        return True
+
+def get_phase_offset(name: str, interval: float) -> float:
+    """
+    Returns a start offset within `interval` for the device `name`, so
+    that devices with the same period do not all start their cycles at
+    once. The offset is hashed from the name (32-bit FNV-1a), so it is
+    the same on every run, and under pycopy.
+    """
+
+    digest = 0x811c9dc5
+    for byte in name.encode():
+        digest = ((digest ^ byte) * 0x01000193) & 0xffffffff
+    return interval * digest / 0x100000000
@@ -1,23 +1,287 @@
-from typing import Tuple, Optional, Literal, Union
+from typing import Any, Coroutine, Dict, List, Set, Tuple, Type, Optional, Literal, Union
 from modbus.base import BaseModbusClient, BaseModbusDevice
 from modbus.types import RegisterValue
 from modbus.types.remote import RemoteDeviceType
-from controlblock import FBD, start_fbd
+from controlblock import FBD
 from datetime import datetime
 from modbus.compat.builtins import asyncio
-from HMI import BaseHMI, HMI_UV, HMI_VSD, HMI_mv, HMI_pump
+from HMI import BaseHMI, HMI_FIT, HMI_LIT, HMI_LS, HMI_UV, HMI_VSD, HMI_mv, HMI_pump
+
+class IOImage(object):
+    """
+    The I/O image table of a PLC: the values it reads from each of its
+    remote devices (its inputs) at the start of a scan, and those it writes
+    to them (its outputs) at the end, so that its logic runs against local
+    values only, with the same round trips every scan whatever the logic.
+
+    Each remote device is declared once, with its inputs and outputs, and
+    whether it is run every scan; `get()` and `set()` then read inputs and
+    set outputs by name, like `ask_device()` and `tell_device()`. Outputs
+    which only pass on another device's input are linked to it with
+    `link()` instead, so that in scan mode they pass on the input as of the
+    same scan.
+
+    Only outputs which changed are written, except every `refresh` scans,
+    when all of them are written again, in case another client overwrote
+    them. Inputs returned by the scans that ran devices are held back until
+    the next scan starts, so that the logic always sees a complete image of
+    the same scan, however late (e.g. pipelined) the scans completed.
+    """
+
+    def __init__(self, refresh: int = 0):
+        self.inputs: Dict[RemoteDeviceType, Dict[str, Optional[RegisterValue]]] = {}
+        self.outputs: Dict[RemoteDeviceType, Dict[str, Optional[RegisterValue]]] = {}
+        # the outputs as last written to each device, so that only changes are written
+        self.written: Dict[RemoteDeviceType, Dict[str, Optional[RegisterValue]]] = {}
+        self.runs: List[RemoteDeviceType] = []
+        # the outputs of other devices set from each device's inputs, as (input, device, output)
+        self.links: Dict[RemoteDeviceType, List[Tuple[str, RemoteDeviceType, str]]] = {}
+        # inputs returned by the scans that ran devices, swapped into `inputs` when the next scan starts
+        self.received: Dict[RemoteDeviceType, Tuple[Optional[RegisterValue], ...]] = {}
+        self.refresh = refresh
+        self.scans = 0
+
+    def declare(self, device_alias: RemoteDeviceType, inputs: Tuple[str, ...] = (), outputs: Tuple[str, ...] = (), run: bool = True) -> None:
+        self.inputs[device_alias] = dict.fromkeys(inputs)
+        self.outputs[device_alias] = dict.fromkeys(outputs)
+        self.written[device_alias] = {}
+        if run:
+            self.runs.append(device_alias)
+
+    def link(self, device_alias: RemoteDeviceType, tag_name: str, target_alias: RemoteDeviceType, output_name: str) -> None:
+        """Sets output `output_name` of `target_alias` to input `tag_name` of `device_alias` in every scan."""
+
+        if tag_name not in self.inputs[device_alias]:
+            raise KeyError("Input {0} of {1} is not declared: its inputs are {2}".format(tag_name, device_alias, tuple(self.inputs[device_alias])))
+        if output_name not in self.outputs[target_alias]:
+            raise KeyError("Output {0} of {1} is not declared: its outputs are {2}".format(output_name, target_alias, tuple(self.outputs[target_alias])))
+        self.links.setdefault(device_alias, []).append((tag_name, target_alias, output_name))
+
+    def start_scan(self) -> Tuple[RemoteDeviceType, ...]:
+        """
+        Starts a scan: swaps in the inputs received since the last one, and
+        returns the devices whose inputs must still be read.
+        """
+
+        received, self.received = self.received, {}
+        for device_alias, values in received.items():
+            inputs = self.inputs[device_alias]
+            inputs.update(zip(inputs, values))
+        self.scans += 1
+        if self.refresh > 0 and self.scans % self.refresh == 0:
+            for written in self.written.values():
+                written.clear()
+        return tuple(
+            device_alias for device_alias, inputs in self.inputs.items()
+            if len(inputs) and device_alias not in received
+        )
+
+    def update(self, device_alias: RemoteDeviceType, result: Any) -> None:
+        """Sets the inputs of a device from the result of reading them."""
+
+        inputs = self.inputs[device_alias]
+        # a single tag's value is not returned in a tuple
+        inputs.update(zip(inputs, result if len(inputs) > 1 else (result,)))
+
+    def receive(self, device_alias: RemoteDeviceType, result: Any) -> None:
+        """Holds the inputs of a device returned by the scan that ran it, for the next scan."""
+
+        self.received[device_alias] = tuple(result) if len(self.inputs[device_alias]) > 1 else (result,)
+
+    def get(self, device_alias: RemoteDeviceType, *tag_names: str) -> Union[Optional[RegisterValue], Tuple[Optional[RegisterValue], ...]]:
+        """Returns the values of inputs of a device, read at the start of the scan."""
+
+        inputs = self.inputs[device_alias]
+        if len(tag_names) == 1:
+            return inputs[tag_names[0]]
+        return tuple(inputs[tag_name] for tag_name in tag_names)
+
+    def set(self, device_alias: RemoteDeviceType, *tag_values: Tuple[str, RegisterValue]) -> None:
+        """Sets outputs of a device, written at the end of the scan."""
+
+        outputs = self.outputs[device_alias]
+        for tag_name, value in tag_values:
+            if tag_name not in outputs:
+                raise KeyError("Output {0} of {1} is not declared: its outputs are {2}".format(tag_name, device_alias, tuple(outputs)))
+            outputs[tag_name] = value
+
+    def set_links(self, device_alias: RemoteDeviceType) -> None:
+        """
+        Sets the outputs linked to the inputs of a device: as returned by the
+        scan that just ran it, if any, or else as read at the start of the scan.
+        """
+
+        values = self.received.get(device_alias)
+        inputs = self.inputs[device_alias] if values is None else dict(zip(self.inputs[device_alias], values))
+        for tag_name, target_alias, output_name in self.links.get(device_alias, ()):
+            self.outputs[target_alias][output_name] = inputs[tag_name]
+
+    def get_changes(self, device_alias: RemoteDeviceType) -> Tuple[Tuple[str, RegisterValue], ...]:
+        """Returns the outputs of a device set since they were last written, and marks them written."""
+
+        written = self.written[device_alias]
+        changes = tuple(
+            (tag_name, value) for tag_name, value in self.outputs[device_alias].items()
+            if value is not None and (tag_name not in written or written[tag_name] != value)
+        )
+        written.update(changes)
+        return changes
 
 class PLC(BaseModbusDevice):
+    CHECKPOINT_EXCLUDED = ("_pending", "colocated_fbds")
+
     def __init__(self, *args, **kwargs):
+        """
+        Initializes the PLC. See `BaseModbusDevice` for the other arguments.
+
+        Arguments
+        ---------
+        pipelined   -   Whether the requests writing each scan's outputs (and running
+                        the FBDs) overlap with the next scan instead of being waited
+                        for; see `_pipeline()`. Inputs that scan requests return are
+                        received into `io_image` when the request completes, so the
+                        logic, and the outputs linked to them, see them one scan later
+                        than without pipelining. Requests to each device are still made
+                        in order, one scan at a time.
+
+        scan_fbds   -   Whether FBDs are run with a single scan request instead of
+                        setting their Run_FBD tag. FBDs in `colocated_fbds` are
+                        always run this way.
+
+        refresh_outputs
+                    -   Number of scans after which every output in `io_image` is
+                        written again, and not only those which changed, so that
+                        outputs overwritten by other clients are restored. 0 never
+                        writes them again. Default 200, i.e. once a second at 200 Hz.
+        """
+
         super().__init__(*args, **kwargs)
+        self.scan_fbds: bool = kwargs.get("scan_fbds", False)
+        self.pipelined: bool = kwargs.get("pipelined", False)
+        self._unscannable: Set[RemoteDeviceType] = set()
+        self._pending: Dict[RemoteDeviceType, "asyncio.Task[Any]"] = {}
+        self.io_image = IOImage(kwargs.get("refresh_outputs", 200))
+        # FBDs run in this process by this PLC's scans; see `colocate_fbd()`
+        self.colocated_fbds: Dict[RemoteDeviceType, FBD] = {}
         self.init_plc(*args, **kwargs)
         print("{0}: {1} started".format(datetime.now(), type(self).__name__))
-    
-    async def run_device(self, device_alias: RemoteDeviceType) -> None:
-        await start_fbd(self, device_alias)
 
-    async def tell_and_run(self, device_alias: RemoteDeviceType, *tag_values: Tuple[str, RegisterValue]) -> None:
-        await self.tell_device(device_alias, *(tag_values + ((FBD.RUN_TAG, True),)))
+    async def run(self) -> None:
+        # co-located FBDs connect to their I/O devices alongside this PLC, and cannot be run until they have
+        for fbd in self.colocated_fbds.values():
+            await fbd.ready.wait()
+        try:
+            await super().run()
+        finally:
+            await self.flush_pipeline()
+
+    def colocate_fbd(self, device_alias: RemoteDeviceType, fbd: FBD) -> None:
+        """
+        Has this PLC run `fbd`, its remote device `device_alias`, in-process:
+        the FBD no longer runs on its own cycles, but whenever this PLC runs
+        it, with a scan executed directly against its data store and the
+        pulses of this PLC's cycles. Its server, and its clients to its I/O
+        devices, are unchanged, so other devices can still read it over Modbus.
+
+        `fbd` must be registered with `BaseModbusClient.register_local_device()`
+        at the address this PLC knows it by, before this PLC connects.
+        """
+
+        fbd.driven = fbd.scanned = True
+        self.colocated_fbds[device_alias] = fbd
+
+    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
+        """
+        Runs one scan: reads every input in `io_image` in one gathered phase,
+        runs `run_logic()` against the image, and writes every changed output
+        (and runs the devices) in another. In scan mode, the devices whose
+        inputs are linked to other outputs are run first, so that those
+        outputs are written in the same scan. PLCs which do not use the image
+        override this instead.
+        """
+
+        for fbd in self.colocated_fbds.values():
+            fbd.add_pulses(sec_pulse, min_pulse, hrs_pulse, time_interval)
+        await self.read_inputs()
+        self.run_logic(sec_pulse, min_pulse, hrs_pulse, time_interval)
+        await self.write_outputs()
+
+    def run_logic(self, sec_pulse, min_pulse, hrs_pulse, time_interval) -> None:
+        """The logic of the PLC, which reads and sets its remote devices' values through `io_image` only."""
+
+        pass
+
+    async def read_inputs(self) -> None:
+        image = self.io_image
+        devices = image.start_scan()
+        results = await asyncio.gather(*(
+            self.ask_device(device_alias, *image.inputs[device_alias]) for device_alias in devices
+        ))
+        for device_alias, result in zip(devices, results):
+            image.update(device_alias, result)
+
+    async def write_outputs(self) -> None:
+        image = self.io_image
+        sources: Tuple[RemoteDeviceType, ...] = ()
+        if not self.pipelined and (self.scan_fbds or len(self.colocated_fbds)):
+            # the scans of these return the inputs that the outputs linked to them are set from
+            sources = tuple(device_alias for device_alias in image.links if device_alias in image.runs)
+            await asyncio.gather(*(self._write_outputs(device_alias) for device_alias in sources))
+        for device_alias in image.links:
+            image.set_links(device_alias)
+        writes: Dict[RemoteDeviceType, Coroutine[Any, Any, Any]] = {}
+        for device_alias in image.outputs:
+            if device_alias not in sources:
+                write = self._write_outputs(device_alias)
+                if write is not None:
+                    writes[device_alias] = write
+        if self.pipelined:
+            # the writes overlap with the next scan, one scan in flight per device
+            await asyncio.gather(*(self._pipeline(device_alias, write) for device_alias, write in writes.items()))
+        else:
+            await asyncio.gather(*writes.values())
+
+    def _write_outputs(self, device_alias: RemoteDeviceType) -> Optional[Coroutine[Any, Any, Any]]:
+        """Returns the request writing the changed outputs of a device, and running it, if it needs one."""
+
+        tag_values = self.io_image.get_changes(device_alias)
+        if device_alias in self.io_image.runs:
+            return self._write_and_run(device_alias, *tag_values)
+        elif len(tag_values):
+            return self.tell_device(device_alias, *tag_values)
+        return None
+
+    async def _write_and_run(self, device_alias: RemoteDeviceType, *tag_values: Tuple[str, RegisterValue]) -> None:
+        inputs = tuple(self.io_image.inputs[device_alias])
+        result = await self._scan(device_alias, inputs, *tag_values)
+        if result is None:
+            await self.tell_device(device_alias, *(tag_values + ((FBD.RUN_TAG, True),)))
+        elif len(inputs):
+            # the scan returns the inputs as of this run, which the next scan uses
+            self.io_image.receive(device_alias, result)
+
+    async def flush_pipeline(self) -> None:
+        """Waits for the requests still in flight in pipelined mode."""
+
+        pending, self._pending = self._pending, {}
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+
+    async def _pipeline(self, device_alias: RemoteDeviceType, request: Coroutine[Any, Any, Any]) -> "asyncio.Task[Any]":
+        # one cycle of requests in flight per device, so they stay in order and cannot pile up
+        previous = self._pending.get(device_alias)
+        if previous is not None:
+            await previous
+        task = self._pending[device_alias] = asyncio.create_task(request)
+        return task
+    
+    async def _scan(self, device_alias: RemoteDeviceType, outputs: Tuple[str, ...], *tag_values: Tuple[str, RegisterValue]):
+        if device_alias not in self.colocated_fbds and (not self.scan_fbds or device_alias in self._unscannable):
+            return None
+        result = await self.scan_device(device_alias, *tag_values, outputs=outputs)
+        if result is None:
+            # remote does not support scan requests (e.g. when run with pycopy)
+            self._unscannable.add(device_alias)
+        return result
 
     def get_device_wifi(self) -> Tuple[str, RegisterValue]:
         return "WRIO_Enb", self.WRIO_Enb
@@ -26,6 +290,13 @@ class PLC(BaseModbusDevice):
         pass
 
 class SCADAStage(PLC):
+    ALARM_HMIS: Tuple[Type[BaseHMI], ...] = (HMI_LIT, HMI_FIT, HMI_LS)
+    """
+    HMIs which only read indicator values and alarms. These run in the
+    "alarms" rate group (and on every second pulse, so that totalisers
+    keep counting), while the HMIs of actuators run every cycle.
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.WRIO_Enb: bool = False
@@ -35,6 +306,9 @@ class SCADAStage(PLC):
             await self.tell_device(plc, (tag, val))
 
     async def _run_hmis(self, sec_pulse, min_pulse, hrs_pulse, time_interval, *hmi_list: BaseHMI) -> None:
+        alarms_group = self.rate_groups.get("alarms")
+        if alarms_group is not None and not alarms_group.due(time_interval) and not sec_pulse:
+            hmi_list = tuple(hmi_client for hmi_client in hmi_list if not isinstance(hmi_client, self.ALARM_HMIS))
         await asyncio.gather(*(hmi_client._main_loop(sec_pulse, min_pulse, hrs_pulse, time_interval) for hmi_client in hmi_list))
 
     def _set_hmi_status(self, reset: bool, auto_on: bool, auto_off: bool, *hmi_list: Union[HMI_mv, HMI_pump, HMI_VSD, HMI_UV]):
@@ -6,7 +6,7 @@
 # -
 # import swat-plc libraries
 # -
-from logicblock import TONR
+from logicblock import TONR, create_timer
 from controlblock import AIN_FBD, MV_FBD, FIT_FBD, Duty2_FBD, PMP_FBD
 # -
 # import other libraries
@@ -14,20 +14,29 @@ from controlblock import AIN_FBD, MV_FBD, FIT_FBD, Duty2_FBD, PMP_FBD
 from typing import Dict, List, Tuple, Type, cast
 
 from modbus.types.remote import RemoteDeviceType
-from modbus.compat.builtins import asyncio
 from modbus.tag import Tag
 from modbus.base import BaseModbusDevice
 from .base_plc import PLC
 
 class PLC1(PLC):
     def init_plc(self, *args, **kwargs) -> None:
-        self.TON_FIT102_P1_TM: TONR = TONR(10, self.device_frequency)
-        self.TON_FIT102_P2_TM: TONR = TONR(10, self.device_frequency)
+        self.TON_FIT102_P1_TM: TONR = create_timer(10, self.device_frequency, self.timer_clock)
+        self.TON_FIT102_P2_TM: TONR = create_timer(10, self.device_frequency, self.timer_clock)
         self.Mid_MV101_AutoInp: bool = True
         self.Mid_FIT101_Flow_Hty: bool = True
         self.Mid_P_RAW_WATER_DUTY_AutoInp: bool = True
         self.Min_Test: int = 0
 
+        image = self.io_image
+        image.declare(self.LIT101, outputs=("WRIO_Enb",))
+        image.declare(self.FIT101, outputs=("Totaliser_Enb", "WRIO_Enb"))
+        image.declare(self.MV101, outputs=("AutoInp",))
+        image.declare(self.DTY101, inputs=("Start_Pmp1", "Start_Pmp2"), outputs=("AutoInp",))
+        image.declare(self.P101, outputs=("AutoInp",))
+        image.declare(self.P102, outputs=("AutoInp",))
+        image.link(self.DTY101, "Start_Pmp1", self.P101, "AutoInp")
+        image.link(self.DTY101, "Start_Pmp2", self.P102, "AutoInp")
+
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.LIT101, self.MV101, self.FIT101, self.DTY101, self.P101, self.P102 = (
             RemoteDeviceType(dev) for dev in ("LIT101", "MV101", "FIT101", "DTY101", "P101", "P102")
@@ -44,13 +53,14 @@ class PLC1(PLC):
         })
         return super().get_device_classes(**kwargs)
     
-    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval):
+    def run_logic(self, sec_pulse, min_pulse, hrs_pulse, time_interval) -> None:
         self.FIT101_Tot_Enb = (self.MV101_Status == 2)
         
-        self.TON_FIT102_P1_TM = TONR(10, self.device_frequency)
+        # the timers are reset instead of being recreated every cycle
+        self.TON_FIT102_P1_TM.reset()
         self.TON_FIT102_P1_DN = self.TON_FIT102_P1_TM.DN
         
-        self.TON_FIT102_P2_TM = TONR(10, self.device_frequency)
+        self.TON_FIT102_P2_TM.reset()
         self.TON_FIT102_P2_DN = self.TON_FIT102_P2_TM.DN
 
         if min_pulse:
@@ -59,27 +69,11 @@ class PLC1(PLC):
         if self.State == 1:
             self.Mid_MV101_AutoInp = self.Mid_P_RAW_WATER_DUTY_AutoInp = False
 
-        device_wifi = self.get_device_wifi()
-        await asyncio.gather(
-            self.tell_and_run(self.LIT101, device_wifi),
-            self.tell_and_run(self.FIT101, 
-                ("Totaliser_Enb", self.Mid_FIT101_Flow_Hty),
-                device_wifi
-            ),
-            self.tell_and_run(self.MV101, ("AutoInp", self.Mid_MV101_AutoInp)),
-            self.tell_and_run(self.DTY101, ("AutoInp", self.Mid_P_RAW_WATER_DUTY_AutoInp)),
-        )
-        
-        is_p101_open, is_p102_open = \
-            await self.ask_device(self.DTY101, "Start_Pmp1", "Start_Pmp2")
-
-        await asyncio.gather(
-            self.tell_device(self.P101, ("AutoInp", is_p101_open)),
-            self.tell_device(self.P102, ("AutoInp", is_p102_open)),
-
-            self.run_device(self.P101),
-            self.run_device(self.P102),
-        )
+        image, device_wifi = self.io_image, self.get_device_wifi()
+        image.set(self.LIT101, device_wifi)
+        image.set(self.FIT101, ("Totaliser_Enb", self.Mid_FIT101_Flow_Hty), device_wifi)
+        image.set(self.MV101, ("AutoInp", self.Mid_MV101_AutoInp))
+        image.set(self.DTY101, ("AutoInp", self.Mid_P_RAW_WATER_DUTY_AutoInp))
 
     def create_identification(self):
         return super().create_identification(
@@ -1,8 +1,7 @@
 from typing import Dict, List, Tuple, Type, cast
-from logicblock import TONR
+from logicblock import TONR, create_timer
 from modbus.tag import Tag
 from modbus.types.remote import RemoteDeviceType
-from modbus.compat.builtins import asyncio
 from controlblock import MV_FBD, SWITCH_FBD, PMP_FBD, Duty2_FBD, AIN_FBD, FIT_FBD
 from modbus.base import BaseModbusDevice
 from .base_plc import PLC
@@ -11,18 +10,35 @@ class PLC2(PLC):
     'plc2 logic'
 
     def init_plc(self, *args, **kwargs) -> None:
-        self.TON_FIT102_P1_TM: TONR = TONR(3, self.device_frequency)
-        self.TON_FIT102_P2_TM: TONR = TONR(3, self.device_frequency)
-        self.TON_FIT102_P3_TM: TONR = TONR(3, self.device_frequency)
-        self.TON_FIT102_P4_TM: TONR = TONR(3, self.device_frequency)
-        self.TON_FIT102_P5_TM: TONR = TONR(3, self.device_frequency)
-        self.TON_FIT102_P6_TM: TONR = TONR(3, self.device_frequency)
+        self.TON_FIT102_P1_TM: TONR = create_timer(3, self.device_frequency, self.timer_clock)
+        self.TON_FIT102_P2_TM: TONR = create_timer(3, self.device_frequency, self.timer_clock)
+        self.TON_FIT102_P3_TM: TONR = create_timer(3, self.device_frequency, self.timer_clock)
+        self.TON_FIT102_P4_TM: TONR = create_timer(3, self.device_frequency, self.timer_clock)
+        self.TON_FIT102_P5_TM: TONR = create_timer(3, self.device_frequency, self.timer_clock)
+        self.TON_FIT102_P6_TM: TONR = create_timer(3, self.device_frequency, self.timer_clock)
         self.Mid_MV201_AutoInp: bool = False
         self.Mid_P_NACL_DUTY_AutoInp: bool = False
         self.Mid_P_HCL_DUTY_AutoInp: bool = False 
         self.Mid_P_NAOCL_FAC_DUTY_AutoInp: bool = False
         self.Mid_FIT201_Tot_Enb: bool = False
 
+        image = self.io_image
+        image.declare(self.MV201, outputs=("AutoInp",))
+        for switch in (self.LSL201, self.LSL202, self.LSLL203):
+            image.declare(switch)
+        for duty in (self.DTY201, self.DTY202, self.DTY203):
+            image.declare(duty, inputs=("Start_Pmp1", "Start_Pmp2"), outputs=("AutoInp",))
+        for pump in (self.P201, self.P202, self.P203, self.P204, self.P205, self.P206):
+            image.declare(pump, outputs=("AutoInp",))
+        image.declare(self.FIT201, outputs=("Totaliser_Enb", "WRIO_Enb"))
+        for ait_dev in (self.AIT201, self.AIT202, self.AIT203):
+            image.declare(ait_dev, outputs=("WRIO_Enb",))
+        for duty, pumps in (
+            (self.DTY201, (self.P201, self.P202)), (self.DTY202, (self.P203, self.P204)), (self.DTY203, (self.P205, self.P206))
+        ):
+            image.link(duty, "Start_Pmp1", pumps[0], "AutoInp")
+            image.link(duty, "Start_Pmp2", pumps[1], "AutoInp")
+
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.MV201, self.LSL201, self.LSL202, self.LSLL203, self.DTY201 = (
             RemoteDeviceType(dev) for dev in ("MV201", "LSL201", "LSL202", "LSLL203", "DTY201")
@@ -45,7 +61,7 @@ class PLC2(PLC):
         })
         return super().get_device_classes(**kwargs)
 
-    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
+    def run_logic(self, sec_pulse, min_pulse, hrs_pulse, time_interval) -> None:
         self.Mid_FIT201_Tot_Enb = self.MV201_Status == 2
         self.TON_FIT102_P1_TM.tick( self.FIT201_ALL and self.MV201_Status == 2 and self.P201_Status == 2) 
         self.TON_FIT102_P2_TM.tick( self.FIT201_ALL and self.MV201_Status == 2 and self.P202_Status == 2) 
@@ -66,43 +82,15 @@ class PLC2(PLC):
                     self.Mid_P_HCL_DUTY_AutoInp = self.Mid_P_NAOCL_FAC_DUTY_AutoInp = \
                             self.Mid_P_NAOCL_UF_DUTY_AutoInp = False
 
-        await asyncio.gather(
-            self.tell_and_run(self.MV201, ("AutoInp", self.Mid_MV201_AutoInp)),
-            self.run_device(self.LSL201),
-            self.run_device(self.LSL202),
-            self.run_device(self.LSLL203)
-        )
-
-        (is_p201_open, is_p202_open), (is_p203_open, is_p204_open), (is_p205_open, is_p206_open) = \
-            await asyncio.gather(
-                self.ask_device(self.DTY201, "Start_Pmp1", "Start_Pmp2"),
-                self.ask_device(self.DTY202, "Start_Pmp1", "Start_Pmp2"),
-                self.ask_device(self.DTY203, "Start_Pmp1", "Start_Pmp2")
-            )
+        image, device_wifi = self.io_image, self.get_device_wifi()
+        image.set(self.MV201, ("AutoInp", self.Mid_MV201_AutoInp))
+        image.set(self.DTY201, ("AutoInp", self.Mid_P_NACL_DUTY_AutoInp))
+        image.set(self.DTY202, ("AutoInp", self.Mid_P_HCL_DUTY_AutoInp))
+        image.set(self.DTY203, ("AutoInp", self.Mid_P_NAOCL_FAC_DUTY_AutoInp))
 
-        device_wifi = self.get_device_wifi()
-        await asyncio.gather(
-            self.tell_and_run(self.P201, ("AutoInp", is_p201_open)),
-            self.tell_and_run(self.P202, ("AutoInp", is_p202_open)),
-            self.tell_and_run(self.P203, ("AutoInp", is_p203_open)),
-            self.tell_and_run(self.P204, ("AutoInp", is_p204_open)),
-            self.tell_and_run(self.P205, ("AutoInp", is_p205_open)),
-            self.tell_and_run(self.P206, ("AutoInp", is_p206_open)),
-
-            self.tell_and_run(self.DTY201, ("AutoInp", self.Mid_P_NACL_DUTY_AutoInp)),
-            self.tell_and_run(self.DTY202, ("AutoInp", self.Mid_P_HCL_DUTY_AutoInp)),
-            self.tell_and_run(self.DTY203, ("AutoInp", self.Mid_P_NAOCL_FAC_DUTY_AutoInp)),
-
-            self.tell_and_run(self.FIT201, 
-                ("Totaliser_Enb", self.Mid_FIT201_Tot_Enb),
-                device_wifi
-            ),
-            
-            *(
-                self.tell_and_run(ait_dev, device_wifi)
-                for ait_dev in (self.AIT201, self.AIT202, self.AIT203)
-            )
-        )
+        image.set(self.FIT201, ("Totaliser_Enb", self.Mid_FIT201_Tot_Enb), device_wifi)
+        for ait_dev in (self.AIT201, self.AIT202, self.AIT203):
+            image.set(ait_dev, device_wifi)
 
     @classmethod
     def get_tags(cls: Type[BaseModbusDevice], *tags: Tag) -> Tuple[Tag, ...]:
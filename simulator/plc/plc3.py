@@ -1,17 +1,17 @@
 from typing import Dict, List, Tuple, Type, cast
-from modbus.compat.builtins import bitarray, asyncio
+from modbus.compat.builtins import bitarray
 from modbus.base import BaseModbusDevice
 from .base_plc import PLC
 from logicblock import *
 from controlblock import *
 from modbus.tag import Tag
 from modbus.types.remote import RemoteDeviceType
-from modbus.helpers import create_contiguous_states
+from modbus.helpers import create_contiguous_states, compile_states
 
 class PLC3(PLC):
     'plc3 logic'
 
-    STATE_DICT = create_contiguous_states(1, 20, {
+    STATE_DICT = compile_states(create_contiguous_states(1, 20, {
          1: (bitarray('1000000'), False), 
          2: (bitarray('1000000'), None),
          3: (bitarray('1000100'), True),
@@ -25,11 +25,11 @@ class PLC3(PLC):
         17: (bitarray('0101001'), False),
         19: (bitarray('0101000'), False),
         99: (bitarray('0000000'), False),
-    })
+    }))
     
     def init_plc(self, *args, **kwargs) -> None:
-        self.TON_FIT301_P1_TM: TONR = TONR(6, self.device_frequency)
-        self.TON_FIT301_P2_TM: TONR = TONR(6, self.device_frequency)
+        self.TON_FIT301_P1_TM: TONR = create_timer(6, self.device_frequency, self.timer_clock)
+        self.TON_FIT301_P2_TM: TONR = create_timer(6, self.device_frequency, self.timer_clock)
         self.SEC_TEST: int = 0
         self.MIN_TEST: int = 0
         self.Mid_MV301_AutoInp: bool = False
@@ -40,6 +40,21 @@ class PLC3(PLC):
         self.Mid_P602_AutoInp: bool = False
         self.Mid_P_NAOCL_UF_DUTY_AutoInp: bool = False
 
+        image = self.io_image
+        image.declare(self.LIT301, outputs=("WRIO_Enb",))
+        image.declare(self.DTY301, inputs=("Start_Pmp1", "Start_Pmp2"), outputs=("AutoInp",))
+        image.declare(self.P301, outputs=("AutoInp",))
+        image.declare(self.P302, outputs=("AutoInp",))
+        image.link(self.DTY301, "Start_Pmp1", self.P301, "AutoInp")
+        image.link(self.DTY301, "Start_Pmp2", self.P302, "AutoInp")
+        image.declare(self.FIT301, outputs=("Totaliser_Enb", "WRIO_Enb"))
+        # TODO verify PSH301 == SWH301 and DPSH301 == SWH302
+        image.declare(self.PSH301)
+        image.declare(self.DPSH301)
+        image.declare(self.DPIT301, outputs=("WRIO_Enb",))
+        for mv_dev in (self.MV301, self.MV302, self.MV303, self.MV304):
+            image.declare(mv_dev, outputs=("AutoInp",))
+
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.LIT301, self.DTY301, self.P301, self.P302, self.FIT301, self.PSH301 = (
             RemoteDeviceType(dev) for dev in ("LIT301", "DTY301", "P301", "P302", "FIT301", "PSH301")
@@ -60,7 +75,7 @@ class PLC3(PLC):
         })
         return super().get_device_classes(**kwargs)
 
-    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
+    def run_logic(self, sec_pulse, min_pulse, hrs_pulse, time_interval) -> None:
         self.Mid_FIT301_Tot_Enb	= self.P301_Status==2 or self.P302_Status==2
         self.TON_FIT301_P1_TM.tick(self.FIT301_ALL and self.P301_Status == 2)
         self.TON_FIT301_P2_TM.tick(self.FIT301_ALL and self.P302_Status == 2)
@@ -74,43 +89,24 @@ class PLC3(PLC):
             self.Mid_MV301_AutoInp, self.Mid_MV302_AutoInp, \
                 self.Mid_MV303_AutoInp, self.Mid_P_UF_FEED_DUTY_AutoInp, \
                     self.Mid_P602_AutoInp, self.Mid_P_NAOCL_UF_DUTY_AutoInp = \
-                        tuple(bool(flag) for flag in current_mid_state[1:7])
+                        current_mid_state[1:7]
             
             if auto_inp_flag is not None:
-                self.Mid_MV304_AutoInp = bool(auto_inp_flag)
+                self.Mid_MV304_AutoInp = auto_inp_flag
             if current_mid_state[0]:
                 self.Mid_Last_State = self.State
             if self.State == 2:
                 self.Mid_MV304_AutoInp = not any((self.LIT301_ALL, self.LIT401_AH))
 
-        device_wifi = self.get_device_wifi()
-        await asyncio.gather(
-            self.tell_and_run(self.LIT301, device_wifi),
-            self.tell_and_run(self.DTY301, ("AutoInp", self.Mid_P_UF_FEED_DUTY_AutoInp))
-        )
-
-        is_p301_open, is_p302_open = await asyncio.gather(
-            self.ask_device(self.DTY301, "Start_Pmp1"), self.ask_device(self.DTY301, "Start_Pmp2")
-        )
-        
-        await asyncio.gather(
-            self.tell_and_run(self.P301, ("AutoInp", is_p301_open)),
-            self.tell_and_run(self.P302, ("AutoInp", is_p302_open)),
-
-            self.tell_and_run(self.FIT301, 
-                ("Totaliser_Enb", self.Mid_FIT301_Tot_Enb),
-                device_wifi
-            ),
-        
-            # TODO verify PSH301 == SWH301 and DPSH301 == SWH302
-            self.run_device(self.PSH301),
-            self.run_device(self.DPSH301),
-            self.tell_and_run(self.DPIT301, device_wifi),
-            self.tell_and_run(self.MV301, ("AutoInp", self.Mid_MV301_AutoInp)),
-            self.tell_and_run(self.MV302, ("AutoInp", self.Mid_MV302_AutoInp)),
-            self.tell_and_run(self.MV303, ("AutoInp", self.Mid_MV303_AutoInp)),
-            self.tell_and_run(self.MV304, ("AutoInp", self.Mid_MV304_AutoInp))
-        )
+        image, device_wifi = self.io_image, self.get_device_wifi()
+        image.set(self.LIT301, device_wifi)
+        image.set(self.DTY301, ("AutoInp", self.Mid_P_UF_FEED_DUTY_AutoInp))
+        image.set(self.FIT301, ("Totaliser_Enb", self.Mid_FIT301_Tot_Enb), device_wifi)
+        image.set(self.DPIT301, device_wifi)
+        image.set(self.MV301, ("AutoInp", self.Mid_MV301_AutoInp))
+        image.set(self.MV302, ("AutoInp", self.Mid_MV302_AutoInp))
+        image.set(self.MV303, ("AutoInp", self.Mid_MV303_AutoInp))
+        image.set(self.MV304, ("AutoInp", self.Mid_MV304_AutoInp))
 
     @classmethod
     def get_tags(cls: Type[BaseModbusDevice], *tags: Tag) -> Tuple[Tag, ...]:
@@ -1,10 +1,9 @@
 from typing import Dict, List, Tuple, Type, cast
-from logicblock import TONR
+from logicblock import TONR, create_timer
 from controlblock import *
 from modbus.tag import Tag
 from modbus.types.remote import RemoteDeviceType
 from modbus.base import BaseModbusDevice
-from modbus.compat.builtins import asyncio
 from .base_plc import PLC
 class PLC4(PLC):
     'plc4 logic'
@@ -12,12 +11,26 @@ class PLC4(PLC):
     def init_plc(self, *args, **kwargs) -> None:
         self.Mid_UV401_AutoInp: bool = False
         self.Mid_FIT401_Tot_Enb: bool = False
-        self.TON_FIT401_TM: TONR = TONR(6, self.device_frequency)
-        self.TON_FIT401_P1_TM: TONR = TONR(6, self.device_frequency)
-        self.TON_FIT401_P2_TM: TONR = TONR(6, self.device_frequency)
+        self.TON_FIT401_TM: TONR = create_timer(6, self.device_frequency, self.timer_clock)
+        self.TON_FIT401_P1_TM: TONR = create_timer(6, self.device_frequency, self.timer_clock)
+        self.TON_FIT401_P2_TM: TONR = create_timer(6, self.device_frequency, self.timer_clock)
         self.Mid_P_RO_FEED_DUTY_AutoInp: bool = False
         self.Mid_P_NAHSO3_ORP_DUTY_AutoInp: bool = False
 
+        image = self.io_image
+        for ain_dev in (self.LIT401, self.AIT401, self.AIT402):
+            image.declare(ain_dev, outputs=("WRIO_Enb",))
+        for duty in (self.DTY401, self.DTY402):
+            image.declare(duty, inputs=("Start_Pmp1", "Start_Pmp2"), outputs=("AutoInp",))
+        for pump in (self.P401, self.P402, self.P403, self.P404):
+            image.declare(pump, outputs=("AutoInp",))
+        image.declare(self.FIT401, outputs=("Totaliser_Enb", "WRIO_Enb"))
+        image.declare(self.UV401, outputs=("AutoInp",))
+        image.declare(self.LS401)
+        for duty, pumps in ((self.DTY401, (self.P401, self.P402)), (self.DTY402, (self.P403, self.P404))):
+            image.link(duty, "Start_Pmp1", pumps[0], "AutoInp")
+            image.link(duty, "Start_Pmp2", pumps[1], "AutoInp")
+
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.LIT401, self.DTY401, self.DTY402, self.P401, self.P402, self.P403 = (
             RemoteDeviceType(dev) for dev in ("LIT401", "DTY401", "DTY402", "P401", "P402", "P403")
@@ -38,7 +51,7 @@ class PLC4(PLC):
         })
         return super().get_device_classes(**kwargs)
         
-    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
+    def run_logic(self, sec_pulse, min_pulse, hrs_pulse, time_interval) -> None:
         self.Mid_FIT401_Tot_Enb	= self.P401_Status == 2 or self.P402_Status == 2
         self.TON_FIT401_TM.tick(self.FIT401_ALL and self.Mid_FIT401_Tot_Enb)
         self.TON_FIT401_P1_TM.tick(self.FIT401_ALL and self.P401_Status == 2)
@@ -91,37 +104,14 @@ class PLC4(PLC):
                 self.Mid_P_RO_FEED_DUTY_AutoInp = \
                     self.Mid_P_NAHSO3_ORP_DUTY_AutoInp = False
 
-        device_wifi = self.get_device_wifi()
-        await asyncio.gather(
-            self.tell_and_run(self.LIT401, device_wifi),
-            self.tell_and_run(self.DTY401, ("AutoInp", self.Mid_P_RO_FEED_DUTY_AutoInp))
-        )
-
-        is_p401_open, is_p402_open, is_p403_open, is_p404_open = await asyncio.gather(
-            self.ask_device(self.DTY401, "Start_Pmp1"), self.ask_device(self.DTY401, "Start_Pmp2"),
-            self.ask_device(self.DTY402, "Start_Pmp1"), self.ask_device(self.DTY402, "Start_Pmp2")
-        )
-
-        await asyncio.gather(
-            self.tell_and_run(self.P401, ("AutoInp", is_p401_open)),
-            self.tell_and_run(self.P402, ("AutoInp", is_p402_open)),
-
-            self.tell_and_run(self.AIT401, device_wifi),
-
-            self.tell_and_run(self.FIT401, 
-                ("Totaliser_Enb", self.Mid_FIT401_Tot_Enb),
-                device_wifi
-            ),
-            self.tell_and_run(self.AIT402, device_wifi),
-            self.tell_and_run(self.UV401, ("AutoInp", self.Mid_UV401_AutoInp)),
-
-            self.run_device(self.LS401),
-
-            self.tell_and_run(self.DTY402, ("AutoInp", self.Mid_P_NAHSO3_ORP_DUTY_AutoInp)),
-            self.tell_and_run(self.P403, ("AutoInp", is_p403_open)),
-            self.tell_and_run(self.P404, ("AutoInp", is_p404_open))
-        )
-
+        image, device_wifi = self.io_image, self.get_device_wifi()
+        image.set(self.LIT401, device_wifi)
+        image.set(self.DTY401, ("AutoInp", self.Mid_P_RO_FEED_DUTY_AutoInp))
+        image.set(self.AIT401, device_wifi)
+        image.set(self.FIT401, ("Totaliser_Enb", self.Mid_FIT401_Tot_Enb), device_wifi)
+        image.set(self.AIT402, device_wifi)
+        image.set(self.UV401, ("AutoInp", self.Mid_UV401_AutoInp))
+        image.set(self.DTY402, ("AutoInp", self.Mid_P_NAHSO3_ORP_DUTY_AutoInp))
 
     @classmethod
     def get_tags(cls: Type[BaseModbusDevice], *tags: Tag) -> Tuple[Tag, ...]:
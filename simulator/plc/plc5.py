@@ -1,26 +1,26 @@
 from typing import Dict, Tuple, Type, cast
 
-from modbus.compat.builtins import bitarray, asyncio
+from modbus.compat.builtins import bitarray
 from logicblock import * 
 from controlblock import *
 from modbus.tag import Tag
 from modbus.types.remote import RemoteDeviceType
 from modbus.base import BaseModbusDevice
 from .base_plc import PLC
-from modbus.helpers import create_contiguous_states
+from modbus.helpers import create_contiguous_states, compile_states
 
 class PLC5(PLC):
     'plc5 logic'
     
-    STATE_LIST = create_contiguous_states(1, 21, {
+    STATE_LIST = compile_states(create_contiguous_states(1, 21, {
          1: bitarray("00000"),  3: bitarray("00011"),  5: bitarray("10011"), 
          8: bitarray("11011"),  9: bitarray("11101"), 10: bitarray("11100"),
         13: bitarray("01100"), 14: bitarray("01101"), 15: bitarray("01001"),
         16: bitarray("01011"), 17: bitarray("00011"), 20: bitarray("00000")
-    })
+    }))
 
     def init_plc(self, *args, **kwargs) -> None:
-        self.TON_FIT401_TM=TONR(3, self.device_frequency)
+        self.TON_FIT401_TM=create_timer(3, self.device_frequency, self.timer_clock)
         self.SEC_TEST: int = 0
         self.TEST_MIN: int = 0
         self.Mid_FIT501_Tot_Enb: bool = True
@@ -33,6 +33,19 @@ class PLC5(PLC):
         self.Mid_MV504_AutoInp: bool = True
         self.Mid_P_RO_HIGH_AutoInp: bool = True
 
+        image = self.io_image
+        for ain_dev in (self.AIT501, self.AIT502, self.AIT503, self.AIT504, self.PIT501, self.PIT502, self.PIT503):
+            image.declare(ain_dev, outputs=("WRIO_Enb",))
+        for fit_dev in (self.FIT501, self.FIT502, self.FIT503, self.FIT504):
+            image.declare(fit_dev, outputs=("Totaliser_Enb", "WRIO_Enb"))
+        for mv_dev in (self.MV501, self.MV502, self.MV503, self.MV504):
+            image.declare(mv_dev, outputs=("AutoInp",))
+        image.declare(self.DTY501, inputs=("Start_Pmp1", "Start_Pmp2"), outputs=("AutoInp",))
+        for pump in (self.P501, self.P502):
+            image.declare(pump, outputs=("AutoSpeed", "AutoInp"))
+        image.link(self.DTY501, "Start_Pmp1", self.P501, "AutoInp")
+        image.link(self.DTY501, "Start_Pmp2", self.P502, "AutoInp")
+
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.AIT501, self.AIT502, self.AIT503,self.AIT504, self.PIT501 = (
             RemoteDeviceType(dev) for dev in ("AIT501", "AIT502", "AIT503","AIT504", "PIT501")
@@ -61,7 +74,7 @@ class PLC5(PLC):
         })
         return super().get_device_classes(**kwargs)
         
-    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
+    def run_logic(self, sec_pulse, min_pulse, hrs_pulse, time_interval) -> None:
         self.Mid_FIT501_Tot_Enb	= self.P501_Status==2 or self.P502_Status==2
         self.Mid_FIT502_Tot_Enb	= self.MV501_Status==2
         self.Mid_FIT503_Tot_Enb	= self.Mid_FIT504_Tot_Enb = \
@@ -75,59 +88,30 @@ class PLC5(PLC):
         if min_pulse:
             self.TEST_MIN +=1
 
-        if self.State in PLC5.STATE_LIST:
+        state_data = PLC5.STATE_LIST.get(self.State)
+        if state_data is not None:
             self.Mid_P_RO_HIGH_AutoInp, self.Mid_MV501_AutoInp, \
-                self.Mid_MV502_AutoInp, self.Mid_MV503_AutoInp, self.Mid_MV504_AutoInp = \
-                    (bool(flag) for flag in PLC5.STATE_LIST[self.State])
+                self.Mid_MV502_AutoInp, self.Mid_MV503_AutoInp, self.Mid_MV504_AutoInp = state_data
         else:
             self.State = 1
 
-        device_wifi = self.get_device_wifi()
-        await asyncio.gather(*(
-            self.tell_and_run(ait_dev, device_wifi)
-            for ait_dev in (
-                self.AIT501, self.AIT502, self.AIT503, self.AIT504,
-                self.PIT501, self.PIT502, self.PIT503
-            )
-        ))
+        image, device_wifi = self.io_image, self.get_device_wifi()
+        for ain_dev in (self.AIT501, self.AIT502, self.AIT503, self.AIT504, self.PIT501, self.PIT502, self.PIT503):
+            image.set(ain_dev, device_wifi)
 
-        await asyncio.gather(
-            self.tell_and_run(self.FIT501, 
-                ("Totaliser_Enb", self.Mid_FIT501_Tot_Enb),
-                device_wifi
-            ),
-            self.tell_and_run(self.FIT502, 
-                ("Totaliser_Enb", self.Mid_FIT502_Tot_Enb),
-                device_wifi
-            ),
-            self.tell_and_run(self.FIT503,
-                ("Totaliser_Enb", self.Mid_FIT503_Tot_Enb),
-                device_wifi
-            ),
-            self.tell_and_run(self.FIT504, 
-                ("Totaliser_Enb", self.Mid_FIT504_Tot_Enb),
-                device_wifi
-            ),
+        image.set(self.FIT501, ("Totaliser_Enb", self.Mid_FIT501_Tot_Enb), device_wifi)
+        image.set(self.FIT502, ("Totaliser_Enb", self.Mid_FIT502_Tot_Enb), device_wifi)
+        image.set(self.FIT503, ("Totaliser_Enb", self.Mid_FIT503_Tot_Enb), device_wifi)
+        image.set(self.FIT504, ("Totaliser_Enb", self.Mid_FIT504_Tot_Enb), device_wifi)
 
-            self.tell_and_run(self.MV501, ("AutoInp", self.Mid_MV501_AutoInp)),
-            self.tell_and_run(self.MV502, ("AutoInp", self.Mid_MV502_AutoInp)),
-            self.tell_and_run(self.MV503, ("AutoInp", self.Mid_MV503_AutoInp)),
-            self.tell_and_run(self.MV504, ("AutoInp", self.Mid_MV504_AutoInp))
-        )
+        image.set(self.MV501, ("AutoInp", self.Mid_MV501_AutoInp))
+        image.set(self.MV502, ("AutoInp", self.Mid_MV502_AutoInp))
+        image.set(self.MV503, ("AutoInp", self.Mid_MV503_AutoInp))
+        image.set(self.MV504, ("AutoInp", self.Mid_MV504_AutoInp))
 
-        is_p501_open, is_p502_open = await self.ask_device(self.DTY501, "Start_Pmp1", "Start_Pmp2")
-        
-        await asyncio.gather(
-            self.tell_and_run(self.P501,
-                ("AutoSpeed", self.Mid_P50X_AutoSpeed),
-                ("AutoInp", is_p501_open)
-            ),
-            self.tell_and_run(self.P502,
-                ("AutoSpeed", self.Mid_P50X_AutoSpeed),
-                ("AutoInp", is_p502_open)
-            ),
-            self.tell_and_run(self.DTY501, ("AutoInp", self.Mid_P_RO_HIGH_AutoInp))
-        )
+        image.set(self.P501, ("AutoSpeed", self.Mid_P50X_AutoSpeed))
+        image.set(self.P502, ("AutoSpeed", self.Mid_P50X_AutoSpeed))
+        image.set(self.DTY501, ("AutoInp", self.Mid_P_RO_HIGH_AutoInp))
 
     @classmethod
     def get_tags(cls: Type[BaseModbusDevice], *tags: Tag) -> Tuple[Tag, ...]:
@@ -2,7 +2,6 @@ from typing import Dict, List, Tuple, Type, cast
 from controlblock import *
 from modbus.tag import Tag
 from modbus.types.remote import RemoteDeviceType
-from modbus.compat.builtins import asyncio
 from modbus.base import BaseModbusDevice
 from .base_plc import PLC
 
@@ -15,6 +14,12 @@ class PLC6(PLC):
         self.Mid_P603_AutoInp: bool = False
         self.switches = self.LSL601, self.LSL602, self.LSL603, self.LSH601, self.LSH602, self.LSH603
 
+        image = self.io_image
+        for pump in (self.P601, self.P602, self.P603):
+            image.declare(pump, outputs=("AutoInp",))
+        for switch in self.switches:
+            image.declare(switch)
+
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
         self.LSL601, self.LSL602, self.LSL603, self.LSH601, self.LSH602, self.LSH603 = (
             RemoteDeviceType(dev) for dev in ("LSL601", "LSL602", "LSL603", "LSH601", "LSH602", "LSH603")
@@ -35,14 +40,12 @@ class PLC6(PLC):
         })
         return super().get_device_classes(**kwargs)
 
-    async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
+    def run_logic(self, sec_pulse, min_pulse, hrs_pulse, time_interval) -> None:
         self.Mid_FIT601_Tot_Enb	= (self.P602_Status == 2)
-        await asyncio.gather(
-            self.tell_and_run(self.P601, ("AutoInp", self.Mid_P601_AutoInp)),
-            self.tell_and_run(self.P602, ("AutoInp", self.Mid_P602_AutoInp)),
-            self.tell_and_run(self.P603, ("AutoInp", self.Mid_P603_AutoInp)),
-            *(self.run_device(switch) for switch in self.switches)
-        )
+        image = self.io_image
+        image.set(self.P601, ("AutoInp", self.Mid_P601_AutoInp))
+        image.set(self.P602, ("AutoInp", self.Mid_P602_AutoInp))
+        image.set(self.P603, ("AutoInp", self.Mid_P603_AutoInp))
 
     @classmethod
     def get_tags(cls: Type[BaseModbusDevice], *tags: Tag) -> Tuple[Tag, ...]:
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Replays the recorded traffic of a single device (see `modbus.recording`),
+without Mininet, sockets or any of the devices it talks to: the device is
+created again from the arguments it was recorded with, restored to where
+the recording started, and run through every recorded cycle as fast as it
+can, with its calls answered from the recording.
+
+Prints how long the device took per cycle, and how many of its calls and
+cycles diverged from those recorded. Record with `--record DIR`, either on
+the device runners or on the headless simulation, then run from the
+repository root:
+
+    python3 -m simulator.replay DIR/MV101:MV_FBD.rec --repeat 10
+"""
+
+from argparse import ArgumentParser
+from typing import Any, Dict, List
+from modbus.base import BaseModbusDevice
+from modbus.recording import Replayer, read_recording
+from modbus.compat.builtins import asyncio
+import sys
+
+def create_replay_device(recording: Dict[str, Any]) -> BaseModbusDevice:
+    """Creates the recorded device again from the device runner arguments it was recorded with."""
+
+    from device_runner import create_parser, create_generic_device, create_plc_devices
+    args = create_parser().parse_args(recording["argv"])
+    if args.command == "plant":
+        raise ValueError("The plant and its poller cannot be replayed")
+    if args.command == "plc":
+        # a PLC runs the FBDs it was given with --fbd, though its calls to them are answered from the recording
+        return create_plc_devices(args)[0]
+    return create_generic_device(args)
+
+async def replay(recording: Dict[str, Any], repeat: int = 1) -> List[float]:
+    """
+    Replays `recording` `repeat` times, and returns how long the device
+    took to run each of its events, over all repeats, in seconds.
+    """
+
+    replayer = Replayer(create_replay_device(recording), recording)
+    durations: List[float] = []
+    for _ in range(repeat):
+        durations.extend(await replayer.run())
+    print("{0}: {1} divergent calls, {2} divergent events (last repeat)".format(
+        recording["key"], replayer.divergent_calls, replayer.divergent_events
+    ), file=sys.stderr)
+    return durations
+
+if __name__ == "__main__":
+    def run_main():
+        parser = ArgumentParser(description="Replays the recorded traffic of a single device, as fast as it can run.")
+        parser.add_argument("recording", type=str, help="The recording file, as written by a device given --record.")
+        parser.add_argument("--repeat", "-r", default=1, type=int, help="Number of times to replay the recording. Default 1")
+        args = parser.parse_args()
+
+        recording = read_recording(args.recording)
+        events = recording["events"]
+        if not len(events):
+            print("{0} has no events".format(args.recording), file=sys.stderr)
+            return
+        durations = sorted(asyncio.run(replay(recording, args.repeat)))
+        recorded_time = events[-1][0] - events[0][0]
+        print("replayed {0} events ({1:.1f} s recorded) {2} times in {3:.3f} s: mean {4:.1f} us, p50 {5:.1f} us, p99 {6:.1f} us per event".format(
+            len(events), recorded_time, args.repeat, sum(durations), sum(durations) / len(durations) * 1e6,
+            durations[len(durations) // 2] * 1e6, durations[int(len(durations) * 0.99)] * 1e6
+        ))
+
+    run_main()
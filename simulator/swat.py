@@ -1,14 +1,15 @@
 # We write plant odes here. The plant would "read" the IO from PLC and decide
 # the set of ode functions it follows in the specific current 5 ms period.
-from bitarray import bitarray
 from modbus.tag import Tag
 from modbus.base import BaseModbusDevice
 from modbus.compat.builtins import asyncio
 from modbus.compat.modbus import ModbusServerContext
 from modbus.types.remote import RemoteDeviceType
 from modbus.types import RegisterValue
+from modbus.shared import SeqlockArray
+from modbus.utils import ChangeFilter
 from io_plc import IO_AIN_FIT, IO_SWITCH, IO_MV, IO_PMP_UV, VSD
-from typing import Coroutine, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from typing import Coroutine, Dict, List, Optional, Tuple, Type, TypeVar, Union, cast
 import scipy.integrate
 import numpy as np
 
@@ -48,11 +49,31 @@ class Plant(BaseModbusDevice):
     TAG_NAMES = ("time_UF", "h_c", "h_t101", "h_t301", "h_t401", "h_t601", "h_t602")
     """List of tags for use by client thread"""
 
+    CHECKPOINT_EXCLUDED = ("shared_io",)
+
+    INTEGRATORS = ("analytic", "solve_ivp")
+    """
+    Ways of advancing the plant state every tick. The rates returned by
+    `ODE` only depend on the actuator inputs, so the levels change linearly
+    between input changes; "analytic" advances them by `rate * dt`, only
+    recomputing the rates when an input changes, while "solve_ivp" solves
+    the ODE every tick and is kept as a reference.
+    """
+
     def __init__(self, start_state, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.result = np.array([0.0, 0, 550, 550, 550, 200, 200] if start_state is None else start_state)
-        self._last_state: Optional[bitarray] = None
         self.cumulative_time: float = 0
+        self.log_changes: bool = kwargs.get("log_changes", True)
+        self.integrator: str = kwargs.get("integrator", "analytic")
+        # lower and upper bound of the tank levels, or None to leave them unbounded
+        self.level_bounds: Optional[Tuple[float, float]] = kwargs.get("level_bounds")
+        self._last_inputs: Optional[Tuple[RegisterValue, ...]] = None
+        self._rates = np.zeros(len(Plant.TAG_NAMES))
+        # set when the poller runs in another process; see `PlantIO`
+        self.shared_io: Optional[PlantIO] = kwargs.get("shared_io")
+        if self.shared_io is not None:
+            self.shared_io.state.write(self.result)
         #print("Remote tag names:", Comms.REMOTE_TAG_NAMES) # for debugging
         # self.result[2:5] += np.random.random(3)
         
@@ -67,18 +88,35 @@ class Plant(BaseModbusDevice):
     async def _main_loop(self, sec_pulse, min_pulse, hrs_pulse, time_interval, **kwargs) -> None:
         """ k is the total steps counted every 5 ms   --PF """
         
-        remote_tags = self.get_tag_values(Comms.REMOTE_TAG_NAMES)
-        self.result = scipy.integrate.solve_ivp(
-            fun=Plant.ODE, y0=self.result, t_span=(0, time_interval),
-            args=remote_tags, t_eval=(time_interval,), method=ODE_METHOD
-        ).y.flatten()
+        if self.shared_io is not None:
+            self.set_tag_values(*zip(Comms.REMOTE_TAG_NAMES, (bool(value) for value in self.shared_io.inputs.read())))
+        remote_tags = cast(Tuple[RegisterValue, ...], self.get_tag_values(Comms.REMOTE_TAG_NAMES))
+        if time_interval <= 0:
+            # nothing to integrate (e.g. first tick on a virtual clock)
+            return
+        inputs_changed = remote_tags != self._last_inputs
+        if inputs_changed:
+            self._last_inputs = remote_tags
+            self._rates = np.array(Plant.ODE(0.0, self.result, *remote_tags))
+
+        if self.integrator == "solve_ivp":
+            self.result = scipy.integrate.solve_ivp(
+                fun=Plant.ODE, y0=self.result, t_span=(0, time_interval),
+                args=remote_tags, t_eval=(time_interval,), method=ODE_METHOD
+            ).y.flatten()
+        else:
+            self.result = self.result + self._rates * time_interval
+        if self.level_bounds is not None:
+            # levels move in a straight line within a tick, so clamping where it ends is exact
+            np.clip(self.result[2:], *self.level_bounds, out=self.result[2:])
+
         self.cumulative_time += time_interval
         self.set_tag_values(*zip(Plant.TAG_NAMES, self.result))
-        str_arr = ''.join((f'{int(i)}' for i in remote_tags))
-        new_state = bitarray(str_arr)
-        if self._last_state != new_state:
+        if self.shared_io is not None:
+            self.shared_io.state.write(self.result)
+        if inputs_changed and self.log_changes:
             # print out result, time interval and bool values on change
-            self._last_state = new_state
+            str_arr = ''.join((f'{int(i)}' for i in remote_tags))
             print(self.result, f"{self.cumulative_time:.5f}", f"[{str_arr}]")
         
     @staticmethod
@@ -191,13 +229,92 @@ class Comms:
         tuple("{0}_DI_ZSO".format(dev) for dev in MOTORS) + tuple("{0}_DI_ZSC".format(dev) for dev in MOTORS)
     """List of digital (int) tags used by the ODE function"""
 
+class PlantIO:
+    """
+    The actuator inputs and the plant state, shared between a `Plant` and a
+    `LivePoller` running in separate processes, so that neither one's cycle
+    delays the other's. The poller writes the inputs and the plant writes
+    its state, each at its own rate; see `modbus.shared.SeqlockArray`.
+
+    Created without `names` by the owning process, and with the names
+    from its `get_names()` in the other.
+    """
+
+    def __init__(self, names: Optional[Tuple[str, str]] = None):
+        create = names is None
+        input_name, state_name = (None, None) if names is None else names
+        self.inputs = SeqlockArray(len(Comms.REMOTE_TAG_NAMES), input_name, create)
+        self.state = SeqlockArray(len(Plant.TAG_NAMES), state_name, create)
+
+    def get_names(self) -> Tuple[str, str]:
+        return self.inputs.name, self.state.name
+
+    def close(self) -> None:
+        self.inputs.close()
+        self.state.close()
+
+    def unlink(self) -> None:
+        self.inputs.unlink()
+        self.state.unlink()
+
 class LivePoller(BaseModbusDevice):
+    DEADBANDS: Dict[str, Tuple[float, float]] = {"AI_Value": (1.0, 0.0), "W_AI_Value": (2.0, 0.0)}
+    """
+    Default `(absolute, relative)` deadband of each sensor tag, used when
+    change filtering is on. One raw count of `AI_Value` is about 0.09 mm
+    of level (and about 0.04 mm for `W_AI_Value`). See `ChangeFilter`.
+    """
+
+    CHECKPOINT_EXCLUDED = ("shared_ds", "shared_io")
+
     def __init__(self, shared_data_store, *args, **kwargs):
+        """
+        Initializes the poller. See `BaseModbusDevice` for the other arguments.
+
+        Arguments
+        ---------
+        deadband    -   A list of `(tag, absolute, relative)` deadbands for the sensor
+                        tags, where `tag` is a tag name (e.g. "AI_Value") or a tag of
+                        one device (e.g. "IOLIT101.AI_Value"). Giving a deadband or a
+                        `max_silence` turns change filtering on: sensor values are
+                        only written when they moved by more than their deadband
+                        (`DEADBANDS` by default), and actuator values read from the
+                        IO devices are only stored when they change.
+
+        max_silence -   The time (in s) after which an unchanged sensor value is
+                        written again when change filtering is on. 0 (default)
+                        never writes it again.
+
+        sensor_model -  Whether to also write the readings of the flow, analyzer and
+                        pressure transmitters, from a `SensorModel`. Default False.
+
+        sensor_noise -  The factor by which to scale the noise of the `SensorModel`.
+                        Default 1.
+
+        sensor_seed -   The seed of the `SensorModel`'s noise. Default None.
+        """
+
         self.shared_ds = shared_data_store
         self.result = np.array([0.0, 0, 550, 550, 550, 200, 200])
+        # set when the plant runs in another process, in which case the data store is not shared
+        self.shared_io: Optional[PlantIO] = kwargs.get("shared_io")
+        deadbands = kwargs.get("deadband") or ()
+        max_silence: float = kwargs.get("max_silence") or 0.0
+        self.change_filter: Optional[ChangeFilter] = None
+        if len(deadbands) or max_silence > 0:
+            self.change_filter = ChangeFilter(dict(LivePoller.DEADBANDS, **{
+                tag: (float(absolute), float(relative)) for tag, absolute, relative in deadbands
+            }), max_silence, default_key=lambda key: key.split('.')[-1])
+        self._actuator_values: Dict[str, RegisterValue] = {}
+        self.sensor_model: Optional[SensorModel] = None
+        if kwargs.get("sensor_model"):
+            noise = kwargs.get("sensor_noise")
+            self.sensor_model = SensorModel(1.0 if noise is None else noise, kwargs.get("sensor_seed"))
         super().__init__(*args, **kwargs)
         
     def create_context(self) -> ModbusServerContext:
+        if self.shared_ds is None:
+            return super().create_context()
         return self.shared_ds
         
     def get_device_classes(self, **kwargs: Type) -> Dict[RemoteDeviceType, Type]:
@@ -207,6 +324,7 @@ class LivePoller(BaseModbusDevice):
             **{device_name: IO_PMP_UV   for device_name in Comms.PUMPS       },
             **{device_name: IO_MV       for device_name in Comms.MOTORS      },
             **{device_name: VSD         for device_name in Comms.VSDS        },
+            **{device_name: IO_AIN_FIT  for device_name in (SensorModel.SENSORS if self.sensor_model is not None else ())},
         )
 
     @classmethod
@@ -238,20 +356,302 @@ class LivePoller(BaseModbusDevice):
             motor_values.extend(tags)
 
         # set tag values here for plant ODE to use
-        self.set_tag_values(*pump_values, *motor_values)
+        actuator_values = tuple(pump_values) + tuple(motor_values)
+        if self.change_filter is not None:
+            last_values = self._actuator_values
+            actuator_values = tuple((name, value) for name, value in actuator_values if last_values.get(name) != value)
+            last_values.update(actuator_values)
+        self.set_tag_values(*actuator_values)
+        if self.shared_io is not None:
+            self.shared_io.inputs.write(self.get_tag_values(*Comms.REMOTE_TAG_NAMES))
+            # the plant process may not have written its state yet
+            if self.shared_io.state.get_version():
+                self.set_tag_values(*zip(Plant.TAG_NAMES, self.shared_io.state.read()))
         new_state = np.array(self.get_tag_values(*Plant.TAG_NAMES))
 
         tasks: List[Coroutine] = []
         for dev, value, w_value in zip(
             Comms.TRANSMITTERS, Plant.usl(new_state[2:5]), Plant.usl_w(new_state[2:5])
         ):
-            tasks.append(self.tell_device(dev, ("AI_Value", value), ("W_AI_Value", w_value)))
+            tag_values = self.filter_changes(dev, ("AI_Value", float(value)), ("W_AI_Value", float(w_value)))
+            if len(tag_values):
+                tasks.append(self.tell_device(dev, *tag_values))
 
         params = Plant.PARAMS
         for dev, value in zip(Comms.SWITCHES, (
             new_state[5] < params["LIT601_AL"], new_state[5] > params["LIT601_AH"], 
             new_state[6] < params["LIT601_AL"], new_state[6] > params["LIT601_AH"]
         )):
-            tasks.append(self.tell_device(dev, ("DI_LS", value)))
+            tag_values = self.filter_changes(dev, ("DI_LS", bool(value)))
+            if len(tag_values):
+                tasks.append(self.tell_device(dev, *tag_values))
+
+        if self.sensor_model is not None:
+            inputs = self.get_tag_values(*Comms.REMOTE_TAG_NAMES)
+            values, w_values = SensorModel.to_raw(self.sensor_model.step(inputs, new_state, time_interval))
+            for dev, value, w_value in zip(SensorModel.SENSORS, values[0].tolist(), w_values[0].tolist()):
+                tag_values = self.filter_changes(dev, ("AI_Value", value), ("W_AI_Value", w_value))
+                if len(tag_values):
+                    tasks.append(self.tell_device(dev, *tag_values))
 
         await asyncio.gather(*tasks)
+
+    def filter_changes(self, dev: RemoteDeviceType, *tag_values: Tuple[str, RegisterValue]) -> Tuple[Tuple[str, RegisterValue], ...]:
+        """Returns the tag values of `dev` worth writing. See `change_filter`."""
+
+        change_filter = self.change_filter
+        if change_filter is None:
+            return tag_values
+        now = self.counter.get_elapsed()
+        return tuple(
+            (tag, value) for tag, value in tag_values
+            if change_filter.changed("{0}.{1}".format(dev, tag), value, now)
+        )
+
+class EnsemblePlant:
+    """
+    N independent instances of the plant, e.g. with different initial levels,
+    noise or attacks, stepped together as NumPy arrays. Not a Modbus device:
+    `inputs` holds the actuator inputs of every instance as an (N, inputs)
+    boolean array in the order of `Comms.REMOTE_TAG_NAMES`, which the caller
+    sets before each `step()`, and `state` holds the state of every instance
+    as an (N, states) array in the order of `Plant.TAG_NAMES`.
+
+    Each instance follows `Plant.ODE` exactly, as `Plant` does with its
+    "analytic" integrator. `noise` is the standard deviation (in mm) of the
+    noise on each instance's level sensors; see `get_sensor_values()`.
+    """
+
+    INPUTS: Dict[str, int] = {name: i for i, name in enumerate(Comms.REMOTE_TAG_NAMES)}
+    """Column of each actuator input in `inputs`"""
+
+    def __init__(self, initial_states, noise: Union[float, np.ndarray] = 0.0,
+        level_bounds: Optional[Tuple[float, float]] = None, seed: Optional[int] = None
+    ):
+        self.state: np.ndarray = np.array(initial_states, dtype=float, ndmin=2)
+        self.inputs: np.ndarray = np.zeros((len(self.state), len(Comms.REMOTE_TAG_NAMES)), dtype=bool)
+        self.noise: np.ndarray = np.broadcast_to(np.asarray(noise, dtype=float), (len(self.state),))
+        self.level_bounds = level_bounds
+        self.rng = np.random.default_rng(seed)
+        self.time: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.state)
+
+    def set_inputs(self, instances: Union[int, slice, np.ndarray], **inputs: Union[bool, np.ndarray]) -> None:
+        """Sets actuator inputs by name, e.g. `set_inputs(0, IOP101_DI_Run=True)`."""
+
+        for name, value in inputs.items():
+            self.inputs[instances, EnsemblePlant.INPUTS[name]] = value
+
+    @staticmethod
+    def get_rates(inputs: np.ndarray) -> np.ndarray:
+        """
+        Returns the rate of change of the state of each instance, as `Plant.ODE`
+        does for one set of inputs.
+        """
+
+        col = EnsemblePlant.INPUTS
+        def run(*names: str) -> np.ndarray:
+            return np.logical_or.reduce([inputs[:, col[name]] for name in names])
+        def on(name: str) -> np.ndarray:
+            return inputs[:, col[name]]
+
+        params_pc = Plant.PARAMS_PC
+        rates = np.zeros((len(inputs), len(Plant.TAG_NAMES)))
+        rates[:, 2] += params_pc['p1_mv'] * on('IOMV101_DI_ZSO')
+        rates[:, 2] -= params_pc['p1_p'] * run('IOP101_DI_Run', 'IOP102_DI_Run')
+        rates[:, 3] += params_pc['p2'] * (on('IOMV201_DI_ZSO') & on('IOP101_DI_Run'))
+
+        p3_running = run('IOP301_DI_Run', 'IOP302_DI_Run')
+        p602_off = ~on('IOP602_DI_Run')
+        rates[:, 3] -= params_pc['p3_run'] * p3_running
+        # UF flushing and UF feed tank draining both count time_UF
+        rates[:, 0] = on('IOMV301_DI_ZSC') & on('IOMV302_DI_ZSC') & on('IOMV303_DI_ZSC') & p602_off & on('IOMV304_DI_ZSO')
+        rates[:, 4] += params_pc['p3_uf'] * (p3_running & on('IOMV301_DI_ZSC') & on('IOMV302_DI_ZSO')
+            & on('IOMV303_DI_ZSC') & on('IOMV304_DI_ZSC') & p602_off)
+        rates[:, 6] -= params_pc['p3_ufbw'] * (~p3_running & on('IOMV301_DI_ZSO') & on('IOMV302_DI_ZSC')
+            & on('IOMV303_DI_ZSO') & on('IOMV304_DI_ZSC') & ~p602_off)
+
+        p4_running = run('IOP401_DI_Run', 'IOP402_DI_Run')
+        rates[:, 4] -= params_pc['p4_draw'] * p4_running
+        ro_running = p4_running & run('IOP501_DI_Run', 'IOP502_DI_Run')
+        ro_normal = ro_running & on('IOMV501_DI_ZSO') & on('IOMV502_DI_ZSO') & on('IOMV503_DI_ZSC') & on('IOMV504_DI_ZSC')
+        ro_flush = ro_running & ~ro_normal & on('IOMV501_DI_ZSC') & on('IOMV502_DI_ZSC') & on('IOMV503_DI_ZSO') & on('IOMV504_DI_ZSO')
+        rates[:, 5] += params_pc['p4_n601'] * ro_normal
+        rates[:, 6] += params_pc['p4_n602'] * ro_normal
+        rates[:, 6] += params_pc['p4_flush'] * ro_flush
+
+        rates[:, 5] -= params_pc['p6_run'] * on('IOP601_DI_Run')
+        return rates
+
+    def step(self, time_interval: float) -> np.ndarray:
+        """Advances every instance by `time_interval` seconds and returns the state."""
+
+        self.state += EnsemblePlant.get_rates(self.inputs) * time_interval
+        if self.level_bounds is not None:
+            np.clip(self.state[:, 2:], *self.level_bounds, out=self.state[:, 2:])
+        self.time += time_interval
+        return self.state
+
+    def get_sensor_values(self, instances: Union[int, slice, np.ndarray] = slice(None)) -> Dict[str, np.ndarray]:
+        """
+        Returns the values that `LivePoller` would send to each sensor, for the
+        given instances, as `{"<device>_<tag>": values}`. Noise is drawn anew
+        on every call.
+        """
+
+        levels = self.state[instances, 2:]
+        noise = self.noise[instances]
+        if np.any(noise):
+            levels = levels + self.rng.standard_normal(levels.shape) * np.expand_dims(noise, -1)
+
+        values: Dict[str, np.ndarray] = {}
+        for i, dev in enumerate(Comms.TRANSMITTERS):
+            values["{0}_AI_Value".format(dev)] = Plant.usl(levels[..., i])
+            values["{0}_W_AI_Value".format(dev)] = Plant.usl_w(levels[..., i])
+        params = Plant.PARAMS
+        for dev, value in zip(Comms.SWITCHES, (
+            levels[..., 3] < params["LIT601_AL"], levels[..., 3] > params["LIT601_AH"],
+            levels[..., 4] < params["LIT601_AL"], levels[..., 4] > params["LIT601_AH"]
+        )):
+            values["{0}_DI_LS".format(dev)] = value
+        return values
+
+def _get_gains(specs: Dict[str, Tuple], features: Tuple[str, ...]) -> np.ndarray:
+    return np.array([[spec[5].get(feature, 0.0) for feature in features] for spec in specs.values()])
+
+class SensorModel:
+    """
+    Readings of the plant's other analog instruments - flow (FIT), analyzer
+    (AIT), pressure (PIT) and differential pressure (DPIT) transmitters -
+    derived from the plant state and the actuator inputs, as the level
+    transmitters' readings are derived from the tank levels.
+
+    There is no object per instrument: each instrument is a row of `GAINS`,
+    `LAGS`, `NOISE` and `RANGES`. Every tick, the values the instruments
+    tend to are computed in one matrix product of `GAINS` with the process
+    features (which pumps and valves are running, and the tank levels; see
+    `FEATURES`); the readings follow them with a first-order lag, plus
+    Gaussian noise, and are converted to the raw values their transmitters
+    scale back to engineering units.
+
+    Works on N instances at once, e.g. the states and inputs of an
+    `EnsemblePlant`, as `(N, ...)` arrays.
+    """
+
+    FEATURES: Tuple[str, ...] = (
+        "const",    "p1_in",    "p1_out",   "p3",       "uf_filter", "uf_backwash",
+        "p4",       "ro_run",   "ro_normal", "ro_flush", "h_t101",   "h_t301",
+        "h_t401",   "h_t601",   "h_t602"
+    )
+    """Process features the readings depend on; all but the levels (in mm) are 0 or 1"""
+
+    FLOWS: Dict[str, float] = {
+        name: Plant.PARAMS[name] * 3600 / 1e9 for name in ("f_mv101", "f_mv201", "f_p301", "f_p401")
+    }
+    """Nominal flows (in m^3/h) through the stages of the plant"""
+
+    SPECS: Dict[str, Tuple[float, float, float, float, float, Dict[str, float]]] = {
+        # instrument: (LEU, HEU, L_Raw_RIO, lag (s), noise, {feature: gain})
+        # the ranges are those the transmitters are configured with in config.device_config
+        "IOFIT101":  (0, 1225, 0,   1.0, 0.01,  {"p1_in": FLOWS["f_mv101"]}),
+        "IOFIT201":  (0, 4,    -5,  1.0, 0.01,  {"p1_out": FLOWS["f_mv201"]}),
+        "IOAIT201":  (0, 1000, 0,   20,  0.2,   {"const": 250, "p1_out": 5}),       # conductivity, uS/cm
+        "IOAIT202":  (2, 12,   0,   30,  0.005, {"const": 7.2, "p1_out": -0.2}),    # pH
+        "IOAIT203":  (0, 800,  0,   30,  0.5,   {"const": 500, "p1_out": -40}),     # ORP, mV
+        "IOFIT301":  (0, 4,    -15, 1.0, 0.01,  {"p3": FLOWS["f_p301"]}),
+        "IODPIT301": (0, 100,  -30, 2.0, 0.1,   {"uf_filter": 20, "uf_backwash": 40}),  # kPa
+        "IOAIT401":  (0, 150,  0,   60,  0.02,  {"const": 1.0}),                    # hardness, ppm
+        "IOFIT401":  (0, 800,  0,   1.0, 0.01,  {"p4": FLOWS["f_p401"]}),
+        "IOAIT402":  (0, 4,    -5,  30,  0.01,  {"const": 2.0, "p4": 0.5}),
+        "IOAIT501":  (2, 12,   0,   30,  0.005, {"const": 7.0, "p4": 0.05}),        # pH
+        "IOAIT502":  (0, 800,  0,   30,  0.5,   {"const": 200, "p4": 10}),          # ORP, mV
+        "IOAIT503":  (0, 1000, 0,   20,  0.2,   {"const": 255}),                    # conductivity, uS/cm
+        "IOAIT504":  (0, 1200, 0,   60,  0.1,   {"const": 255, "ro_normal": -240}), # permeate conductivity, uS/cm
+        # pressures (in kPa) are the head of the tank the pump draws from, plus the pump's
+        "IOPIT501":  (0, 500,  0,   0.5, 0.2,   {"h_t401": 0.00981, "ro_run": 250}),
+        "IOPIT502":  (0, 500,  -5,  0.5, 0.05,  {"h_t601": 0.00981, "ro_normal": 2}),
+        "IOPIT503":  (0, 500,  0,   0.5, 0.2,   {"h_t401": 0.00981, "ro_run": 180}),
+        "IOFIT501":  (0, 4,    0,   1.0, 0.01,  {"ro_run": FLOWS["f_p401"]}),
+        "IOFIT502":  (0, 4,    -20, 1.0, 0.01,  {"ro_normal": 0.6 * FLOWS["f_p401"]}),
+        "IOFIT503":  (0, 4,    -35, 1.0, 0.01,  {"ro_normal": 0.4 * FLOWS["f_p401"], "ro_flush": 0.6 * FLOWS["f_p401"]}),
+        "IOFIT504":  (0, 2,    -15, 1.0, 0.005, {"ro_run": 0.15 * FLOWS["f_p401"]}),
+    }
+    """Description of every instrument"""
+
+    SENSORS: Tuple[RemoteDeviceType, ...] = tuple(RemoteDeviceType(dev) for dev in SPECS)
+    """IO devices of the instruments, in the order of the rows of the arrays below"""
+
+    GAINS: np.ndarray = _get_gains(SPECS, FEATURES)
+    """Gain of every feature in the reading each instrument tends to, as `(instruments, features)`"""
+    LAGS: np.ndarray = np.array([spec[3] for spec in SPECS.values()], dtype=float)
+    NOISE: np.ndarray = np.array([spec[4] for spec in SPECS.values()], dtype=float)
+    RANGES: np.ndarray = np.array([spec[:3] for spec in SPECS.values()], dtype=float)
+    """`LEU`, `HEU` and `L_Raw_RIO` of every instrument"""
+
+    H_RAW_RIO, L_RAW_WRIO, H_RAW_WRIO = 31208.0, 3277.0, 16383.0
+    """Raw values of the upper end of the range, and of the wireless range, as in `FIT_FBD`"""
+
+    def __init__(self, noise: float = 1.0, seed: Optional[int] = None):
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        # the lagged readings, without noise, set to their targets on the first step
+        self.values: Optional[np.ndarray] = None
+
+    @staticmethod
+    def get_features(inputs: np.ndarray, state: np.ndarray) -> np.ndarray:
+        """
+        Returns the process features of each instance, given its actuator
+        inputs in the order of `Comms.REMOTE_TAG_NAMES` and its state in the
+        order of `Plant.TAG_NAMES`, as `(N, features)`.
+        """
+
+        col = EnsemblePlant.INPUTS
+        def run(*names: str) -> np.ndarray:
+            return np.logical_or.reduce([inputs[:, col[name]] for name in names])
+        def on(name: str) -> np.ndarray:
+            return inputs[:, col[name]]
+
+        p3 = run('IOP301_DI_Run', 'IOP302_DI_Run')
+        p4 = run('IOP401_DI_Run', 'IOP402_DI_Run')
+        ro_run = p4 & run('IOP501_DI_Run', 'IOP502_DI_Run')
+        ro_normal = ro_run & on('IOMV501_DI_ZSO') & on('IOMV502_DI_ZSO') & on('IOMV503_DI_ZSC') & on('IOMV504_DI_ZSC')
+        features = np.empty((len(inputs), len(SensorModel.FEATURES)))
+        features[:, :10] = np.column_stack((
+            np.ones(len(inputs), dtype=bool), on('IOMV101_DI_ZSO'),
+            run('IOP101_DI_Run', 'IOP102_DI_Run') & on('IOMV201_DI_ZSO'), p3,
+            p3 & on('IOMV302_DI_ZSO') & ~on('IOP602_DI_Run'),
+            ~p3 & on('IOMV301_DI_ZSO') & on('IOMV303_DI_ZSO') & on('IOP602_DI_Run'), p4, ro_run, ro_normal,
+            ro_run & ~ro_normal & on('IOMV503_DI_ZSO') & on('IOMV504_DI_ZSO')
+        ))
+        features[:, 10:] = state[:, 2:]
+        return features
+
+    def step(self, inputs: np.ndarray, state: np.ndarray, dt: float) -> np.ndarray:
+        """
+        Advances the readings of each instance by `dt` seconds and returns
+        them in engineering units, as `(N, instruments)`. See `get_features()`.
+        """
+
+        inputs = np.array(inputs, dtype=bool, ndmin=2)
+        targets = SensorModel.get_features(inputs, np.array(state, dtype=float, ndmin=2)) @ SensorModel.GAINS.T
+        if self.values is None or self.values.shape != targets.shape:
+            self.values = targets
+        else:
+            self.values += (targets - self.values) * -np.expm1(-dt / SensorModel.LAGS)
+        return self.values + self.rng.standard_normal(targets.shape) * (SensorModel.NOISE * self.noise)
+
+    @staticmethod
+    def to_raw(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the `AI_Value` and `W_AI_Value` of the readings `values`,
+        which are clipped to the range of their instruments.
+        """
+
+        leu, heu, l_raw = SensorModel.RANGES.T
+        fraction = (np.clip(values, leu, heu) - leu) / (heu - leu)
+        return (
+            l_raw + fraction * (SensorModel.H_RAW_RIO - l_raw),
+            SensorModel.L_RAW_WRIO + fraction * (SensorModel.H_RAW_WRIO - SensorModel.L_RAW_WRIO)
+        )
@@ -0,0 +1,14 @@
+"""
+Checks run with pytest from the repository root:
+
+    python3 -m pytest -q simulator/tests
+
+The simulator's modules import each other by top-level name, as the device
+runners are started from this directory, so it is put on the path here.
+"""
+
+import os
+import sys
+
+SIMULATOR_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, SIMULATOR_DIR)
@@ -0,0 +1,59 @@
+"""Checks that readers of a double-buffered device never see a cycle's tags half-written."""
+
+from modbus.compat.pymodbus_functions import LocalModbusClient, decode_registers, encode_registers
+from controlblock import Duty2_FBD
+import asyncio
+
+def count_torn_reads(double_buffered: bool, cycles: int = 2000) -> int:
+    """
+    Has a device write two tags to the same value each cycle, on either side
+    of an await, while another device reads both, and returns how many reads
+    saw different values.
+    """
+
+    async def run() -> int:
+        fbd = Duty2_FBD(device_name="D2", double_buffered=double_buffered)
+        tags = tuple(fbd.resolve_tag(name) for name in ("PMP1_Status", "PMP2_Status"))
+        client, torn, done = LocalModbusClient(fbd), 0, False
+
+        async def write() -> None:
+            nonlocal done
+            for cycle in range(cycles):
+                fbd.set_tag_value("PMP1_Status", cycle)
+                await asyncio.sleep(0)
+                fbd.set_tag_value("PMP2_Status", cycle)
+                fbd.commit_data_store()
+                await asyncio.sleep(0)
+            done = True
+
+        async def read() -> None:
+            nonlocal torn
+            while not done:
+                first, second = await decode_registers(client, tags, unit_id=1)
+                torn += first != second
+                await asyncio.sleep(0)
+
+        await asyncio.gather(write(), read())
+        return torn
+
+    return asyncio.run(run())
+
+def test_unbuffered_reads_can_tear():
+    assert count_torn_reads(False) > 0
+
+def test_buffered_reads_never_tear():
+    assert count_torn_reads(True) == 0
+
+def test_client_writes_made_mid_cycle_survive_the_commit():
+    async def run() -> tuple:
+        fbd = Duty2_FBD(device_name="D2", double_buffered=True)
+        tag = fbd.resolve_tag("PMP1_Status")
+        client = LocalModbusClient(fbd)
+        fbd.set_tag_value("PMP1_Status", 1)
+        # a client writes the tag while the cycle that set it is still running
+        await encode_registers(client, ((tag, 2),), unit_id=1)
+        seen_by_owner = fbd.get_tag_values("PMP1_Status")
+        fbd.commit_data_store()
+        return seen_by_owner, (await decode_registers(client, (tag,), unit_id=1))[0]
+
+    assert asyncio.run(run()) == (2, 2)
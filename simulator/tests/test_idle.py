@@ -0,0 +1,45 @@
+"""Checks that devices only drop to their idle rate while nothing changes their tags."""
+
+from typing import Optional
+from modbus.compat.pymodbus_functions import LocalModbusClient
+from controlblock import FBD, Duty2_FBD
+import asyncio
+
+def run_fbd(rewrite_interval: Optional[float], duration: float = 0.5, toggle: bool = False) -> Duty2_FBD:
+    """
+    Runs an FBD in real time for `duration` seconds, with its Run_FBD tag
+    rewritten every `rewrite_interval` seconds, if given: to the same value,
+    as its PLC does every scan, or to the opposite value if `toggle`.
+    """
+
+    async def run() -> Duty2_FBD:
+        fbd = Duty2_FBD(device_name="D2", interval=0.005, idle_after=5, idle_interval=0.05)
+        client = LocalModbusClient(fbd)
+        run_fbd = True
+        await client.write_coil(FBD.DEFAULT_RUN_TAG_LOC, run_fbd, slave=1)
+        task = asyncio.create_task(fbd.run())
+        end = asyncio.get_running_loop().time() + duration
+        while asyncio.get_running_loop().time() < end:
+            if rewrite_interval is None:
+                await asyncio.sleep(duration)
+                continue
+            await asyncio.sleep(rewrite_interval)
+            run_fbd = run_fbd != toggle
+            await client.write_coil(FBD.DEFAULT_RUN_TAG_LOC, run_fbd, slave=1)
+        fbd.exec_state.set()
+        await task
+        return fbd
+
+    return asyncio.run(run())
+
+def test_unused_device_idles():
+    metrics = run_fbd(None).idle_monitor.get_metrics()
+    assert metrics["time_idle"] > metrics["time_active"]
+
+def test_unchanged_writes_do_not_keep_device_active():
+    metrics = run_fbd(0.01).idle_monitor.get_metrics()
+    assert metrics["time_idle"] > metrics["time_active"]
+
+def test_changing_writes_keep_device_active():
+    metrics = run_fbd(0.01, toggle=True).idle_monitor.get_metrics()
+    assert metrics["time_idle"] < 0.1 * metrics["time_active"]
@@ -0,0 +1,27 @@
+"""Checks of the cycle schedulers."""
+
+from time import perf_counter
+from controlblock import Duty2_FBD
+import asyncio
+
+def test_degraded_deadline_scheduler_waits_one_new_interval():
+    async def run() -> None:
+        fbd = Duty2_FBD(device_name="D2", interval=0.01, schedule="deadline", watchdog_action="degrade")
+        scheduler = fbd.scheduler
+        scheduler.start()
+        # run for long enough that deadlines on the old start time would be far ahead
+        for _ in range(50):
+            await scheduler.wait()
+        fbd.on_watchdog(fbd.watchdog_overruns + 1)
+        assert scheduler.interval == 0.02 and fbd.loop_stats.interval == 0.02
+
+        start = perf_counter()
+        await scheduler.wait()
+        assert abs(perf_counter() - start - 0.02) < 0.01
+        # and the cycles after it keep to the new interval
+        start = perf_counter()
+        for _ in range(5):
+            await scheduler.wait()
+        assert abs(perf_counter() - start - 0.1) < 0.02
+
+    asyncio.run(run())
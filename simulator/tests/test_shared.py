@@ -0,0 +1,17 @@
+"""Checks of the seqlocked shared memory arrays."""
+
+from modbus.shared import SeqlockArray
+import pytest
+
+def test_read_gives_up_on_a_write_left_half_done():
+    array = SeqlockArray(3, create=True)
+    try:
+        array.write([1.0, 2.0, 3.0])
+        assert array.read().tolist() == [1.0, 2.0, 3.0]
+        # as if the writer died between making the sequence number odd and even again
+        array.seq[0] += 1
+        with pytest.raises(TimeoutError):
+            array.read(timeout=0.05)
+    finally:
+        array.close()
+        array.unlink()
@@ -0,0 +1,145 @@
+"""
+Checks of the precompiled state tables against the bitarray tables they
+replaced, applied the way the devices applied them before compilation.
+"""
+
+import itertools
+from types import SimpleNamespace
+from typing import Any, Dict, Tuple
+
+from modbus.compat.builtins import bitarray
+from modbus.helpers import create_contiguous_states
+from HMI.HMI import HMI_Ultrafiltration_Cycle, HMI_ReverseOsmosis_Cycle
+from plc.plc3 import PLC3
+from plc.plc5 import PLC5
+
+STATES = range(-1, 101)
+PULSES = list(itertools.product((False, True), repeat=3))
+
+UF_TABLE = create_contiguous_states(1, 20, {
+    1: bitarray('00000'), 4: bitarray('10000'), 5: bitarray('00000'),
+    7: bitarray('01000'), 8: bitarray('00000'), 12: bitarray('00100'),
+    13: bitarray('00000'), 16: bitarray('00001'), 17: bitarray('00000'),
+    18: bitarray('00010'), 99: bitarray('00000')
+})
+RO_TABLE = create_contiguous_states(1, 22, {
+    1: bitarray('000000000'), 4: bitarray('010010000'), 5: bitarray('000000000'),
+    15: bitarray('000000001'), 16: bitarray('000000100'), 17: bitarray('000000010'),
+    18: bitarray('000001000'), 19: bitarray('001000000'), 20: bitarray('100000000'),
+    21: bitarray('000000011')
+})
+PLC3_TABLE = create_contiguous_states(1, 20, {
+    1: (bitarray('1000000'), False), 2: (bitarray('1000000'), None),
+    3: (bitarray('1000100'), True), 6: (bitarray('1010100'), False),
+    8: (bitarray('1010000'), False), 9: (bitarray('1000000'), False),
+    10: (bitarray('1101000'), False), 11: (bitarray('1101010'), False),
+    13: (bitarray('1101000'), False), 15: (bitarray('1001000'), True),
+    17: (bitarray('0101001'), False), 19: (bitarray('0101000'), False),
+    99: (bitarray('0000000'), False),
+})
+PLC5_TABLE = create_contiguous_states(1, 21, {
+    1: bitarray("00000"), 3: bitarray("00011"), 5: bitarray("10011"),
+    8: bitarray("11011"), 9: bitarray("11101"), 10: bitarray("11100"),
+    13: bitarray("01100"), 14: bitarray("01101"), 15: bitarray("01001"),
+    16: bitarray("01011"), 17: bitarray("00011"), 20: bitarray("00000")
+})
+
+UF_VARS = ("UF_REFILL_SEC", "UF_FILTRATION_MIN", "BACKWASH_SEC", "CIP_CLEANING_SEC", "DRAIN_SEC")
+RO_INTS = ("FLUSHING_MIN", "RO_SD_FLUSHING_MIN", "MV501_TIMEOUT_TM", "MV502_TIMEOUT_TM", "MV503_TIMEOUT_TM", "MV504_TIMEOUT_TM")
+RO_BOOLS = ("RO_HPP_SD_On", "RO_HIGH_PUMP_Shutdown", "SD_FLUSHING_DONE_On")
+
+def old_uf_cycle(hmi: Any, sec_pulse: bool) -> None:
+    """The ultrafiltration cycle as it was run on the bitarray table."""
+
+    if hmi._state in UF_TABLE:
+        state_vars = tuple(getattr(hmi, name) for name in UF_VARS)
+        for name, value in zip(UF_VARS, (val * state_vars[i] for i, val in enumerate(UF_TABLE[hmi._state]))):
+            setattr(hmi, name, value)
+        if not sec_pulse:
+            return
+        elif hmi._state == 4:
+            hmi.UF_REFILL_SEC += 1
+        elif hmi._state == 12:
+            hmi.BACKWASH_SEC += 1
+        elif hmi._state == 16:
+            hmi.DRAIN_SEC += 1
+        elif hmi._state == 18:
+            hmi.CIP_CLEANING_SEC += 1
+    else:
+        hmi._state = 1
+
+def old_ro_cycle(hmi: Any, sec_pulse: bool, min_pulse: bool) -> None:
+    """The reverse osmosis cycle as it was run on the bitarray table."""
+
+    if hmi._state in RO_TABLE:
+        state_data = RO_TABLE[hmi._state]
+        hmi.RO_HPP_SD_On = bool(state_data[0])
+        hmi.FLUSHING_MIN *= state_data[1]
+        hmi.RO_SD_FLUSHING_MIN *= state_data[2]
+        hmi.RO_HIGH_PUMP_Shutdown &= bool(state_data[3])
+        hmi.SD_FLUSHING_DONE_On &= bool(state_data[4])
+        hmi.MV501_TIMEOUT_TM *= state_data[5]
+        hmi.MV502_TIMEOUT_TM *= state_data[6]
+        hmi.MV503_TIMEOUT_TM *= state_data[7]
+        hmi.MV504_TIMEOUT_TM *= state_data[8]
+
+        if min_pulse:
+            if hmi._state == 4:
+                hmi.FLUSHING_MIN += 1
+            elif hmi._state == 19:
+                hmi.RO_SD_FLUSHING_MIN += 1
+        if sec_pulse:
+            if hmi._state == 15:
+                hmi.MV504_TIMEOUT_TM += 1
+            elif hmi._state == 16:
+                hmi.MV502_TIMEOUT_TM += 1
+            elif hmi._state == 17:
+                hmi.MV503_TIMEOUT_TM += 1
+            elif hmi._state == 21:
+                hmi.MV503_TIMEOUT_TM += 1
+                hmi.MV504_TIMEOUT_TM += 1
+    else:
+        hmi._state = 1
+
+def run_cycle(cycle: Any) -> None:
+    """Runs a cycle coroutine that never suspends, without an event loop."""
+
+    try:
+        cycle.send(None)
+    except StopIteration:
+        return
+    raise AssertionError("cycle suspended")
+
+def snapshot(hmi: Any) -> Dict[str, Tuple[type, Any]]:
+    return {name: (type(value), value) for name, value in vars(hmi).items()}
+
+def test_uf_cycle_matches_bitarray_table():
+    for state, pulses, values in itertools.product(STATES, PULSES, itertools.product((0, 3, 2.5), repeat=5)):
+        old = SimpleNamespace(_state=state, **dict(zip(UF_VARS, values)))
+        new = SimpleNamespace(**vars(old))
+        old_uf_cycle(old, pulses[0])
+        run_cycle(HMI_Ultrafiltration_Cycle._main_loop(new, *pulses, 0.005))
+        assert snapshot(new) == snapshot(old), (state, pulses, values)
+
+def test_ro_cycle_matches_bitarray_table():
+    for state, pulses, ints, bools in itertools.product(
+        STATES, PULSES, itertools.product((0, 4), repeat=6), itertools.product((False, True), repeat=3)
+    ):
+        old = SimpleNamespace(_state=state, **dict(zip(RO_INTS, ints)), **dict(zip(RO_BOOLS, bools)))
+        new = SimpleNamespace(**vars(old))
+        old_ro_cycle(old, *pulses[:2])
+        run_cycle(HMI_ReverseOsmosis_Cycle._main_loop(new, *pulses, 0.005))
+        assert snapshot(new) == snapshot(old), (state, pulses, ints, bools)
+
+def test_plc_tables_match_bitarray_tables():
+    for state in STATES:
+        assert (state in PLC3_TABLE) == (PLC3.STATE_DICT.get(state) is not None)
+        assert (state in PLC5_TABLE) == (PLC5.STATE_LIST.get(state) is not None)
+        if state in PLC3_TABLE:
+            mid_state, auto_inp_flag = PLC3_TABLE[state]
+            compiled_state, compiled_flag = PLC3.STATE_DICT[state]
+            assert compiled_state[1:7] == tuple(bool(flag) for flag in mid_state[1:7])
+            assert bool(compiled_state[0]) == bool(mid_state[0])
+            assert compiled_flag is auto_inp_flag
+        if state in PLC5_TABLE:
+            assert PLC5.STATE_LIST[state] == tuple(bool(flag) for flag in PLC5_TABLE[state])
@@ -0,0 +1,50 @@
+"""Checks of the on delay timers against each other."""
+
+from typing import List, Optional
+from logicblock import TONR, ClockTONR
+
+def finish_time(timer: TONR, durations: List[float], enables: Optional[List[bool]] = None, clock: Optional[List[float]] = None) -> Optional[float]:
+    """
+    Ticks `timer` over cycles of `durations`, enabled unless `enables` says
+    otherwise, and returns the time of the first cycle in which it is done.
+    `clock` is the timer's clock, if it has one.
+    """
+
+    now = 0.0
+    for cycle, duration in enumerate(durations):
+        if clock is not None:
+            clock[0] = now
+        timer.tick(True if enables is None else enables[cycle])
+        if timer.DN:
+            return now
+        now += duration
+    return None
+
+def test_timers_agree_at_nominal_frequency():
+    clock, frequency = [0.0], 200
+    durations = [1 / frequency] * 2000
+    cycles = finish_time(TONR(3, frequency), durations)
+    elapsed = finish_time(ClockTONR(3, lambda: clock[0]), durations, clock=clock)
+    assert cycles is not None and abs(cycles - 3) <= 1 / frequency
+    # a clock timer measures from its first tick, so it may finish a cycle later
+    assert elapsed is not None and abs(elapsed - cycles) <= 2 / frequency
+
+def test_clock_timer_keeps_time_when_cycles_stretch():
+    frequency = 200
+    for stretch in (1.2, 1.5):
+        clock = [0.0]
+        durations = [stretch / frequency] * 2000
+        cycles = finish_time(TONR(3, frequency), durations)
+        elapsed = finish_time(ClockTONR(3, lambda: clock[0]), durations, clock=clock)
+        assert cycles is not None and abs(cycles - 3 * stretch) <= 2 * durations[0]
+        assert elapsed is not None and abs(elapsed - 3) <= 2 * durations[0]
+
+def test_timers_restart_when_disabled():
+    frequency = 10
+    durations = [1 / frequency] * 40
+    # disabled for one cycle half way through, after which the timers start again
+    enables = [cycle != 5 for cycle in range(len(durations))]
+    for create_timer in (lambda clock: TONR(1, frequency), lambda clock: ClockTONR(1, lambda: clock[0])):
+        clock = [0.0]
+        done = finish_time(create_timer(clock), durations, enables, clock)
+        assert done is not None and abs(done - 1.6) <= 2 / frequency
@@ -87,7 +87,7 @@ if __name__ == "__main__":
 
         device = Device(
             start_time=args.start_time + args.fbd_delay, remote_devices=get_remote_ips(args.remote_devices),
-            device_name=args.device_name, **device_args
+            device_name=args.device_name, interval=args.interval, phase_offset=args.phase_offset, **device_args
         )
 
         # cleanup
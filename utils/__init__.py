@@ -63,9 +63,11 @@ def get_dir(dir_name) -> str:
 
     return abspath(join(__file__, dir_name))
 
-def create_makefile(device_list, all_delay, io_delay, plc_delay, fbd_delay, scada_delay) -> int:
+def create_makefile(device_list, all_delay, io_delay, plc_delay, fbd_delay, scada_delay, restore=None) -> int:
     start_time = all_delay + time.time()
     delay_args = f"--start-time {start_time} --io-delay {io_delay} --plc-delay {plc_delay} --fbd-delay {fbd_delay} --scada-delay {scada_delay}"
+    if restore is not None:
+        delay_args += f" --restore {restore}"
     with open(get_dir("../../simulator/Makefile"), 'w') as makefile:
         makefile.write(f"# Automatically generated by {__file__} \n")
         makefile.write('\n'.join(generate_make(device_list, xargs=delay_args)))
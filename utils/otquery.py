@@ -4,13 +4,43 @@ from pymodbus.mei_message import ReadDeviceInformationRequest, ReadDeviceInforma
 from pymodbus.client import ModbusTcpClient
 from typing import Union
 import argparse
+import struct
 import sys
 
+CYCLES_LOC, STATS_LOC = 9000, 9006
+STATS_NAMES = (
+    "overruns", "max_us", "p99_us", "hist_0.25", "hist_0.5", "hist_0.75",
+    "hist_1", "hist_1.5", "hist_2", "hist_4", "hist_inf"
+)
+
+def read_ints(client: ModbusTcpClient, address: int, count: int):
+    response = client.read_holding_registers(address, 2 * count)
+    if response.isError():
+        return None
+    payload = struct.pack(">{0}H".format(2 * count), *response.registers)
+    return struct.unpack(">{0}i".format(count), payload)
+
+def print_stats(client: ModbusTcpClient) -> None:
+    """
+    Prints the debug tags of a device: its cycle count, and its loop
+    timing statistics (see `BaseModbusDevice.STATS_TAGS`). Histogram
+    buckets are named by their upper bound as a multiple of the interval.
+    """
+
+    cycles, stats = read_ints(client, CYCLES_LOC, 1), read_ints(client, STATS_LOC, len(STATS_NAMES))
+    if cycles is None or stats is None:
+        print("Statistics not available")
+        return
+    print(f"cycles: {cycles[0]}")
+    for name, value in zip(STATS_NAMES, stats):
+        print(f"{name}: {value}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("ip_port", type=str, help="The IP:Port address of the device to test.")
     parser.add_argument("--read-code", default=0x00, type=int, help="The read code of the device information request. (0 = basic, 1 = regular, 2 = extended, 3 = ")
     parser.add_argument("--timeout", default=0.5, type=float, help="The timeout. Default 0.5")
+    parser.add_argument("--stats", action="store_true", help="Also print the cycle count and loop timing statistics of the device.")
 
     args = parser.parse_args()
     host_port = args.ip_port
@@ -26,6 +56,8 @@ if __name__ == "__main__":
             if isinstance(response, ExceptionResponse):
                 break # device not supported (i.e. umodbus) but active
         print(f"Success: {host_port}")
+        if args.stats:
+            print_stats(client)
     except:
         print(f"Failure: {host_port}")
         sys.exit(1)
\ No newline at end of file